@@ -0,0 +1,80 @@
+'''
+    Benchmark of the lockstep batch simulator against running the scalar simulator once per
+    initial RAM image, reported as lane-instructions per second, i.e. the instructions executed
+    by all the lanes per second. The program loops a number of times depending on the RAM image
+    of each lane, so the lanes diverge and run masked. Requires NumPy.
+
+    Usage:
+        python3 benchmarks/bench_batch.py
+'''
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+from assembler import assemble
+from simulator import Simulator
+from batch_simulator import BatchSimulator
+
+LANE_COUNTS = [16, 256, 4096, 16384]
+
+# Safety limit of the instructions of each lane.
+MAX_INSTRUCTIONS = 10_000
+
+PROGRAM = '''
+        LB A 10     // Load counter
+LOOP:   LB B 11     // Load step
+        ADD A       // Increment counter
+        SB A 10     // Save counter
+        LB B 12     // Load limit
+        BLT LOOP    // Loop until limit
+        LB B E0     // Read slide switches
+        XOR A
+        SB A C0     // Show result on LEDs
+        IDLE
+'''
+
+def random_ram(rng:random.Random) -> bytes:
+    '''
+        Function to generate a RAM image with a random counter, step and limit.
+    '''
+    return bytes(0x10) + bytes([rng.randrange(0x10), rng.randrange(1, 4), rng.randrange(0x10, 0xF0)])
+
+def main():
+    result = assemble(PROGRAM)
+    rng = random.Random(0)
+
+    print(f'{"lanes":>6} {"scalar [inst/s]":>16} {"batch [lane-inst/s]":>20} {"speed-up":>9}')
+
+    for lanes in LANE_COUNTS:
+        rams = [random_ram(rng) for _ in range(lanes)]
+        switches = [rng.randrange(0x100) for _ in range(lanes)]
+
+        start = time.perf_counter()
+        scalar_ram = []
+        scalar_instructions = 0
+        for ram, value in zip(rams, switches):
+            simulator = Simulator.from_result(result, ram=ram)
+            simulator.io[0xE0] = value
+            scalar_instructions += simulator.run(MAX_INSTRUCTIONS)
+            scalar_ram.append(bytes(simulator.ram))
+        scalar_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        simulator = BatchSimulator.from_result(result, rams, inputs={0xE0 : switches})
+        batch_instructions = simulator.run(MAX_INSTRUCTIONS)
+        batch_time = time.perf_counter() - start
+
+        # Both simulators must end in the same state.
+        assert batch_instructions == scalar_instructions
+        assert np.array_equal(simulator.ram, np.frombuffer(b''.join(scalar_ram), dtype=np.uint8).reshape(lanes, -1))
+
+        scalar_rate = scalar_instructions / scalar_time
+        batch_rate = batch_instructions / batch_time
+        print(f'{lanes:>6} {scalar_rate:>16,.0f} {batch_rate:>20,.0f} {batch_rate / scalar_rate:>8.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+    Benchmark of the disassembler: number of ROM .mem files disassembled per second, including
+    parsing the files and writing the listings, on copies of the assembled example programs.
+
+    Usage:
+        python3 benchmarks/bench_disassembler.py
+'''
+import os
+import sys
+import glob
+import time
+import tempfile
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utils
+from assembler import assemble_program
+from disassembler import disassemble_file
+
+FILE_COUNT = 1000
+
+def main():
+    roms = []
+    for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.asm'))):
+        result = assemble_program(utils.Stream(utils.AsmFile(path), utils.iter_clean), annotate=True)
+        roms.append(result.text)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for idx in range(FILE_COUNT):
+            path = os.path.join(tmp_dir, f'rom_{idx}.mem')
+            with open(path, 'w') as f:
+                f.write(roms[idx % len(roms)])
+            paths.append(path)
+
+        start = time.perf_counter()
+        instructions = sum(disassemble_file(path, None, True).instructions for path in paths)
+        elapsed = time.perf_counter() - start
+
+    print(f'Disassembled {FILE_COUNT} files, {instructions} instructions, in {elapsed:.3f} s: '
+          f'{FILE_COUNT / elapsed:,.0f} files/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''
+    Micro-benchmark of the instruction encoding (both passes of token_parser.parse_tokens),
+    reported as lines encoded per second over a mix of every instruction type.
+
+    Usage:
+        python3 benchmarks/bench_encoding.py
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utils
+from token_parser import parse_tokens
+
+LINE_COUNT = 100_000
+REPEATS = 5
+
+# One line of every instruction format, for both registers where applicable.
+MIX = ['LB A 01', 'LB B 02', 'SB A 03', 'SB B 04',
+       'ADD A', 'SUB B', 'MUL A', 'SLA B', 'SRA A', 'SEQ B', 'SGT A', 'SLT B',
+       'AND A', 'OR B', 'XOR A', 'NOT B', 'COPY A', 'DEREF B',
+       'INC A B', 'DEC B A',
+       'BEQ START', 'BGT START', 'BLT START', 'JUMP START', 'FUNC START',
+       'IDLE', 'RETURN']
+
+def main():
+    program = ['START: ' + MIX[0]] + [MIX[i % len(MIX)] for i in range(1, LINE_COUNT)]
+    program, label_dict = utils.get_labels(program)
+    
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        parse_tokens(program, label_dict)
+        best = min(best, time.perf_counter() - start)
+    
+    print(f'{LINE_COUNT} lines in {best:.3f} s: {LINE_COUNT / best:,.0f} lines/s')
+
+if __name__ == '__main__':
+    main()
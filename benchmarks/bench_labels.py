@@ -0,0 +1,64 @@
+'''
+    Benchmark of the assembler front-end (cleaning, label extraction, label resolution and
+    encoding) on synthetic programs of increasing length. The runtime per line should stay
+    roughly constant, i.e. the total runtime grows linearly with the program length.
+
+    Usage:
+        python3 benchmarks/bench_labels.py
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import utils
+from token_parser import parse_tokens
+
+SIZES = [1_000, 10_000, 100_000]
+
+# Number of labels branches may target, kept at the start of the program so that every
+# branch target fits in the 8-bit operand byte.
+TARGET_LABELS = 8
+
+def synthetic_program(line_count:int):
+    '''
+        Function to generate a synthetic program with a label every 4 lines.
+
+        Parameters:
+            line_count: Number of lines in the generated program.
+
+        Returns:
+            List of string corresponding to the lines of the program.
+    '''
+    block = ['L{0}: LB A 01 // Load operand of L{0}',
+             '      ADD A',
+             '      SB A 02',
+             '      BEQ L{1}']
+    program = []
+    
+    for i in range(line_count // len(block)):
+        for line in block:
+            program.append(line.format(i, i % TARGET_LABELS) + '\n')
+            
+    return program
+
+def assemble(program):
+    program = utils.clean_program(program)
+    program, label_dict = utils.get_labels(program)
+    return parse_tokens(program, label_dict)
+
+def main():
+    print(f'{"lines":>10} {"labels":>10} {"time [s]":>10} {"us/line":>10}')
+    
+    for size in SIZES:
+        program = synthetic_program(size)
+        
+        start = time.perf_counter()
+        _, label_dict = assemble(program)
+        elapsed = time.perf_counter() - start
+        
+        print(f'{size:>10} {len(label_dict):>10} {elapsed:>10.3f} {elapsed / size * 1e6:>10.2f}')
+
+if __name__ == '__main__':
+    main()
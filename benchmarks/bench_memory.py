@@ -0,0 +1,86 @@
+'''
+    Benchmark of the peak memory of the assembler front-end on the same program padded with
+    increasing volumes of comments and white space. Each run assembles the file in a fresh
+    process and reports its peak resident set size (RSS). The streaming front-end reads the
+    file in passes and should stay flat, while reading the whole file into lists grows with
+    the file size.
+
+    Usage:
+        python3 benchmarks/bench_memory.py
+'''
+import os
+import sys
+import tempfile
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Megabytes of comments and white space added to the program.
+PADDING_SIZES = [0, 16, 64, 256]
+
+PROGRAM = '''
+LOOP:   LB A 10     // Load counter
+        LB B 11     // Load step
+        ADD A       // Increment counter
+        SB A 10     // Save counter
+        SB A C0     // Show counter on LEDs
+        LI B 20     // Load limit
+        BLT LOOP    // Loop until limit
+        IDLE
+'''
+
+# Assembles the file given as first argument, streamed or read into lists as given by the
+# second argument, and prints the peak RSS in KiB (Linux).
+RUNNER = '''
+import sys
+import resource
+import utils
+from assembler import assemble_program
+
+path, mode = sys.argv[1:]
+if mode == 'streaming':
+    assemble_program(utils.Stream(utils.AsmFile(path), utils.iter_clean))
+else:
+    assemble_program(utils.clean_program(utils.read_asm(path)))
+
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+def padded_program(path:str, padding:int) -> None:
+    '''
+        Function to write the program with about the given number of bytes of comment and
+        blank lines between its instructions.
+    '''
+    lines = PROGRAM.strip().splitlines()
+    filler = '    // ' + 'x' * 64 + '\n' + ' ' * 24 + '\n'
+    repeat = padding // (len(filler) * len(lines))
+
+    # Written in small chunks: the peak RSS of this process is inherited by the assembler process.
+    with open(path, 'w') as f:
+        for line in lines:
+            for _ in range(repeat):
+                f.write(filler)
+            f.write(line + '\n')
+
+def peak_rss(path:str, mode:str) -> int:
+    output = subprocess.run([sys.executable, '-c', RUNNER, path, mode], cwd=SRC_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return int(output)
+
+def main():
+    print(f'{"padding [MB]":>12} {"file [MB]":>10} {"streaming [MB]":>15} {"lists [MB]":>11}')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'padded.asm')
+
+        for padding in PADDING_SIZES:
+            padded_program(path, padding * 2 ** 20)
+            size = os.path.getsize(path) / 2 ** 20
+
+            streaming = peak_rss(path, 'streaming') / 2 ** 10
+            lists = peak_rss(path, 'lists') / 2 ** 10
+
+            print(f'{padding:>12} {size:>10.1f} {streaming:>15.1f} {lists:>11.1f}')
+
+if __name__ == '__main__':
+    main()
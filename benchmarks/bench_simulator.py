@@ -0,0 +1,72 @@
+'''
+    Benchmark of the instruction set simulator, reported as executed instructions per second
+    on a loop mixing memory, ALU and branch instructions, for both the interpreter and the
+    basic block compiling simulator, and of the idle time skipping of the event scheduler on
+    ten hours of timer interrupts.
+
+    Usage:
+        python3 benchmarks/bench_simulator.py
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from assembler import assemble
+from simulator import Simulator
+from block_simulator import BlockSimulator
+from peripherals import Seg7, Switches, Timer
+
+INSTRUCTION_COUNT = 2_000_000
+
+# Ten hours at 100 MHz with a timer interrupt every second.
+CLOCK_FREQUENCY = 100_000_000
+TIMER_PERIOD = CLOCK_FREQUENCY
+SIMULATED_TIME = CLOCK_FREQUENCY * 36000
+
+PROGRAM = '''
+LOOP:   LB A 10     // Load counter
+        LB B 11     // Load step
+        ADD A       // Increment counter
+        SB A 10     // Save counter
+        SB A C0     // Show counter on LEDs
+        LB B 12     // Load limit
+        BLT LOOP    // Loop until limit
+        DEC A A
+        SB A 10
+        JUMP LOOP
+'''
+
+TIMER_PROGRAM = '''
+        IDLE
+TIMER:  LB A E0     // Read slide switches
+        SB A D0     // Show them on the 7-segment display
+        IDLE
+'''
+
+def main():
+    result = assemble(PROGRAM)
+    
+    for simulator_class in [Simulator, BlockSimulator]:
+        simulator = simulator_class.from_result(result, ram=bytes(0x11) + bytes([1, 0xF0]))
+        
+        start = time.perf_counter()
+        simulator.run(INSTRUCTION_COUNT)
+        elapsed = time.perf_counter() - start
+        
+        print(f'{simulator_class.__name__:>15}: {simulator.instructions} instructions in {elapsed:.3f} s: '
+              f'{simulator.instructions / elapsed:,.0f} instructions/s')
+
+    simulator = BlockSimulator.from_result(assemble(TIMER_PROGRAM))
+    timer = Timer(TIMER_PERIOD)
+    simulator.attach(timer, Seg7(), Switches(value=0x42))
+
+    start = time.perf_counter()
+    simulator.run(until=SIMULATED_TIME)
+    elapsed = time.perf_counter() - start
+
+    print(f'{"Timer":>15}: {SIMULATED_TIME / CLOCK_FREQUENCY:.0f} s simulated with {timer.ticks} interrupts in {elapsed:.3f} s')
+
+if __name__ == '__main__':
+    main()
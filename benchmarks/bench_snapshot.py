@@ -0,0 +1,96 @@
+'''
+    Benchmark of the simulator snapshots: time to fork scenarios from a long common prefix by
+    restoring a snapshot taken at the end of the prefix, against simulating the prefix again for
+    every scenario, and the size of the snapshot and time to take and restore it.
+
+    Usage:
+        python3 benchmarks/bench_snapshot.py
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from assembler import assemble
+from simulator import Simulator
+from peripherals import Leds, Timer
+
+PREFIX_INSTRUCTIONS = 1_000_000
+SCENARIO_INSTRUCTIONS = 10_000
+SCENARIO_COUNT = 20
+SNAPSHOT_COUNT = 10_000
+
+PROGRAM = '''
+LOOP:   LB A 10     // Load counter
+        LB B 11     // Load step
+        ADD A       // Increment counter
+        SB A 10     // Save counter
+        SB A C0     // Show counter on LEDs
+        LB B 12     // Load limit
+        BLT LOOP    // Loop until limit
+        DEC A A
+        SB A 10
+        JUMP LOOP
+'''
+
+def make_simulator(result) -> Simulator:
+    '''
+        Function to create a simulator with the peripherals of the benchmark attached.
+    '''
+    simulator = Simulator.from_result(result, ram=bytes(0x11) + bytes([1, 0xF0]))
+    simulator.attach(Leds(), Timer(1000))
+    return simulator
+
+def run_scenario(simulator:Simulator, step:int) -> bytes:
+    '''
+        Function to run a scenario from the end of the prefix, i.e. the loop with another step.
+    '''
+    simulator.ram[0x11] = step
+    simulator.run(SCENARIO_INSTRUCTIONS)
+    return bytes(simulator.ram) + bytes([simulator.peripherals[0].value])
+
+def main():
+    result = assemble(PROGRAM)
+    steps = range(1, SCENARIO_COUNT + 1)
+
+    # Prefix simulated again for every scenario.
+    start = time.perf_counter()
+    replayed = []
+    for step in steps:
+        simulator = make_simulator(result)
+        simulator.run(PREFIX_INSTRUCTIONS)
+        replayed.append(run_scenario(simulator, step))
+    replay_time = time.perf_counter() - start
+
+    # Prefix simulated once, scenarios forked from its snapshot.
+    start = time.perf_counter()
+    simulator = make_simulator(result)
+    simulator.run(PREFIX_INSTRUCTIONS)
+    snapshot = simulator.snapshot()
+    forked = []
+    for step in steps:
+        simulator.restore(snapshot)
+        forked.append(run_scenario(simulator, step))
+    fork_time = time.perf_counter() - start
+
+    assert forked == replayed
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOT_COUNT):
+        simulator.snapshot()
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(SNAPSHOT_COUNT):
+        simulator.restore(snapshot)
+    restore_time = time.perf_counter() - start
+
+    print(f'{SCENARIO_COUNT} scenarios of {SCENARIO_INSTRUCTIONS} instructions after a {PREFIX_INSTRUCTIONS} instruction prefix')
+    print(f'{"replayed prefix":>16}: {replay_time:.3f} s')
+    print(f'{"forked snapshot":>16}: {fork_time:.3f} s ({replay_time / fork_time:.1f}x)')
+    print(f'Snapshot of {len(snapshot)} bytes taken in {1e6 * save_time / SNAPSHOT_COUNT:.1f} us, '
+          f'restored in {1e6 * restore_time / SNAPSHOT_COUNT:.1f} us')
+
+if __name__ == '__main__':
+    main()
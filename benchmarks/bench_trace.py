@@ -0,0 +1,83 @@
+'''
+    Benchmark of the execution trace of the tracer: size and time to write and reload a trace of
+    a million instructions in the fixed-width binary format, against the same records written as
+    text lines.
+
+    Usage:
+        python3 benchmarks/bench_trace.py
+'''
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from assembler import assemble
+from simulator import Simulator
+from tracer import Tracer, TraceBuffer, TraceRecord, load_trace
+
+INSTRUCTION_COUNT = 1_000_000
+
+PROGRAM = '''
+LOOP:   LB A 10     // Load counter
+        LB B 11     // Load step
+        ADD A       // Increment counter
+        SB A 10     // Save counter
+        SB A C0     // Show counter on LEDs
+        LB B 12     // Load limit
+        BLT LOOP    // Loop until limit
+        DEC A A
+        SB A 10
+        JUMP LOOP
+'''
+
+def main():
+    result = assemble(PROGRAM)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        binary_path = os.path.join(tmp_dir, 'run.trace')
+        text_path = os.path.join(tmp_dir, 'run.txt')
+
+        # Simulation with the trace flushed to the binary file.
+        simulator = Simulator.from_result(result, ram=bytes(0x11) + bytes([1, 0xF0]))
+        simulator.profiler = tracer = Tracer(result.labels, TraceBuffer(filename=binary_path), result.target)
+
+        start = time.perf_counter()
+        simulator.run(INSTRUCTION_COUNT)
+        tracer.trace.close()
+        traced = time.perf_counter() - start
+
+        start = time.perf_counter()
+        records = list(load_trace(binary_path))
+        binary_load = time.perf_counter() - start
+
+        # Same records written again in both formats.
+        start = time.perf_counter()
+        trace = TraceBuffer(filename=binary_path)
+        for record in records:
+            trace.append(*record)
+        trace.close()
+        binary_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(text_path, 'w') as f:
+            for record in records:
+                f.write(f'{record.cycle} {record.pc:02X} {record.op:02X} {record.addr:02X} {record.value:02X}\n')
+        text_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(text_path) as f:
+            text_records = [TraceRecord(int(cycle), int(pc, 16), int(op, 16), int(addr, 16), int(value, 16))
+                            for cycle, pc, op, addr, value in map(str.split, f)]
+        text_load = time.perf_counter() - start
+
+        assert text_records == records
+
+        print(f'Traced {len(records)} instructions in {traced:.3f} s')
+        print(f'{"format":>8} {"size [MB]":>10} {"write [s]":>10} {"reload [s]":>11}')
+        print(f'{"binary":>8} {os.path.getsize(binary_path) / 2 ** 20:>10.1f} {binary_write:>10.3f} {binary_load:>11.3f}')
+        print(f'{"text":>8} {os.path.getsize(text_path) / 2 ** 20:>10.1f} {text_write:>10.3f} {text_load:>11.3f}')
+
+if __name__ == '__main__':
+    main()
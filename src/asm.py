@@ -1,8 +1,17 @@
 import os
 import sys
 import utils
+import cache
+import formats
+import wcet
+import targets
+import linker
 import argparse
-from token_parser import parse_tokens
+import exceptions as exc
+from assembler import assemble_program
+from token_parser import get_constant_pool
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import constants as const
 
 def arg_parse() -> argparse.Namespace:
@@ -19,81 +28,441 @@ def arg_parse() -> argparse.Namespace:
 
     parser.add_argument('--input', '-i',
                         type=str,
+                        nargs='+',
                         required=True,
-                        help='Path to the input .asm file to be compiled.')
+                        help='Paths to the input .asm files, directories or glob patterns to be compiled.')
     parser.add_argument('--output', '-o',
                         type=str,
                         default=None,
-                        help='Path to the output file.')
+                        help='Path to the output file. Only supported with a single input file.')
     parser.add_argument('--extension', '-e',
                         type=str,
                         default=const.DEFAULT_FILE_EXTENSION,
-                        help='File extension to be used for the output file if it is not provided.')
+                        help='File extension to be used for the output .mem file if it is not provided.')
+    parser.add_argument('--format', '-F',
+                        type=str,
+                        nargs='+',
+                        default=[formats.MEM_FORMAT],
+                        choices=[formats.MEM_FORMAT, *formats.FORMATS],
+                        help='Output formats: annotated .mem file (mem), comment free $readmemh file (hex), '
+                             'raw binary (bin), Intel HEX (ihex) or Xilinx .coe file (coe).')
+    parser.add_argument('--source-map', '-m',
+                        action='store_true',
+                        default=False,
+                        help='Flag to also write a source map from ROM address to assembly line (.map file) next to the output file.')
+    parser.add_argument('--optimize', '-O',
+                        action='store_true',
+                        default=False,
+                        help='Flag to optimize the program and report the bytes and cycles saved.')
+    parser.add_argument('--wcet-budget', '-w',
+                        type=int,
+                        default=None,
+                        help='Maximum number of clock cycles of each interrupt handler. The build fails if a handler can exceed it or can\'t be bounded.')
+    parser.add_argument('--loop-bound', '-l',
+                        type=str,
+                        nargs='+',
+                        default=[],
+                        help='Maximum number of iterations of the loops of the interrupt handlers, as LABEL=N with LABEL the label of the loop header.')
+    parser.add_argument('--target', '-t',
+                        type=str,
+                        default=targets.DEFAULT_TARGET.name,
+                        choices=list(targets.TARGETS),
+                        help='Core to assemble for, setting the ROM and RAM sizes, the size of the ROM address operands and the interrupt vectors.')
+    parser.add_argument('--object', '-r',
+                        action='store_true',
+                        default=False,
+                        help='Flag to write a relocatable object file (.obj file) per input file instead of a ROM, to be linked with --link.')
+    parser.add_argument('--link', '-k',
+                        action='store_true',
+                        default=False,
+                        help='Flag to link all the input .asm and .obj files into a single ROM, named after the first input file.')
     parser.add_argument('--force', '-f',
                         action='store_true',
                         default=False,
                         help='Flag to force overwriting of output file if it already exists.')
+    parser.add_argument('--jobs', '-j',
+                        type=int,
+                        default=None,
+                        help='Number of processes used to compile multiple input files. Defaults to the number of CPUs.')
+    parser.add_argument('--cache', '-c',
+                        type=str,
+                        default=None,
+                        help='Path to the build cache directory. Programs with cached ROMs are not assembled again.')
+    parser.add_argument('--cache-size',
+                        type=int,
+                        default=const.DEFAULT_CACHE_SIZE,
+                        help='Maximum size of the build cache in bytes. Least recently used ROMs are evicted first.')
 
     return parser.parse_args()
 
+def get_output_path(input_path:str, file_extension:str) -> str:
+    '''
+        Function to generate the output path from the input path by replacing its extension.
+
+        Parameters:
+            input_path: Path to the input .asm file.
+            file_extension: File extension of the output file, with or without the leading ".".
+
+        Returns:
+            String corresponding to the path of the output file.
+    '''
+    if not file_extension.startswith('.'):
+        return os.path.splitext(input_path)[0] + '.' + file_extension
+
+    return os.path.splitext(input_path)[0] + file_extension
+
+def get_output_paths(input_path:str, output_path:Optional[str], file_extension:str, output_formats:List[str]) -> Dict[str, str]:
+    '''
+        Function to generate the path of the output file of each output format.
+
+        Parameters:
+            input_path: Path to the input .asm file.
+            output_path: Path to the output file. If None, it is generated from the input path. With several
+                         output formats, its extension is replaced by the extension of each format.
+            file_extension: File extension to be used for the output .mem file if it is not provided.
+            output_formats: List of output formats.
+
+        Returns:
+            Dictionary mapping the output formats to the path of their output file.
+    '''
+    if output_path and len(output_formats) == 1:
+        return {output_formats[0] : output_path}
+
+    base_path = output_path if output_path else input_path
+    output_paths = dict()
+
+    for output_format in output_formats:
+        if output_format == formats.MEM_FORMAT and not output_path:
+            output_paths[output_format] = get_output_path(base_path, file_extension)
+        elif output_format == formats.MEM_FORMAT:
+            output_paths[output_format] = get_output_path(base_path, const.DEFAULT_FILE_EXTENSION)
+        else:
+            output_paths[output_format] = get_output_path(base_path, formats.FORMATS[output_format][0])
+
+    return output_paths
+
+def assemble_file(input_path:str, output_path:Optional[str], file_extension:str, force:bool,
+                  cache_dir:Optional[str]=None, cache_size:int=const.DEFAULT_CACHE_SIZE,
+                  output_formats:Optional[List[str]]=None, write_source_map:bool=False,
+                  optimize:bool=False, wcet_budget:Optional[int]=None,
+                  loop_bounds:Optional[Dict[str, int]]=None, target:targets.Target=targets.DEFAULT_TARGET,
+                  write_object:bool=False) -> Optional[str]:
+    '''
+        Function to assemble a single .asm file and save the ROM in each output format. The RAM
+        image of the constant pool of the LI instructions, if any, is saved next to the output file.
+
+        Parameters:
+            input_path: Path to the input .asm file.
+            output_path: Path to the output file. If None, it is generated from the input path.
+            file_extension: File extension to be used for the output .mem file if it is not provided.
+            force: Flag to overwrite the output file if it already exists.
+            cache_dir (optional): Path to the build cache directory. If None, the cache is not used.
+            cache_size (optional): Maximum size of the build cache in bytes.
+            output_formats (optional): List of output formats, see formats.FORMATS. Defaults to the .mem file only.
+            write_source_map (optional): Flag to also write the source map of the program next to the output file.
+            optimize (optional): Flag to optimize the program, see optimizer.optimize.
+            wcet_budget (optional): Maximum number of clock cycles of each interrupt handler. If None,
+                                    the handlers are not analyzed.
+            loop_bounds (optional): Maximum number of iterations of the loops of the handlers, indexed by label.
+            target (optional): Core the program is assembled for, see targets.Target.
+            write_object (optional): Flag to write a relocatable object file instead of a ROM, see linker.assemble_object.
+                                     The output formats, the optimizer and the timing analysis only apply when linking.
+
+        Returns:
+            String corresponding to the optimization and timing report, None if there is nothing to report.
+
+        Raises:
+            InvalidFileException if the input file doesn't exist or isn't an .asm file, or if
+            the output file already exists and force is not set.
+            InvalidTimingException if an interrupt handler can exceed the budget or can't be bounded.
+    '''
+    check_input_file(input_path)
+
+    # Stream the program from the file, removing comments and white space, on every pass.
+    raw_program = utils.AsmFile(input_path)
+    program = utils.Stream(raw_program, utils.iter_clean)
+
+    if write_object:
+        object_path = output_path if output_path else get_output_path(input_path, const.OBJECT_FILE_EXTENSION)
+        if not force and os.path.exists(object_path):
+            raise exc.InvalidFileException(f'File {object_path} already exists! Pass the "--force" argument to force overwriting it.')
+
+        module = linker.assemble_object(program, utils.iter_source_positions(raw_program), input_path, target)
+        utils.write_file(module.render(), object_path)
+        return None
+
+    if not output_formats:
+        output_formats = [formats.MEM_FORMAT]
+
+    # Look up cleaned program in the build cache. The cache doesn't hold the positions of the
+    # instructions in the source nor the labels, so programs are always assembled when a source
+    # map or the timing analysis is needed.
+    rom = None
+    image = high_z = result = None
+    constant_pool = None
+    report = []
+    if cache_dir:
+        cache_key = cache.get_cache_key(program, optimize, target)
+        if not write_source_map and wcet_budget is None:
+            rom = cache.load(cache_dir, cache_key)
+
+    if rom is None:
+        positions = utils.iter_source_positions(raw_program) if write_source_map else None
+        result = assemble_program(program, annotate=True, positions=positions, filename=input_path, optimize=optimize, target=target)
+        rom, image, high_z, constant_pool = result.text, result.rom, result.high_z, result.constant_pool
+        if optimize:
+            report.append(str(result.optimization))
+
+        if cache_dir:
+            cache.store(cache_dir, cache_key, rom, cache_size)
+
+    else:
+        # The cache only holds the ROM, not the rewrites of the optimizer.
+        if optimize:
+            report.append('Optimized ROM loaded from the build cache.')
+
+        # Only decode the cached ROM if an image based format is needed.
+        if any(output_format in formats.FORMATS for output_format in output_formats):
+            image, high_z = utils.parse_rom(rom, target.rom_size)
+
+    # The constant pool only depends on the program, so it is allocated again for cached ROMs.
+    if constant_pool is None:
+        constant_pool = get_constant_pool((line for _, line in utils.iter_labels(program)), target.ram_size)
+
+    # Bound the interrupt handlers before writing anything.
+    if wcet_budget is not None:
+        report += check_timing(result, wcet_budget, loop_bounds)
+
+    write_outputs(input_path, output_path, file_extension, force, output_formats, rom, image, high_z,
+                  constant_pool, result.source_map if write_source_map and result is not None else None)
+
+    return '\n'.join(report) if report else None
+
+def check_input_file(input_path:str, extensions:Tuple[str, ...]=(const.ASSEMBLY_FILE_EXTENSION,)) -> None:
+    '''
+        Function to check that an input file exists and has a supported file extension.
+
+        Raises:
+            InvalidFileException if the input file doesn't exist or has another extension.
+    '''
+    # Check if input file exists.
+    if not os.path.exists(input_path):
+        raise exc.InvalidFileException(f'Input file {input_path} does not exists.')
+
+    # Check if input file has the valid file extension
+    if not input_path.endswith(extensions):
+        raise exc.InvalidFileException(f'File extension {os.path.splitext(input_path)[-1]} is not supported. Use {" or ".join(extensions)} instead.')
+
+def check_timing(result, wcet_budget:int, loop_bounds:Optional[Dict[str, int]]=None) -> List[str]:
+    '''
+        Function to bound the interrupt handlers of an assembled program against a cycle budget.
+
+        Returns:
+            List of string corresponding to the bound of each handler.
+
+        Raises:
+            InvalidTimingException if an interrupt handler can exceed the budget or can't be bounded.
+    '''
+    report = []
+    for label, bound in wcet.analyze_handlers(result, loop_bounds).items():
+        report.append(f'{label}: {bound}')
+        if not bound.bounded:
+            raise exc.InvalidTimingException(f'{label} handler can\'t be bounded: {"; ".join(bound.problems)}.')
+        if bound.cycles > wcet_budget:
+            raise exc.InvalidTimingException(f'{label} handler takes up to {bound.cycles} cycles for a budget of {wcet_budget} cycles.')
+
+    return report
+
+def write_outputs(input_path:str, output_path:Optional[str], file_extension:str, force:bool,
+                  output_formats:List[str], rom:str, image:bytes, high_z, constant_pool:Dict[int, int],
+                  source_map=None) -> None:
+    '''
+        Function to save an assembled ROM in each output format, with its source map and the RAM
+        image of its constant pool if any. Nothing is written if one of the files already exists.
+
+        Parameters:
+            input_path: Path to the input file the output paths are generated from.
+            output_path: Path to the output file. If None, it is generated from the input path.
+            file_extension: File extension to be used for the output .mem file if it is not provided.
+            force: Flag to overwrite the output files if they already exist.
+            output_formats: List of output formats, see formats.FORMATS.
+            rom: String corresponding to the annotated .mem file content.
+            image: ROM image.
+            high_z: Set of ROM addresses with a high impedance upper nibble.
+            constant_pool: Value to RAM address mapping of the program.
+            source_map (optional): SourceMap of the program, written next to the output file if given.
+
+        Raises:
+            InvalidFileException if an output file already exists and force is not set.
+    '''
+    # Check for provided output file. If not provided, generate it from the input file.
+    output_paths = get_output_paths(input_path, output_path, file_extension, output_formats)
+    source_map_path = get_output_path(next(iter(output_paths.values())), const.SOURCE_MAP_FILE_EXTENSION)
+    ram_path = get_output_path(next(iter(output_paths.values())), const.RAM_FILE_EXTENSION)
+
+    # Check for existing output files.
+    for path in [*output_paths.values(), *([source_map_path] if source_map else []), *([ram_path] if constant_pool else [])]:
+        if not force and os.path.exists(path):
+            raise exc.InvalidFileException(f'File {path} already exists! Pass the "--force" argument to force overwriting it.')
+
+    # Save program in each output format
+    for output_format, path in output_paths.items():
+        if output_format == formats.MEM_FORMAT:
+            utils.write_file(rom, path)
+        else:
+            utils.write_file(formats.FORMATS[output_format][1](image, high_z), path)
+
+    if source_map:
+        utils.write_file(source_map.render(), source_map_path)
+
+    # Save the RAM image holding the constant pool of the LI instructions.
+    if constant_pool:
+        utils.generate_ram([(addr, value) for value, addr in constant_pool.items()], ram_path)
+
+def link_files(input_paths:List[str], output_path:Optional[str], file_extension:str, force:bool,
+               output_formats:Optional[List[str]]=None, optimize:bool=False, wcet_budget:Optional[int]=None,
+               loop_bounds:Optional[Dict[str, int]]=None, target:targets.Target=targets.DEFAULT_TARGET) -> Optional[str]:
+    '''
+        Function to link .asm and .obj files into a single ROM, see linker.link. The .asm files are
+        assembled into objects in memory, the .obj files are loaded. The modules are placed in the
+        given order and the outputs are named after the first input file.
+
+        Parameters:
+            input_paths: List of paths to the input .asm and .obj files.
+            Other parameters: see assemble_file. Object files must be assembled for the given target.
+
+        Returns:
+            String corresponding to the optimization and timing report, None if there is nothing to report.
+
+        Raises:
+            InvalidFileException if an input file doesn't exist or has another extension, or if
+            an output file already exists and force is not set.
+            InvalidLabelException if a symbol is defined by several modules or is not defined.
+            InvalidTimingException if an interrupt handler can exceed the budget or can't be bounded.
+    '''
+    if not output_formats:
+        output_formats = [formats.MEM_FORMAT]
+
+    modules = []
+    for input_path in input_paths:
+        check_input_file(input_path, (const.ASSEMBLY_FILE_EXTENSION, const.OBJECT_FILE_EXTENSION))
+
+        if input_path.endswith(const.OBJECT_FILE_EXTENSION):
+            module = linker.load(input_path)
+        else:
+            raw_program = utils.AsmFile(input_path)
+            module = linker.assemble_object(utils.Stream(raw_program, utils.iter_clean),
+                                            utils.iter_source_positions(raw_program), input_path, target)
+
+        if module.target != target.name:
+            raise exc.InvalidFileException(f'Object file {input_path} is assembled for {module.target}, not for {target.name}.')
+        modules.append(module)
+
+    result = linker.link(modules, annotate=True, optimize=optimize)
+
+    report = [str(result.optimization)] if optimize else []
+    if wcet_budget is not None:
+        report += check_timing(result, wcet_budget, loop_bounds)
+
+    write_outputs(input_paths[0], output_path, file_extension, force, output_formats, result.text,
+                  result.rom, result.high_z, result.constant_pool)
+
+    return '\n'.join(report) if report else None
+
+def try_assemble_file(input_path:str, *args) -> Tuple[str, Optional[str], Optional[str]]:
+    '''
+        Function to assemble a single .asm file, collecting the error instead of raising it so
+        that a failing file doesn't abort the other files of a batch.
+
+        Returns:
+            input_path: Path to the input .asm file.
+            error: String describing the error, None if the file was assembled successfully.
+            report: String corresponding to the optimization report, if any.
+    '''
+    try:
+        return input_path, None, assemble_file(input_path, *args)
+
+    except Exception as e:
+        return input_path, f'{type(e).__name__}: {e}', None
+
 def main():
     # Parse command line arguments
     args = arg_parse()
-    input_path = args.input
+    input_paths = utils.expand_inputs(args.input, const.ASSEMBLY_FILE_EXTENSION)
+    write_object = args.object
+    link = args.link
     output_path = args.output
     file_extension = args.extension
     force = args.force
+    jobs = args.jobs
+    cache_dir = args.cache
+    cache_size = args.cache_size
+    output_formats = list(dict.fromkeys(args.format))
+    write_source_map = args.source_map
+    optimize = args.optimize
+    wcet_budget = args.wcet_budget
+    target = targets.get_target(args.target)
 
-    # Check if input file exists.
-    if not os.path.exists(input_path):
-        print(f'Input file {input_path} does not exists.')
+    try:
+        loop_bounds = {label.upper() : int(bound) for label, bound in (loop_bound.split('=') for loop_bound in args.loop_bound)}
+    except ValueError:
+        print(f'Loop bounds must be given as LABEL=N but got {" ".join(args.loop_bound)}.')
         sys.exit(1)
 
-    # Check if input file has the valid file extension
-    if not input_path.endswith(const.ASSEMBLY_FILE_EXTENSION):
-        print(f'File extension {os.path.splitext(input_path)[-1]} is not supported. Use {const.ASSEMBLY_FILE_EXTENSION} instead.')
+    if jobs is not None and jobs < 1:
+        print(f'Number of processes must be at least 1 but got {jobs}.')
         sys.exit(1)
 
-    # Open program.
-    program = utils.read_asm(input_path)
+    if not input_paths:
+        print(f'No input files found for {" ".join(args.input)}.')
+        sys.exit(1)
 
-    # Remove comments and white space.
-    program = utils.clean_program(program)
+    if write_object and link:
+        print('Object files can\'t be written while linking. Use --object and --link in separate runs.')
+        sys.exit(1)
 
-    # Get label mapping.
-    program, label_dict = utils.get_labels(program)
+    if link and write_source_map:
+        print('Source maps are not supported when linking.')
+        sys.exit(1)
 
-    # Parse program and update label mapping.
-    program, label_dict = parse_tokens(program, label_dict)
+    # Link all input files into a single ROM.
+    if link:
+        try:
+            report = link_files(input_paths, output_path, file_extension, force, output_formats, optimize, wcet_budget, loop_bounds, target)
+        except Exception as e:
+            print(f'{type(e).__name__}: {e}')
+            sys.exit(1)
 
-    # Replace labels with mapped addresses.
-    program = utils.insert_labels(program, label_dict)
+        if report is not None:
+            print(report)
+        sys.exit(0)
 
-    # Insert interrupt addresses as needed.
-    functions = []
-    if const.MOUSE_INTERRUPT in label_dict:
-        functions.append(([utils.hex_format(label_dict[const.MOUSE_INTERRUPT])], const.MOUSE_INTERRUPT_ADDR))
-    
-    if const.TIMER_INTERRUPT in label_dict:
-        functions.append(([utils.hex_format(label_dict[const.TIMER_INTERRUPT])], const.TIMER_INTERRUPT_ADDR))
+    if output_path and len(input_paths) > 1:
+        print(f'Output file can only be provided for a single input file but got {len(input_paths)} input files.')
+        sys.exit(1)
 
-    program = utils.insert_functions(program, functions)
+    # Assemble files, in parallel when more than one file and process is available.
+    tasks = [(input_path, output_path, file_extension, force, cache_dir, cache_size, output_formats, write_source_map, optimize, wcet_budget, loop_bounds, target, write_object) for input_path in input_paths]
 
-    # Check for provided output file. If not provided, generate it from the input file.
-    if not output_path:
-        if not file_extension.startswith('.'):
-            output_path = os.path.splitext(input_path)[0] + '.' + file_extension
-        else:
-             output_path = os.path.splitext(input_path)[0] + file_extension
+    if len(tasks) == 1 or jobs == 1:
+        results = [try_assemble_file(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(try_assemble_file, *zip(*tasks)))
 
-    # Check for existing output file.
-    if not force and os.path.exists(output_path):
-        print(f'File {output_path} already exists! Pass the "--force" argument to force overwriting it.')
-        sys.exit(1)
+    # Report optimizations and errors per file.
+    for input_path, _, report in results:
+        if report is not None:
+            print(report if len(results) == 1 else f'{input_path}: {report}')
+
+    errors = [(input_path, error) for input_path, error, _ in results if error is not None]
+    for input_path, error in errors:
+        print(error if len(results) == 1 else f'{input_path}: {error}')
+
+    if len(results) > 1:
+        print(f'Assembled {len(results) - len(errors)}/{len(results)} files.')
 
-    # Save program
-    utils.generate_rom(program, output_path)
-    sys.exit(0)
+    sys.exit(1 if errors else 0)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
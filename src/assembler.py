@@ -0,0 +1,138 @@
+import utils
+import instructions as inst
+from instructions import Instruction
+from token_parser import iter_tokens, scan_program
+from source_map import SourceMap
+from targets import DEFAULT_TARGET, Target
+from optimizer import OptimizationReport, optimize as optimize_program, resolve_labels
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+class AssemblyResult(NamedTuple):
+    '''
+        Result of assembling a program.
+
+        Attributes:
+            rom: bytearray corresponding to the ROM image, one byte per ROM address.
+            labels: Dictionary mapping the labels to their ROM address.
+            high_z: Set of ROM addresses whose upper nibble is high impedance (Z), see utils.generate_image.
+            layout: List of (ROM address, instruction) pairs of the program, including interrupt vectors.
+            text: String corresponding to the annotated content of the .mem file, None if not requested.
+            source_map: SourceMap from ROM address to source position, None if the positions are unknown.
+            optimization: OptimizationReport of the peephole optimizer, None if not optimized.
+            constant_pool: Dictionary mapping the values of the LI instructions to their RAM address.
+            ram: bytearray corresponding to the initial RAM image holding the constant pool, None without LI instructions.
+            target: Target the program is assembled for.
+    '''
+    rom: bytearray
+    labels: Dict[str, int]
+    high_z: FrozenSet[int]
+    layout: List[Tuple[int, Instruction]]
+    text: Optional[str] = None
+    source_map: Optional[SourceMap] = None
+    optimization: Optional[OptimizationReport] = None
+    constant_pool: Optional[Dict[int, int]] = None
+    ram: Optional[bytearray] = None
+    target: Target = DEFAULT_TARGET
+
+def assemble(source:Union[str, Iterable[str]], annotate:bool=False, filename:str='<source>',
+             optimize:bool=False, target:Target=DEFAULT_TARGET) -> AssemblyResult:
+    '''
+        Function to assemble a program in-process, without reading or writing any file.
+
+        Parameters:
+            source: String corresponding to the assembly source or iterable of its lines.
+            annotate (optional): Flag to also render the annotated .mem file content.
+            filename (optional): Name of the source used in the source map.
+            optimize (optional): Flag to apply the peephole optimizer, see optimizer.optimize.
+            target (optional): Core the program is assembled for, see targets.Target.
+
+        Returns:
+            AssemblyResult with the ROM image and the label table of the program.
+
+        Raises:
+            InvalidLabelException, InvalidTokenException, InvalidArgumentException,
+            InvalidRegisterException, InvalidAddressException or InvalidProgramSizeException
+            if the program is not valid.
+    '''
+    if isinstance(source, str):
+        source = source.splitlines()
+    else:
+        source = list(source)
+
+    return assemble_program(utils.Stream(source, utils.iter_clean), annotate, utils.iter_source_positions(source), filename, optimize, target)
+
+def assemble_program(program:Iterable[str], annotate:bool=False, positions:Optional[Iterable[Tuple[int, int]]]=None,
+                     filename:str='<source>', optimize:bool=False, target:Target=DEFAULT_TARGET) -> AssemblyResult:
+    '''
+        Function to assemble a cleaned program, e.g. the output of utils.clean_program. The program
+        is read in two streaming passes, so it can be a utils.Stream over the file instead of a list:
+        only the label table and the constant pool are kept between the passes.
+
+        Parameters:
+            program: Re-iterable of string corresponding to the cleaned lines of the program.
+            annotate (optional): Flag to also render the annotated .mem file content.
+            positions (optional): (line, column) of each line of the program in the source, see
+                                  utils.get_source_positions. The source map is only built if provided.
+            filename (optional): Name of the source used in the source map.
+            optimize (optional): Flag to apply the peephole optimizer, see optimizer.optimize.
+            target (optional): Core the program is assembled for, see targets.Target.
+
+        Returns:
+            AssemblyResult with the ROM image and the label table of the program.
+    '''
+    # First pass: label addresses and constant pool.
+    label_to_idx_dict = dict()
+    label_dict, constant_pool = scan_program(utils.iter_labels(program, label_to_idx_dict), target)
+
+    # Second pass: parse program.
+    program = list(iter_tokens((line for _, line in utils.iter_labels(program)), label_dict, constant_pool, target))
+
+    if positions is not None:
+        for instruction, position in zip(program, positions):
+            instruction.position = position
+
+    return build_result(program, label_to_idx_dict, constant_pool, annotate, filename if positions is not None else None,
+                        optimize, target, label_dict)
+
+def build_result(program:List[Instruction], label_to_idx_dict:Dict[str, int], constant_pool:Dict[int, int],
+                 annotate:bool=False, filename:Optional[str]=None, optimize:bool=False,
+                 target:Target=DEFAULT_TARGET, label_dict:Optional[Dict[str, int]]=None) -> AssemblyResult:
+    '''
+        Function to lay out a parsed program in the ROM, e.g. the output of token_parser.iter_tokens
+        or of the linker, placing the interrupt vectors and rendering the ROM and RAM images.
+
+        Parameters:
+            program: List of instructions of the program, with the operands of the LI instructions resolved.
+            label_to_idx_dict: Label to index in the program mapping.
+            constant_pool: Value to RAM address mapping of the program.
+            annotate (optional): Flag to also render the annotated .mem file content.
+            filename (optional): Name of the source used in the source map. The source map is only built if provided.
+            optimize (optional): Flag to apply the peephole optimizer, see optimizer.optimize.
+            target (optional): Core the program is assembled for, see targets.Target.
+            label_dict (optional): Label to ROM address mapping, if the operands of the B-Type instructions
+                                   are already resolved. Resolved with optimizer.resolve_labels otherwise.
+
+        Returns:
+            AssemblyResult of the program.
+    '''
+    # Rewrite redundant instructions, then resolve the labels again.
+    optimization = None
+    if optimize:
+        program, label_to_idx_dict, optimization = optimize_program(program, label_to_idx_dict, target.ram_size)
+        label_dict = None
+
+    if label_dict is None:
+        label_dict = resolve_labels(program, label_to_idx_dict)
+
+    # Insert interrupt addresses as needed.
+    functions = [(inst.vector(label_dict[label], target.operand_bytes), addr)
+                 for label, addr in target.vectors.items() if label in label_dict]
+
+    layout = utils.insert_functions(program, functions, target.rom_size)
+
+    rom, high_z = utils.generate_image(layout, target.rom_size)
+    text = utils.render_rom(layout, target.rom_size) if annotate else None
+    source_map = SourceMap.from_layout(layout, filename, target.rom_size) if filename is not None else None
+    ram = utils.generate_ram_image(constant_pool, target.ram_size) if constant_pool else None
+
+    return AssemblyResult(rom, label_dict, high_z, layout, text, source_map, optimization, constant_pool, ram, target)
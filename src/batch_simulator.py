@@ -0,0 +1,259 @@
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError('The batch simulator requires NumPy, which is an optional dependency of the '
+                      'assembler. Install it with "pip install numpy".') from e
+from typing import Dict, FrozenSet, Optional, Sequence, Union
+from simulator import *
+from constants import *
+import exceptions as exc
+
+class BatchSimulator:
+    '''
+        Lockstep simulator running the same ROM on many machines, or lanes, at once, e.g. against
+        thousands of initial RAM images and input values. The state of the lanes is held in NumPy
+        arrays and every instruction is executed on all the lanes at its address at once.
+
+        Lanes taking different sides of a branch or returning to different addresses diverge.
+        The lanes at the lowest ROM address run first while the other lanes wait, masked out,
+        so that diverged lanes meet again at the end of an if/else or of a loop and run together.
+
+        The memory mapped peripherals hold the last value written to them, as in Simulator
+        without peripheral models, so the input values (e.g. slide switches or mouse position)
+        are set per lane and read by the program. Interrupts are not supported: a lane stops
+        when it goes idle.
+
+        Attributes:
+            lanes: Number of lanes.
+            program: Decoded ROM, see Simulator.decode.
+            memory: N x BUS_SIZE matrix with the RAM of each lane, followed by its peripheral registers.
+            a, b: Values of the A and B registers of each lane.
+            pc: Program counter of each lane.
+            context: Return address saved by the last function call of each lane.
+            idle: True for the lanes which went idle.
+            faulted: True for the lanes which fetched a byte that is not an instruction.
+            instructions: Number of instructions executed by each lane.
+            cycles: Estimated number of clock cycles of the instructions executed by each lane.
+    '''
+
+    def __init__(self, rom:Union[bytes, bytearray], high_z:FrozenSet[int]=frozenset(),
+                 rams:Optional[Sequence[Union[bytes, bytearray]]]=None, lanes:Optional[int]=None,
+                 inputs:Optional[Dict[int, Sequence[int]]]=None, target:Target=DEFAULT_TARGET):
+        '''
+            Parameters:
+                rom: ROM image, e.g. the rom of an AssemblyResult.
+                high_z (optional): Set of ROM addresses with a high impedance upper nibble.
+                rams (optional): Initial content of the RAM of each lane, e.g. the images written by
+                                 utils.generate_ram, or a uint8 matrix with a row per lane. Zero by default.
+                lanes (optional): Number of lanes, only needed if rams is not given.
+                inputs (optional): Dictionary mapping peripheral addresses to the value read by each lane.
+                target (optional): Core the ROM image is assembled for, see targets.Target.
+
+            Raises:
+                InvalidArgumentException if the number of lanes is not given or doesn't match.
+                InvalidProgramSizeException if the ROM or a RAM image doesn't fit in the memory.
+                InvalidAddressException if an input address is not a memory mapped peripheral address.
+        '''
+        self.target = target
+        self.program = Simulator(rom, high_z, target=target).program
+        self._tables = {id(table) : np.frombuffer(table, dtype=np.uint8)
+                        for _, table, _, _, _ in self.program if table is not None}
+
+        if lanes is None and rams is None:
+            raise exc.InvalidArgumentException('Either the RAM images or the number of lanes must be given.')
+
+        self.lanes = len(rams) if lanes is None else lanes
+        if rams is not None and len(rams) != self.lanes:
+            raise exc.InvalidArgumentException(f'Got {len(rams)} RAM images for {self.lanes} lanes.')
+
+        # Initial content of the memory of each lane, restored on reset.
+        memory = np.zeros((self.lanes, BUS_SIZE), dtype=np.uint8)
+
+        if rams is not None:
+            for lane, ram in enumerate(rams):
+                if len(ram) > target.ram_size:
+                    raise exc.InvalidProgramSizeException(f'RAM image of lane {lane} is {len(ram)} bytes for {target.ram_size} bytes RAM.')
+                memory[lane, :len(ram)] = np.frombuffer(bytes(ram), dtype=np.uint8)
+
+        for addr, values in (inputs or dict()).items():
+            if not target.ram_size <= addr < BUS_SIZE:
+                raise exc.InvalidAddressException(f'Input address {addr:02X} is not a memory mapped peripheral address.')
+            memory[:, addr] = values
+
+        self._initial_memory = memory
+        self.reset()
+
+    @classmethod
+    def from_result(cls, result, rams:Optional[Sequence[Union[bytes, bytearray]]]=None,
+                    lanes:Optional[int]=None, inputs:Optional[Dict[int, Sequence[int]]]=None) -> 'BatchSimulator':
+        '''
+            Function to create a batch simulator from the result of assembler.assemble. The constant
+            pool of the program is loaded into the RAM of every lane, over the given RAM images if any.
+        '''
+        simulator = cls(result.rom, result.high_z, rams, lanes, inputs, result.target)
+
+        if result.constant_pool:
+            for value, addr in result.constant_pool.items():
+                simulator._initial_memory[:, addr] = value
+            simulator.reset()
+
+        return simulator
+
+    def reset(self) -> None:
+        '''
+            Function to reset the processors and the memories of all lanes to their initial state.
+        '''
+        self.memory = self._initial_memory.copy()
+        self.a = np.zeros(self.lanes, dtype=np.uint8)
+        self.b = np.zeros(self.lanes, dtype=np.uint8)
+        self.pc = np.zeros(self.lanes, dtype=np.intp)
+        self.context = np.zeros(self.lanes, dtype=np.intp)
+        self.idle = np.zeros(self.lanes, dtype=bool)
+        self.faulted = np.zeros(self.lanes, dtype=bool)
+        self.instructions = np.zeros(self.lanes, dtype=np.int64)
+        self.cycles = np.zeros(self.lanes, dtype=np.int64)
+
+    @property
+    def ram(self) -> np.ndarray:
+        '''
+            N x RAM size view of the RAM of each lane.
+        '''
+        return self.memory[:, :self.target.ram_size]
+
+    def run(self, max_instructions:Optional[int]=None) -> int:
+        '''
+            Function to execute instructions until every lane is idle or faulted, or has executed
+            the given number of instructions. Programs looping forever need an instruction limit.
+
+            Parameters:
+                max_instructions (optional): Maximum number of instructions executed by each lane, unlimited by default.
+
+            Returns:
+                Number of lane-instructions executed, i.e. the sum over the lanes of their executed instructions.
+        '''
+        program = self.program
+        tables = self._tables
+        memory, a, b, pc, context = self.memory, self.a, self.b, self.pc, self.context
+        all_lanes = np.arange(self.lanes)
+
+        executed = np.zeros(self.lanes, dtype=np.int64)
+        spent = np.zeros(self.lanes, dtype=np.int64)
+        running = ~(self.idle | self.faulted)
+        if max_instructions is not None and max_instructions <= 0:
+            running[:] = False
+
+        grouped = False
+        while True:
+            # Form the group of the running lanes at the lowest address. The lanes in the group share
+            # their program counter, kept in addr until the group is left.
+            if not grouped:
+                lanes = np.flatnonzero(running)
+                if len(lanes) == 0: break
+
+                pcs = pc[lanes]
+                addr = int(pcs.min())
+                waiting = pcs[pcs != addr]
+                lanes = lanes[pcs == addr]
+
+                # The group is left when it reaches the address of a waiting lane, to run together.
+                merge_addr = int(waiting.min()) if len(waiting) else self.target.rom_size
+                if len(lanes) == self.lanes:
+                    select, rows = slice(None), all_lanes
+                else:
+                    select, rows = lanes, lanes
+
+                steps = 0
+                group_cycles = 0
+                budget = None if max_instructions is None else max_instructions - int(executed[select].max())
+                grouped = True
+
+            kind, table, operand, cost, next_pc = program[addr]
+            leave = False
+            split = False
+
+            if kind == ALU_A:
+                a[select] = tables[id(table)][(a[select].astype(np.intp) << 8) | b[select]]
+                addr = next_pc
+            elif kind == ALU_B:
+                b[select] = tables[id(table)][(a[select].astype(np.intp) << 8) | b[select]]
+                addr = next_pc
+            elif kind == LOAD_A or kind == LOAD_A_IO:
+                a[select] = memory[select, operand]
+                addr = next_pc
+            elif kind == LOAD_B or kind == LOAD_B_IO:
+                b[select] = memory[select, operand]
+                addr = next_pc
+            elif kind == STORE_A or kind == STORE_A_IO:
+                memory[select, operand] = a[select]
+                addr = next_pc
+            elif kind == STORE_B or kind == STORE_B_IO:
+                memory[select, operand] = b[select]
+                addr = next_pc
+            elif kind == DEREF_A:
+                a[select] = memory[rows, a[select]]
+                addr = next_pc
+            elif kind == DEREF_B:
+                b[select] = memory[rows, b[select]]
+                addr = next_pc
+            elif kind == BRANCH:
+                taken = tables[id(table)][(a[select].astype(np.intp) << 8) | b[select]].astype(bool)
+                if taken.all():
+                    addr = operand
+                elif not taken.any():
+                    addr = next_pc
+                else:
+                    # Divergent branch: the lanes going to the lowest address continue, the others wait.
+                    addr, other = min(operand, next_pc), max(operand, next_pc)
+                    stay = taken if addr == operand else ~taken
+                    split = True
+            elif kind == GOTO:
+                addr = operand
+            elif kind == CALL:
+                context[select] = next_pc
+                addr = operand
+            elif kind == RETURN:
+                addr = context[select]
+                leave = bool((addr != addr[0]).any())
+                if not leave:
+                    addr = int(addr[0])
+            elif kind == IDLE:
+                self.idle[select] = True
+                running[select] = False
+                addr = next_pc
+                leave = True
+            else:
+                # Invalid instruction, the lanes stop at its address without executing it.
+                self.faulted[select] = True
+                running[select] = False
+                steps -= 1
+                group_cycles -= cost
+                leave = True
+
+            steps += 1
+            group_cycles += cost
+
+            if split:
+                executed[select] += steps
+                spent[select] += group_cycles
+                if max_instructions is not None:
+                    running[select] &= executed[select] < max_instructions
+                    budget -= steps
+                steps = 0
+                group_cycles = 0
+
+                pc[rows[~stay]] = other
+                select = rows = rows[stay]
+                merge_addr = min(merge_addr, other)
+
+            if leave or steps == budget or addr >= merge_addr:
+                pc[select] = addr
+                executed[select] += steps
+                spent[select] += group_cycles
+                if max_instructions is not None:
+                    running[select] &= executed[select] < max_instructions
+                grouped = False
+
+        self.instructions += executed
+        self.cycles += spent
+
+        return int(executed.sum())
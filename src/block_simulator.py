@@ -0,0 +1,287 @@
+import sys
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional, Tuple
+from simulator import *
+from constants import *
+import exceptions as exc
+
+# Python expression of each ALU operation on the registers a and b.
+ALU_EXPRESSIONS = {
+    ALU_OPS.ADD   : '(a + b) & 255',
+    ALU_OPS.SUB   : '(a - b) & 255',
+    ALU_OPS.MUL   : '(a * b) & 255',
+    ALU_OPS.SL_A  : '(a << 1) & 255',
+    ALU_OPS.SR_A  : 'a >> 1',
+    ALU_OPS.INC_A : '(a + 1) & 255',
+    ALU_OPS.INC_B : '(b + 1) & 255',
+    ALU_OPS.DEC_A : '(a - 1) & 255',
+    ALU_OPS.DEC_B : '(b - 1) & 255',
+    ALU_OPS.EQ    : 'int(a == b)',
+    ALU_OPS.GT    : 'int(a > b)',
+    ALU_OPS.LT    : 'int(a < b)',
+    ALU_OPS.AND   : 'a & b',
+    ALU_OPS.OR    : 'a | b',
+    ALU_OPS.XOR   : 'a ^ b',
+    ALU_OPS.NOT_A : '~a & 255',
+    ALU_OPS.OUT_A : 'a'
+}
+
+# Python condition of each branch type.
+BRANCH_CONDITIONS = {
+    BRANCH_TYPES.EQ : 'a == b',
+    BRANCH_TYPES.GT : 'a > b',
+    BRANCH_TYPES.LT : 'a < b'
+}
+
+# Instruction kinds ending a trace.
+TERMINATORS = {BRANCH, GOTO, CALL, RETURN, IDLE}
+
+# Maximum number of instructions of a trace, the rest of the code is compiled into the next trace.
+MAX_TRACE_INSTRUCTIONS = 256
+
+class Block(NamedTuple):
+    '''
+        Trace of basic blocks compiled into a Python function.
+
+        Attributes:
+            function: Function (a, b, context, ram, simulator, budget) -> (a, b, pc, context, instructions, cycles)
+                      executing the trace. Traces jumping back to their own start loop inside the
+                      function while the next pass stays within the budget of instructions.
+            instructions: Maximum number of instructions of one pass through the trace.
+            idle: True if the trace ends with an IDLE instruction and has no other exit.
+    '''
+    function: Callable
+    instructions: int
+    idle: bool
+
+# Maximum number of ROM images whose compiled traces are kept in BLOCK_CACHE.
+BLOCK_CACHE_SIZE = 64
+
+# Compiled traces of the most recently simulated ROM images, indexed by ROM image, target, addresses
+# claimed by peripherals and start address, least recently used first.
+BLOCK_CACHE:'OrderedDict[Tuple[bytes, FrozenSet[int], Target, FrozenSet[int]], Dict[int, Block]]' = OrderedDict()
+
+def compile_block(simulator:Simulator, start:int) -> Optional[Block]:
+    '''
+        Function to compile the trace starting at the given ROM address. Basic blocks are chained
+        into the trace by following the fall through of the branches, the jumps, the function
+        calls and the returns from the functions called inside the trace, until an IDLE instruction,
+        a return to an unknown address or an address already in the trace. A branch or jump back
+        to the start of the trace becomes a loop inside the compiled function, other branches
+        leave the function. Peripheral addresses not claimed by an attached peripheral are
+        accessed directly.
+
+        Parameters:
+            simulator: Simulator holding the decoded ROM and the attached peripherals.
+            start: ROM address of the first instruction of the trace.
+
+        Returns:
+            Compiled trace, None if the first instruction is not valid.
+    '''
+    program = simulator.program
+    bus = simulator.bus
+    ram_size = len(simulator.ram)
+    lines = [f'def block_{start:02X}(a, b, context, ram, simulator, budget):',
+             f'    n = 0',
+             f'    c = 0',
+             f'    while True:']
+    pc = start
+    instructions = 0
+    cycles = 0
+    exits = 0
+    visited = set()
+
+    # Return address of the functions called inside the trace, None if it is only known at run time.
+    return_addr = None
+
+    def leave(target, indent:str='        ') -> str:
+        return f'{indent}return a, b, {target}, context, n + {instructions}, c + {cycles}'
+
+    def loop(indent:str='        ') -> str:
+        return (f'{indent}n += {instructions}; c += {cycles}\n'
+                f'{indent}if n + MAX_INSTRUCTIONS <= budget: continue\n'
+                f'{indent}return a, b, {start}, context, n, c')
+
+    while instructions < MAX_TRACE_INSTRUCTIONS:
+        if pc in visited:
+            break
+
+        kind, _, operand, cost, next_pc = program[pc]
+        opcode = simulator.rom[pc]
+
+        # Leave invalid instructions to the interpreter, which raises the error.
+        if kind == INVALID: break
+
+        # Keep IDLE in its own trace when the trace can leave before it, so traces are either idle or not.
+        if kind == IDLE and exits: break
+
+        visited.add(pc)
+        instructions += 1
+        cycles += cost
+
+        if kind == ALU_A or kind == ALU_B:
+            op_code = ALU_OPS.OUT_A if pc in simulator.high_z else opcode >> 4
+            lines.append(f'        {"a" if kind == ALU_A else "b"} = {ALU_EXPRESSIONS[op_code]}')
+        elif kind == LOAD_A:     lines.append(f'        a = ram[{operand}]')
+        elif kind == LOAD_B:     lines.append(f'        b = ram[{operand}]')
+        elif kind == STORE_A:    lines.append(f'        ram[{operand}] = a')
+        elif kind == STORE_B:    lines.append(f'        ram[{operand}] = b')
+        elif kind == LOAD_A_IO:  lines.append(f'        a = read_io({operand})' if bus[operand] else f'        a = io[{operand}]')
+        elif kind == LOAD_B_IO:  lines.append(f'        b = read_io({operand})' if bus[operand] else f'        b = io[{operand}]')
+        elif kind == STORE_A_IO: lines.append(f'        write_io({operand}, a)' if bus[operand] else f'        io[{operand}] = a')
+        elif kind == STORE_B_IO: lines.append(f'        write_io({operand}, b)' if bus[operand] else f'        io[{operand}] = b')
+        elif kind == DEREF_A:    lines.append(f'        a = ram[a] if a < {ram_size} else read_io(a)')
+        elif kind == DEREF_B:    lines.append(f'        b = ram[b] if b < {ram_size} else read_io(b)')
+        elif kind == BRANCH:
+            lines.append(f'        if {BRANCH_CONDITIONS[opcode >> 4]}:')
+            lines.append(loop('            ') if operand == start else leave(operand, indent='            '))
+            exits += 1
+            pc = next_pc
+            continue
+        elif kind == GOTO:
+            if operand == start:
+                lines.append(loop())
+                return _make_block(lines, start, instructions, False)
+            pc = operand
+            continue
+        elif kind == CALL:
+            return_addr = next_pc
+            lines.append(f'        context = {next_pc}')
+            pc = operand
+            continue
+        elif kind == RETURN:
+            if return_addr is None:
+                lines.append(leave('context'))
+                return _make_block(lines, start, instructions, False)
+            pc, return_addr = return_addr, None
+            continue
+        elif kind == IDLE:
+            lines.append(leave(next_pc))
+            return _make_block(lines, start, instructions, True)
+        else:
+            raise exc.ImplementationErrorException(f'Instruction kind {kind} is not compiled!')
+
+        pc = next_pc
+
+    if instructions == 0:
+        return None
+
+    # Trace stops before an invalid instruction, an address already in the trace or at the size limit.
+    lines.append(loop() if pc == start else leave(pc))
+    return _make_block(lines, start, instructions, False)
+
+def _make_block(lines, start:int, instructions:int, idle:bool) -> Block:
+    # Look up the peripheral accessors once per call instead of once per access.
+    if any('_io(' in line for line in lines):
+        lines.insert(1, '    read_io, write_io = simulator.read_io, simulator.write_io')
+    if any('io[' in line for line in lines):
+        lines.insert(1, '    io = simulator.io')
+
+    namespace = {'MAX_INSTRUCTIONS' : instructions}
+    exec(compile('\n'.join(lines), f'<block {start:02X}>', 'exec'), namespace)
+    return Block(namespace[f'block_{start:02X}'], instructions, idle)
+
+class BlockSimulator(Simulator):
+    '''
+        Simulator executing traces of basic blocks compiled into Python functions instead of
+        interpreting one instruction at a time. Traces are compiled the first time they are
+        executed and cached per ROM image and attached peripherals, so they are only compiled
+        again if the ROM or the peripherals change. Only the traces of the BLOCK_CACHE_SIZE most
+        recently simulated ROM images are kept.
+
+        Falls back to the interpreter of Simulator when the instruction limit ends inside a block.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._blocks_rom = None
+        self._blocks_bus = None
+        self.blocks = None
+
+    def _get_blocks(self) -> Dict[int, Block]:
+        '''
+            Function to get the compiled traces of the current ROM and peripherals, decoding the ROM
+            again if it changed.
+        '''
+        if self.rom != self._blocks_rom or self.bus != self._blocks_bus:
+            if self.rom != self._blocks_rom:
+                self._blocks_rom = bytes(self.rom)
+                self.program = self.decode()
+            self._blocks_bus = list(self.bus)
+            claimed = frozenset(addr for addr, peripheral in enumerate(self.bus) if peripheral is not None)
+            key = (self._blocks_rom, self.high_z, self.target, claimed)
+
+            self.blocks = BLOCK_CACHE.pop(key, None)
+            if self.blocks is None:
+                self.blocks = dict()
+            BLOCK_CACHE[key] = self.blocks
+            if len(BLOCK_CACHE) > BLOCK_CACHE_SIZE:
+                BLOCK_CACHE.popitem(last=False)
+
+        return self.blocks
+
+    def run(self, max_instructions:Optional[int]=None, until:Optional[int]=None) -> int:
+        '''
+            Function to execute instructions until the processor goes idle with no pending
+            interrupts or the instruction limit is reached.
+
+            Parameters:
+                max_instructions (optional): Maximum number of instructions to execute, unlimited by default.
+                until (optional): Simulated time in clock cycles up to which the idle processor skips
+                                  ahead to the next scheduled event.
+
+            Returns:
+                Number of executed instructions.
+
+            Raises:
+                InvalidInstructionException if the processor fetches a byte that is not an instruction.
+        '''
+        if self.profiler is not None:
+            return self.profiler.run(self, max_instructions, until)
+
+        blocks = self._get_blocks()
+
+        if self.idle and not self._service_interrupt(until):
+            return 0
+
+        ram = self.ram
+        a, b, pc, context = self.a, self.b, self.pc, self.context
+        limit = sys.maxsize if max_instructions is None else max_instructions
+        count = 0
+        cycles = 0
+
+        try:
+            while True:
+                block = blocks.get(pc)
+                if block is None:
+                    block = compile_block(self, pc)
+
+                    # Invalid instruction, let the interpreter raise the error.
+                    if block is None: break
+                    blocks[pc] = block
+
+                # Only run traces that can't go over the instruction limit.
+                budget = limit - count
+                if budget < block.instructions: break
+
+                a, b, pc, context, executed, executed_cycles = block.function(a, b, context, ram, self, budget)
+                count += executed
+                cycles += executed_cycles
+
+                if block.idle:
+                    self.cycles += cycles
+                    cycles = 0
+                    self.pc = pc
+                    self.idle = True
+                    if not self._service_interrupt(until):
+                        return count
+                    pc = self.pc
+
+        finally:
+            self.a, self.b, self.pc, self.context = a, b, pc, context
+            self.instructions += count
+            self.cycles += cycles
+
+        # Finish with the interpreter.
+        remaining = None if max_instructions is None else max_instructions - count
+        return count + super().run(remaining, until)
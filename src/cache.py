@@ -0,0 +1,109 @@
+import os
+import hashlib
+import tempfile
+from typing import Iterable, Optional
+from targets import DEFAULT_TARGET, Target
+from constants import ASSEMBLER_VERSION, CACHE_FILE_EXTENSION
+
+def get_cache_key(program:Iterable[str], optimize:bool=False, target:Target=DEFAULT_TARGET) -> str:
+    '''
+        Function to compute the cache key of a cleaned program. White space inside the lines is
+        normalised, so white space and comment only edits of the source map to the same key.
+
+        Parameters:
+            program: List of string corresponding to the cleaned lines of the program, e.g. the
+                     output of utils.clean_program.
+            optimize (optional): Flag indicating that the program is assembled with the optimizer.
+            target (optional): Target the program is assembled for.
+
+        Returns:
+            String corresponding to the HEX digest of the key.
+    '''
+    digest = hashlib.sha256()
+    digest.update(f'{ASSEMBLER_VERSION}:{target.rom_addr_width}:{target.rom_size}:{target.ram_addr_width}:{target.ram_size}:'
+                  f'{target.operand_bytes}:{target.mouse_vector:X}:{target.timer_vector:X}:{int(optimize)}\n'.encode())
+
+    for line in program:
+        digest.update(' '.join(line.split()).encode())
+        digest.update(b'\n')
+
+    return digest.hexdigest()
+
+def load(cache_dir:str, key:str) -> Optional[str]:
+    '''
+        Function to load a cached ROM. A hit marks the entry as most recently used.
+
+        Parameters:
+            cache_dir: Path to the cache directory.
+            key: Cache key of the program, see get_cache_key.
+
+        Returns:
+            String corresponding to the content of the ROM file, None if the key is not cached.
+    '''
+    path = os.path.join(cache_dir, key + CACHE_FILE_EXTENSION)
+
+    try:
+        with open(path, 'r') as f:
+            rom = f.read()
+    except FileNotFoundError:
+        return None
+
+    # Access time is not reliable (e.g. noatime mounts), use modification time for LRU order.
+    os.utime(path)
+    return rom
+
+def store(cache_dir:str, key:str, rom:str, max_size:int) -> None:
+    '''
+        Function to store a ROM in the cache and evict the least recently used entries until
+        the cache fits in the given size. Entries are written atomically, so the cache can be
+        shared by concurrent assembler processes.
+
+        Parameters:
+            cache_dir: Path to the cache directory.
+            key: Cache key of the program, see get_cache_key.
+            rom: String corresponding to the content of the ROM file.
+            max_size: Maximum size of the cache in bytes.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(rom)
+        os.replace(tmp_path, os.path.join(cache_dir, key + CACHE_FILE_EXTENSION))
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+    evict(cache_dir, max_size)
+
+def evict(cache_dir:str, max_size:int) -> None:
+    '''
+        Function to remove the least recently used entries until the cache fits in the given size.
+
+        Parameters:
+            cache_dir: Path to the cache directory.
+            max_size: Maximum size of the cache in bytes.
+    '''
+    entries = []
+    total_size = 0
+
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.name.endswith(CACHE_FILE_EXTENSION): continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total_size <= max_size: break
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already evicted by a concurrent process.
+            pass
+        total_size -= size
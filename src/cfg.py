@@ -0,0 +1,201 @@
+from instructions import Instruction
+from typing import Dict, List, NamedTuple, Set, Tuple
+from constants import *
+
+# Instructions ending a basic block.
+BRANCHES = {int(INST.BRANCH), int(INST.GOTO), int(INST.FUNC_CALL), int(INST.RETURN), int(INST.GOTO_IDLE)}
+
+# Instructions after which execution never continues with the next instruction. Execution
+# resumes after a FUNC when the function returns, and after an IDLE only with an interrupt.
+NO_FALL_THROUGH = {int(INST.GOTO), int(INST.RETURN), int(INST.GOTO_IDLE)}
+
+# Labels of the entry points of the program, besides address 0.
+ENTRY_LABELS = [MOUSE_INTERRUPT, TIMER_INTERRUPT]
+
+class BasicBlock(NamedTuple):
+    '''
+        Sequence of instructions only entered at its first instruction and only left after its last one.
+
+        Attributes:
+            start: Index of the first instruction in the program.
+            end: Index after the last instruction in the program.
+            successors: Indexes of the blocks execution can continue with, including called functions.
+            falls_through: True if execution can continue with the next block of the program.
+    '''
+    start: int
+    end: int
+    successors: List[int]
+    falls_through: bool
+
+def _inst(instruction:Instruction) -> int:
+    return instruction.opcode & 0xF
+
+class ControlFlowGraph:
+    '''
+        Control flow graph of a parsed program, built from the label table and the B-Type instructions.
+
+        Attributes:
+            program: List of instructions of the program.
+            label_to_idx_dict: Label to index in the program mapping.
+            blocks: List of the basic blocks in program order.
+            block_idx: Index of the block of each instruction.
+            entries: Indexes of the blocks entered at reset or by an interrupt.
+    '''
+
+    def __init__(self, program:List[Instruction], label_to_idx_dict:Dict[str, int]):
+        self.program = program
+        self.label_to_idx_dict = label_to_idx_dict
+
+        # Leaders: first instruction, label targets and instructions after a branch.
+        leaders = {0} | set(label_to_idx_dict.values())
+        leaders |= {idx + 1 for idx, instruction in enumerate(program) if _inst(instruction) in BRANCHES}
+        leaders = sorted(leader for leader in leaders if leader < len(program))
+
+        self.block_idx = [0] * len(program)
+        bounds = list(zip(leaders, leaders[1:] + [len(program)]))
+        for idx, (start, end) in enumerate(bounds):
+            self.block_idx[start:end] = [idx] * (end - start)
+
+        self.blocks = []
+        for idx, (start, end) in enumerate(bounds):
+            last = program[end - 1]
+            successors = []
+
+            if last.label is not None and _inst(last) in BRANCHES:
+                successors.append(self.block_idx[label_to_idx_dict[last.label]])
+
+            falls_through = _inst(last) not in NO_FALL_THROUGH and end < len(program)
+            if falls_through:
+                successors.append(idx + 1)
+
+            self.blocks.append(BasicBlock(start, end, successors, falls_through))
+
+        self.entries = [0] if program else []
+        self.entries += [self.block_idx[label_to_idx_dict[label]] for label in ENTRY_LABELS if label in label_to_idx_dict]
+
+    def reachable(self) -> Set[int]:
+        '''
+            Function to find the blocks reachable from the entry points.
+
+            Returns:
+                Set of the indexes of the reachable blocks.
+        '''
+        reached = set(self.entries)
+        stack = list(self.entries)
+
+        while stack:
+            for successor in self.blocks[stack.pop()].successors:
+                if successor not in reached:
+                    reached.add(successor)
+                    stack.append(successor)
+
+        return reached
+
+def thread_jumps(program:List[Instruction], label_to_idx_dict:Dict[str, int]) -> List[Tuple[Instruction, str, int]]:
+    '''
+        Function to retarget the B-Type instructions jumping to a JUMP to the final target of
+        the chain of jumps. The instructions are updated in place.
+
+        Returns:
+            List of (instruction, new label, number of skipped jumps) of the retargeted instructions.
+    '''
+    threaded = []
+
+    for instruction in program:
+        if instruction.label is None: continue
+
+        label = instruction.label
+        seen = {label}
+        while True:
+            target = program[label_to_idx_dict[label]]
+            if _inst(target) != INST.GOTO or target.label in seen: break
+            label = target.label
+            seen.add(label)
+
+        if label != instruction.label:
+            instruction.label = label
+            threaded.append((instruction, label, len(seen) - 1))
+
+    return threaded
+
+def remove_unreachable(program:List[Instruction], label_to_idx_dict:Dict[str, int]) -> Tuple[List[Instruction], Dict[str, int], List[Instruction]]:
+    '''
+        Function to remove the blocks unreachable from address 0 and from the interrupt handlers.
+        Labels of the removed blocks are dropped.
+
+        Returns:
+            program: List of instructions of the program without the unreachable blocks.
+            label_to_idx_dict: Label to index in the new program mapping.
+            removed: List of the removed instructions.
+    '''
+    graph = ControlFlowGraph(program, label_to_idx_dict)
+    reached = graph.reachable()
+
+    new_program = []
+    new_idx = dict()
+    removed = []
+
+    for idx, block in enumerate(graph.blocks):
+        if idx not in reached:
+            removed += program[block.start:block.end]
+            continue
+
+        new_idx[block.start] = len(new_program)
+        new_program += program[block.start:block.end]
+
+    label_to_idx_dict = {label : new_idx[idx] for label, idx in label_to_idx_dict.items() if idx in new_idx}
+
+    return new_program, label_to_idx_dict, removed
+
+def reorder_blocks(program:List[Instruction], label_to_idx_dict:Dict[str, int]) -> Tuple[List[Instruction], Dict[str, int], List[Instruction]]:
+    '''
+        Function to lay out the blocks so that a block ending with a JUMP is followed by the
+        target of the JUMP, which is then removed. Blocks falling through to the next block,
+        i.e. not ending with JUMP, RETURN or IDLE, are kept together, and the block at address 0
+        stays first.
+
+        Returns:
+            program: List of instructions of the reordered program.
+            label_to_idx_dict: Label to index in the new program mapping.
+            removed: List of the removed JUMP instructions.
+    '''
+    graph = ControlFlowGraph(program, label_to_idx_dict)
+    blocks = graph.blocks
+
+    # Chains of blocks that have to stay together, indexed by their first block.
+    chains = dict()
+    chain = []
+    for idx, block in enumerate(blocks):
+        chain.append(idx)
+        if not block.falls_through:
+            chains[chain[0]] = chain
+            chain = []
+    if chain:
+        chains[chain[0]] = chain
+
+    new_program = []
+    new_idx = dict()
+    removed = []
+    placed = set()
+
+    for head in chains:
+        while head is not None and head not in placed:
+            placed.add(head)
+            chain = chains[head]
+            for idx in chain:
+                new_idx[blocks[idx].start] = len(new_program)
+                new_program += program[blocks[idx].start:blocks[idx].end]
+
+            # Place the chain starting at the target of the final JUMP next, if it is not placed yet.
+            head = None
+            last = new_program[-1]
+            if _inst(last) == INST.GOTO:
+                target = graph.block_idx[label_to_idx_dict[last.label]]
+                if target in chains and target not in placed:
+                    removed.append(new_program.pop())
+                    head = target
+
+    # Labels always start a block, so they move with their block.
+    label_to_idx_dict = {label : new_idx[idx] for label, idx in label_to_idx_dict.items()}
+
+    return new_program, label_to_idx_dict, removed
@@ -4,6 +4,26 @@ from enum import Enum
 # Default file extension.
 ASSEMBLY_FILE_EXTENSION = '.asm'
 DEFAULT_FILE_EXTENSION = '.mem'
+SOURCE_MAP_FILE_EXTENSION = '.map'
+RAM_FILE_EXTENSION = '.ram.mem'
+OBJECT_FILE_EXTENSION = '.obj'
+DISASSEMBLY_FILE_EXTENSION = '.dis'
+
+############################################################
+# Assembler version. Part of the build cache key, update it when the encoding changes.
+ASSEMBLER_VERSION = '1.1.0'
+
+############################################################
+# Build cache
+CACHE_FILE_EXTENSION = '.mem'
+DEFAULT_CACHE_SIZE = 64 * 2 ** 20
+
+############################################################
+# Golden regression tests, see regression.py. Paths are relative to the programs directory.
+REGRESSION_MANIFEST_FILE = 'regression.json'
+GOLDEN_DIR = 'golden'
+GOLDEN_FILE_EXTENSION = '.json'
+REGRESSION_STATE_FILE = '.passed.json'
 
 ############################################################
 # Width and size of ROM
@@ -15,6 +35,11 @@ ROM_SIZE = 2 ** ROM_ADDR_WIDTH
 RAM_ADDR_WIDTH = 7
 RAM_SIZE = 2 ** RAM_ADDR_WIDTH
 
+############################################################
+# Width and size of the data bus, i.e. RAM and memory mapped peripherals
+BUS_ADDR_WIDTH = 8
+BUS_SIZE = 2 ** BUS_ADDR_WIDTH
+
 ############################################################
 # Base addresses
 MOUSE_BASE_ADDR   = int('0xA0', base=16)
@@ -91,6 +116,23 @@ INST = Enum('INST',
             start=0,
             type=int)
 
+# Estimated clock cycles of each instruction, including fetch and decode.
+INST_CYCLES = {
+    INST.READ_MEM_TO_A  : 4,
+    INST.READ_MEM_TO_B  : 4,
+    INST.WRITE_A_TO_MEM : 3,
+    INST.WRITE_B_TO_MEM : 3,
+    INST.ALU_OP_TO_A    : 3,
+    INST.ALU_OP_TO_B    : 3,
+    INST.BRANCH         : 3,
+    INST.GOTO           : 3,
+    INST.GOTO_IDLE      : 1,
+    INST.FUNC_CALL      : 3,
+    INST.RETURN         : 3,
+    INST.DEREF_A        : 4,
+    INST.DEREF_B        : 4
+}
+
 ############################################################
 # Assembly tokens supported by the assembler
 TOKENS = Enum('TOKENS',
@@ -119,7 +161,8 @@ TOKENS = Enum('TOKENS',
                     'IDLE',
                     'FUNC',
                     'RETURN',
-                    'DEREF'],
+                    'DEREF',
+                    'LI'],
               type=str)
 
 # Registers used by the processor
@@ -166,6 +209,10 @@ D_ARG_COUNT = 0
 D_TYPE = {TOKENS.IDLE.name,
           TOKENS.RETURN.name}
 
+# Immediate load pseudo-instruction, e.g. <TOKEN> {A, B} <VALUE>, loading the value from the constant pool
+I_ARG_COUNT = 2
+I_TYPE = {TOKENS.LI.name}
+
 ############################################################
 # Interrupt call labels
 MOUSE_INTERRUPT = 'MOUSE'
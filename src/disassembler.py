@@ -0,0 +1,323 @@
+import os
+import sys
+import utils
+import targets
+import argparse
+import exceptions as exc
+from token_parser import S_ENCODING, R_ENCODING, RR_ENCODING, B_ENCODING, D_ENCODING
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+from constants import *
+
+############################################################
+# Static decoding tables, the inverse of the encoding tables of the token parser. Each entry
+# maps an op-code byte to the (text, operand kind) pair of the instruction, None for bytes
+# the assembler never writes as an op-code.
+
+# Kinds of operands: none, RAM or bus address byte, ROM address of operand_bytes bytes.
+NO_OPERAND, RAM_OPERAND, ROM_OPERAND = range(3)
+
+def _build_decode_tables() -> Tuple[List[Optional[Tuple[str, int]]], Dict[int, Tuple[str, int]]]:
+    '''
+        Function to invert the encoding tables of the token parser.
+
+        Returns:
+            decode_table: (text, operand kind) of each op-code byte, None if the byte is not an op-code.
+            high_z_table: (text, operand kind) of the op-codes with a high impedance upper nibble,
+                          indexed by their lower nibble.
+
+        Raises:
+            ImplementationErrorException if two instructions have the same encoding.
+    '''
+    entries = [(opcode, f'{token} {reg}', RAM_OPERAND) for (token, reg), (opcode, _) in S_ENCODING.items()]
+    entries += [(opcode, f'{token} {reg}', NO_OPERAND) for (token, reg), (opcode, _) in R_ENCODING.items()]
+    entries += [(opcode, f'{token} {target_reg} {source_reg}', NO_OPERAND)
+                for (token, target_reg, source_reg), (opcode, _) in RR_ENCODING.items()]
+    entries += [(opcode, token, ROM_OPERAND) for token, (opcode, _) in B_ENCODING.items()]
+    entries += [(opcode, token, NO_OPERAND) for token, (opcode, _) in D_ENCODING.items()]
+
+    decode_table = [None] * 256
+    high_z_table = dict()
+    for opcode, text, operand_kind in entries:
+        if opcode > 0xFF:
+            table, idx = high_z_table, opcode & 0xF
+        else:
+            table, idx = decode_table, opcode
+
+        if table[idx] if table is decode_table else idx in table:
+            raise exc.ImplementationErrorException(f'Op-code {opcode:X} of {text} is already used by {table[idx][0]}.')
+        table[idx] = (text, operand_kind)
+
+    return decode_table, high_z_table
+
+DECODE_TABLE, HIGH_Z_TABLE = _build_decode_tables()
+
+# Prefixes of the synthesized labels of the jump and branch targets, and of the function calls.
+BRANCH_LABEL_PREFIX = 'L_'
+FUNCTION_LABEL_PREFIX = 'F_'
+
+# Byte written by generate_image in the empty ROM locations.
+FILL_BYTE = 0xFF
+
+class Disassembly(NamedTuple):
+    '''
+        Result of the disassembly of a ROM image.
+
+        Attributes:
+            text: String corresponding to the assembly listing. The listing assembles back to the
+                  same ROM image if the image has no invalid bytes nor targets inside an instruction.
+            labels: Dictionary mapping the synthesized labels to their ROM address.
+            instructions: Number of decoded instructions.
+            invalid: List of the ROM addresses of the code holding bytes that are not an op-code.
+    '''
+    text: str
+    labels: Dict[str, int]
+    instructions: int
+    invalid: List[int]
+
+def arg_parse() -> argparse.Namespace:
+    '''
+        Function to parse command line arguments.
+
+        Returns:
+            A namedtuple with the arguments.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='disassembler.py',
+        description='Disassembler of the ROM .mem files.'
+    )
+
+    parser.add_argument('--input', '-i',
+                        type=str,
+                        nargs='+',
+                        required=True,
+                        help='Paths to the input .mem files, directories or glob patterns to be disassembled.')
+    parser.add_argument('--output', '-o',
+                        type=str,
+                        default=None,
+                        help='Path to the output directory. Defaults to the directory of each input file.')
+    parser.add_argument('--target', '-t',
+                        type=str,
+                        default=targets.DEFAULT_TARGET.name,
+                        choices=list(targets.TARGETS),
+                        help='Core the ROM images are assembled for, setting the ROM size, the size of the ROM address operands and the interrupt vectors.')
+    parser.add_argument('--force', '-f',
+                        action='store_true',
+                        default=False,
+                        help='Flag to force overwriting of output file if it already exists.')
+    parser.add_argument('--jobs', '-j',
+                        type=int,
+                        default=1,
+                        help='Number of processes used to disassemble multiple input files. Defaults to 1, as an image '
+                             'is disassembled faster than a process starts.')
+
+    return parser.parse_args()
+
+def get_vectors(image:Union[bytes, bytearray], target:targets.Target=targets.DEFAULT_TARGET) -> Dict[str, int]:
+    '''
+        Function to read the interrupt vectors of a ROM image. Vectors left as fill bytes are not set.
+
+        Returns:
+            Dictionary mapping the interrupt labels to the ROM address of their handler.
+    '''
+    vectors = dict()
+    for label, addr in target.vectors.items():
+        vector = image[addr:addr + target.operand_bytes]
+        if any(byte != FILL_BYTE for byte in vector):
+            vectors[label] = int.from_bytes(vector, 'little')
+
+    return vectors
+
+def disassemble(image:Union[bytes, bytearray], high_z:FrozenSet[int]=frozenset(),
+                target:targets.Target=targets.DEFAULT_TARGET, filename:Optional[str]=None) -> Disassembly:
+    '''
+        Function to disassemble a ROM image, e.g. the output of utils.parse_rom. The code is
+        decoded in a linear sweep from address 0 up to the last byte before the interrupt vectors
+        that is not a fill byte. Jump and branch targets get a synthesized label and the targets of
+        the interrupt vectors get the MOUSE and TIMER labels, so the assembler places the vectors
+        again. The fill bytes and the vectors themselves are only listed as comments.
+
+        Parameters:
+            image: ROM image.
+            high_z (optional): Set of ROM addresses with a high impedance upper nibble.
+            target (optional): Core the image is assembled for, see targets.Target.
+            filename (optional): Name of the image shown in the header of the listing.
+
+        Returns:
+            Disassembly of the image.
+    '''
+    vectors = get_vectors(image, target)
+    vector_start = min(target.vectors.values())
+    operand_bytes = target.operand_bytes
+    addr_width = (target.rom_addr_width + 3) // 4
+
+    code_end = vector_start
+    while code_end > 0 and image[code_end - 1] == FILL_BYTE and code_end - 1 not in high_z:
+        code_end -= 1
+
+    # Linear sweep: (address, size, text, operand kind, operand) of each decoded instruction,
+    # text None for invalid bytes.
+    decoded = []
+    target_prefixes = dict()
+    addr = 0
+    while addr < code_end:
+        entry = HIGH_Z_TABLE.get(image[addr] & 0xF) if addr in high_z else DECODE_TABLE[image[addr]]
+        if entry is None:
+            decoded.append((addr, 1, None, NO_OPERAND, None))
+            addr += 1
+            continue
+
+        text, operand_kind = entry
+        size = 1
+        operand = None
+        if operand_kind == RAM_OPERAND:
+            size = 2
+            operand = image[addr + 1]
+        elif operand_kind == ROM_OPERAND:
+            size = 1 + operand_bytes
+            operand = int.from_bytes(image[addr + 1:addr + size], 'little')
+            if text == TOKENS.FUNC.name:
+                target_prefixes[operand] = FUNCTION_LABEL_PREFIX
+            else:
+                target_prefixes.setdefault(operand, BRANCH_LABEL_PREFIX)
+
+        decoded.append((addr, size, text, operand_kind, operand))
+        addr += size
+
+    # Name the targets, handlers first.
+    names = {handler : label for label, handler in vectors.items()}
+    for target_addr, prefix in target_prefixes.items():
+        names.setdefault(target_addr, f'{prefix}{target_addr:0{addr_width}X}')
+
+    starts = {addr for addr, _, text, _, _ in decoded if text is not None}
+    labels = {label : addr for addr, label in names.items()}
+    label_width = max((len(label) for label in labels), default=0) + 2
+
+    lines = [f'// Disassembly of {filename if filename else "ROM image"} for {target.name}']
+    invalid = []
+    for addr, size, text, operand_kind, operand in decoded:
+        raw = ' '.join(f'{byte:02X}' for byte in image[addr:addr + size])
+        if addr in high_z:
+            raw = 'Z' + raw[1:]
+
+        if text is None:
+            invalid.append(addr)
+            lines.append(f'{"":<{label_width}}// {addr:0{addr_width}X}: {raw:<{3 * (1 + operand_bytes)}} not an op-code')
+            continue
+
+        note = ''
+        if operand_kind == RAM_OPERAND:
+            text = f'{text} {operand:02X}'
+        elif operand_kind == ROM_OPERAND:
+            text = f'{text} {names[operand]}'
+            if operand not in starts:
+                note = f', target {operand:0{addr_width}X} is not an instruction'
+
+        label = f'{names[addr]}:' if addr in names else ''
+        lines.append(f'{label:<{label_width}}{text:<16}// {addr:0{addr_width}X}: {raw}{note}')
+
+    for label, handler in vectors.items():
+        note = '' if handler in starts else ', not an instruction'
+        lines.append(f'// {target.vectors[label]:0{addr_width}X}: {label} vector to {handler:0{addr_width}X}{note}')
+
+    return Disassembly('\n'.join(lines) + '\n', labels, len(starts), invalid)
+
+def disassemble_file(input_path:str, output_dir:Optional[str], force:bool,
+                     target:targets.Target=targets.DEFAULT_TARGET) -> Disassembly:
+    '''
+        Function to disassemble a single ROM .mem file and save the listing next to it, or in the
+        output directory, with the .dis extension.
+
+        Parameters:
+            input_path: Path to the input .mem file.
+            output_dir: Path to the output directory. If None, the directory of the input file.
+            force: Flag to overwrite the output file if it already exists.
+            target (optional): Core the image is assembled for, see targets.Target.
+
+        Returns:
+            Disassembly of the file.
+
+        Raises:
+            InvalidFileException if the input file doesn't exist, or if the output file already
+            exists and force is not set.
+            InvalidProgramSizeException if the file has more bytes than the ROM size.
+            InvalidAddressException if a line is not a valid HEX byte.
+    '''
+    if not os.path.exists(input_path):
+        raise exc.InvalidFileException(f'Input file {input_path} does not exists.')
+
+    output_path = os.path.splitext(input_path)[0] + DISASSEMBLY_FILE_EXTENSION
+    if output_dir:
+        output_path = os.path.join(output_dir, os.path.basename(output_path))
+
+    if not force and os.path.exists(output_path):
+        raise exc.InvalidFileException(f'File {output_path} already exists! Pass the "--force" argument to force overwriting it.')
+
+    with open(input_path, 'r') as f:
+        image, high_z = utils.parse_rom(f.read(), target.rom_size)
+
+    disassembly = disassemble(image, high_z, target, os.path.basename(input_path))
+    utils.write_file(disassembly.text, output_path)
+
+    return disassembly
+
+def try_disassemble_file(input_path:str, *args) -> Tuple[str, Optional[str], Optional[Disassembly]]:
+    '''
+        Function to disassemble a single .mem file, collecting the error instead of raising it so
+        that a failing file doesn't abort the other files of a batch.
+
+        Returns:
+            input_path: Path to the input .mem file.
+            error: String describing the error, None if the file was disassembled successfully.
+            disassembly: Disassembly of the file, None if it failed.
+    '''
+    try:
+        return input_path, None, disassemble_file(input_path, *args)
+
+    except Exception as e:
+        return input_path, f'{type(e).__name__}: {e}', None
+
+def main():
+    # Parse command line arguments
+    args = arg_parse()
+    target = targets.get_target(args.target)
+
+    if args.jobs < 1:
+        print(f'Number of processes must be at least 1 but got {args.jobs}.')
+        sys.exit(1)
+
+    # RAM images share the .mem extension, only keep the ROM images of directories.
+    input_paths = [path for path in utils.expand_inputs(args.input, DEFAULT_FILE_EXTENSION)
+                   if not path.endswith(RAM_FILE_EXTENSION)]
+
+    if not input_paths:
+        print(f'No input files found for {" ".join(args.input)}.')
+        sys.exit(1)
+
+    if args.output:
+        utils.mkdir(args.output)
+
+    tasks = [(input_path, args.output, args.force, target) for input_path in input_paths]
+
+    if len(tasks) == 1 or args.jobs == 1:
+        results = [try_disassemble_file(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(try_disassemble_file, *zip(*tasks), chunksize=16))
+
+    errors = 0
+    for input_path, error, disassembly in results:
+        if error is not None:
+            errors += 1
+            print(error if len(results) == 1 else f'{input_path}: {error}')
+        elif disassembly.invalid:
+            print(f'{input_path}: {len(disassembly.invalid)} bytes of the code are not op-codes, '
+                  f'from {disassembly.invalid[0]:02X}.')
+
+    if len(results) > 1:
+        print(f'Disassembled {len(results) - errors}/{len(results)} files.')
+
+    sys.exit(1 if errors else 0)
+
+if __name__ == '__main__':
+    main()
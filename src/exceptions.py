@@ -28,8 +28,32 @@ class InvalidAddressException(Exception):
     '''
     pass
 
+class InvalidProgramSizeException(Exception):
+    '''
+        Exception to raise when the program doesn't fit in the ROM or overlaps the inserted functions.
+    '''
+    pass
+
+class InvalidInstructionException(Exception):
+    '''
+        Exception to raise when the simulator fetches a byte that doesn't encode an instruction.
+    '''
+    pass
+
+class InvalidTimingException(Exception):
+    '''
+        Exception to raise when an interrupt handler can exceed its cycle budget or can't be bounded.
+    '''
+    pass
+
 class ImplementationErrorException(Exception):
     '''
         Exception to raise if assembler enters state that should not be possible.
     '''
-    pass
\ No newline at end of file
+    pass
+
+class InvalidFileException(Exception):
+    '''
+        Exception to raise when an input file is missing or not supported, or an output file can't be written.
+    '''
+    pass
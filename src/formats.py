@@ -0,0 +1,90 @@
+from typing import Callable, Dict, FrozenSet, Tuple, Union
+
+# HEX string of every byte value, avoids formatting the same bytes over and over.
+HEX_BYTES = [f'{i:02X}' for i in range(256)]
+
+# Number of data bytes per Intel HEX record.
+IHEX_RECORD_SIZE = 16
+
+def render_readmemh(image:bytearray, high_z:FrozenSet[int]=frozenset()) -> str:
+    '''
+        Function to render a ROM image into a comment free $readmemh file, one byte per line.
+
+        Parameters:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
+
+        Returns:
+            String corresponding to the content of the file.
+    '''
+    lines = [HEX_BYTES[byte] for byte in image]
+
+    for idx in high_z:
+        lines[idx] = 'Z' + lines[idx][1]
+
+    return '\n'.join(lines)
+
+def render_bin(image:bytearray, high_z:FrozenSet[int]=frozenset()) -> bytes:
+    '''
+        Function to render a ROM image into a raw binary file. High impedance upper nibbles
+        can't be represented and are written as 0.
+
+        Parameters:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
+
+        Returns:
+            Bytes corresponding to the content of the file.
+    '''
+    return bytes(image)
+
+def render_ihex(image:bytearray, high_z:FrozenSet[int]=frozenset()) -> str:
+    '''
+        Function to render a ROM image into an Intel HEX file. High impedance upper nibbles
+        can't be represented and are written as 0.
+
+        Parameters:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
+
+        Returns:
+            String corresponding to the content of the file.
+    '''
+    records = []
+
+    for addr in range(0, len(image), IHEX_RECORD_SIZE):
+        data = image[addr:addr + IHEX_RECORD_SIZE]
+        record = bytes([len(data), (addr >> 8) & 0xFF, addr & 0xFF, 0x00]) + data
+        checksum = -sum(record) & 0xFF
+        records.append(':' + record.hex().upper() + HEX_BYTES[checksum])
+
+    # End of file record
+    records.append(':00000001FF')
+
+    return '\n'.join(records) + '\n'
+
+def render_coe(image:bytearray, high_z:FrozenSet[int]=frozenset()) -> str:
+    '''
+        Function to render a ROM image into a Xilinx .coe memory initialization file. High
+        impedance upper nibbles can't be represented and are written as 0.
+
+        Parameters:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
+
+        Returns:
+            String corresponding to the content of the file.
+    '''
+    vector = ',\n'.join(HEX_BYTES[byte] for byte in image)
+
+    return f'memory_initialization_radix=16;\nmemory_initialization_vector=\n{vector};\n'
+
+# Output formats rendered from the ROM image: name -> (file extension, renderer)
+# The annotated .mem format is rendered from the instructions, see utils.render_rom.
+MEM_FORMAT = 'mem'
+FORMATS:Dict[str, Tuple[str, Callable[[bytearray, FrozenSet[int]], Union[str, bytes]]]] = {
+    'hex'  : ('.hex', render_readmemh),
+    'bin'  : ('.bin', render_bin),
+    'ihex' : ('.ihx', render_ihex),
+    'coe'  : ('.coe', render_coe)
+}
@@ -1,162 +1,168 @@
+from typing import List, Optional
 from utils import hex_format, convert_hex
 from constants import *
 import exceptions as exc
 
+class Instruction:
+    '''
+        Encoded instruction passed unchanged between the stages of the assembler. Rendering
+        to text only happens once, when the ROM is written.
+
+        Attributes:
+            opcode: Integer value of the first byte of the instruction. Values above 0xFF mark
+                    an op-code with a high impedance (Z) upper nibble, e.g. the COPY instructions.
+            operand: Integer value of the operand, None for single byte instructions
+                     or for label references that are not resolved yet.
+            operand_size: Number of bytes of the operand, least significant byte first.
+            label: String corresponding to the label the operand refers to, if any.
+            source: String corresponding to the cleaned assembly line the instruction was parsed from.
+            position: (line, column) of the instruction in the assembly file, starting from 1, if known.
+            comment: Comment template rendered next to the op-code, formatted with the operand.
+                     None for raw data bytes.
+    '''
+    __slots__ = ('opcode', 'operand', 'label', 'source', 'comment', 'position', 'operand_size')
+
+    def __init__(self, opcode:int, operand:Optional[int]=None, label:Optional[str]=None,
+                 source:Optional[str]=None, comment:Optional[str]=None, operand_size:int=1):
+        self.opcode = opcode
+        self.operand = operand
+        self.operand_size = operand_size
+        self.label = label
+        self.source = source
+        self.comment = comment
+        self.position = None
+
+    @property
+    def size(self) -> int:
+        '''
+            Number of ROM bytes occupied by the instruction.
+        '''
+        return 1 if self.operand is None and self.label is None else 1 + self.operand_size
+
+    def render(self) -> List[str]:
+        '''
+            Function to render the instruction into the lines of a .mem file.
+
+            Returns:
+                List of string, one per ROM byte of the instruction.
+        '''
+        if self.opcode > 0xFF:
+            opcode = f'Z{self.opcode & 0xF:X}'
+        else:
+            opcode = hex_format(self.opcode)
+
+        if self.operand is None:
+            operand = self.label
+            operand_bytes = [operand] * self.operand_size
+        else:
+            operand = hex_format(self.operand, 8 * self.operand_size)
+            if self.operand_size == 1:
+                operand_bytes = [operand]
+            else:
+                operand_bytes = [hex_format((self.operand >> (8 * idx)) & 0xFF) for idx in range(self.operand_size)]
+
+        if self.comment is not None:
+            opcode += ' // ' + (self.comment.format(operand) if operand is not None else self.comment)
+
+        return [opcode] if operand is None else [opcode, *operand_bytes]
+
+    def __repr__(self) -> str:
+        return f'Instruction(opcode={self.opcode!r}, operand={self.operand!r}, label={self.label!r})'
+
+# Comment templates, formatted with the operand when the instruction is rendered.
+ALU_TO_A_COMMENTS = {op_code : f'A <- {comment}' for op_code, comment in ALU_OPS_COMMENTS.items()}
+ALU_TO_B_COMMENTS = {op_code : f'B <- {comment}' for op_code, comment in ALU_OPS_COMMENTS.items()}
+
+def data(value:int):
+    return Instruction(int(convert_hex(value)))
+
+def vector(mem_addr:int, operand_size:int=1) -> List[Instruction]:
+    mem_addr = convert_hex(mem_addr)
+
+    return [data((mem_addr >> (8 * idx)) & 0xFF) for idx in range(operand_size)]
+
 def read_mem_to_A(mem_addr:int, ram_size=RAM_SIZE, check=True):
     mem_addr = convert_hex(mem_addr)
     if check:
         assert mem_addr >= 0 and mem_addr < ram_size,\
             f'Memory address {mem_addr} out of range for {ram_size} bytes RAM!'
-    
-    comment = f' // A <- Mem[0x{hex_format(mem_addr)}]'
-    
-    return '\n'.join([hex_format(INST.READ_MEM_TO_A) + comment, hex_format(mem_addr)])
+
+    return Instruction(int(INST.READ_MEM_TO_A), mem_addr, comment='A <- Mem[0x{}]')
 
 def read_mem_to_B(mem_addr:int, ram_size=RAM_SIZE, check=True):
     mem_addr = convert_hex(mem_addr)
     if check:
         assert mem_addr >= 0 and mem_addr < ram_size,\
             f'Memory address {mem_addr} out of range for {ram_size} bytes RAM!'
-    
-    comment = f' // B <- Mem[0x{hex_format(mem_addr)}]'
-    
-    return '\n'.join([hex_format(INST.READ_MEM_TO_B) + comment, hex_format(mem_addr)])
+
+    return Instruction(int(INST.READ_MEM_TO_B), mem_addr, comment='B <- Mem[0x{}]')
 
 def write_A_to_mem(mem_addr:int, ram_size=RAM_SIZE, check=True):
     mem_addr = convert_hex(mem_addr)
     if check:
         assert mem_addr >= 0 and mem_addr < ram_size,\
             f'Memory address {mem_addr} out of range for {ram_size} bytes RAM!'
-    
-    comment = f' // Mem[0x{hex_format(mem_addr)}] <- A'
-    
-    return '\n'.join([hex_format(INST.WRITE_A_TO_MEM) + comment, hex_format(mem_addr)])
+
+    return Instruction(int(INST.WRITE_A_TO_MEM), mem_addr, comment='Mem[0x{}] <- A')
 
 def write_B_to_mem(mem_addr:int, ram_size=RAM_SIZE, check=True):
     mem_addr = convert_hex(mem_addr)
     if check:
         assert mem_addr >= 0 and mem_addr < ram_size,\
             f'Memory address {mem_addr} out of range for {ram_size} bytes RAM!'
-    
-    comment = f' // Mem[0x{hex_format(mem_addr)}] <- B'
-    
-    return '\n'.join([hex_format(INST.WRITE_B_TO_MEM) + comment, hex_format(mem_addr)])
+
+    return Instruction(int(INST.WRITE_B_TO_MEM), mem_addr, comment='Mem[0x{}] <- B')
 
 def alu_to_A(op_code:int):
     assert op_code in ALU_OPS._value2member_map_, f'Op-code {op_code} is not valid!'
-    
-    comment = f' // A <- {ALU_OPS_COMMENTS[op_code]}'
-    
-    if op_code == ALU_OPS.OUT_A:
-        return f'Z{hex(INST.ALU_OP_TO_A)[-1]}' + comment
-    
-    return hex_format((op_code << 4) + INST.ALU_OP_TO_A) + comment
+
+    return Instruction(int((op_code << 4) + INST.ALU_OP_TO_A), comment=ALU_TO_A_COMMENTS[op_code])
 
 def alu_to_B(op_code:int):
     assert op_code in ALU_OPS._value2member_map_, f'Op-code {op_code} is not valid!'
-    
-    comment = f' // B <- {ALU_OPS_COMMENTS[op_code]}'
-    
-    if op_code == ALU_OPS.OUT_A:
-        return f'Z{hex(INST.ALU_OP_TO_B)[-1]}' + comment
-    
-    return hex_format((op_code << 4) + INST.ALU_OP_TO_B) + comment
-
-def breq(mem_addr:int=None, label:str=None, rom_size=ROM_SIZE):
-    if mem_addr:
-        mem_addr = convert_hex(mem_addr)
-        assert mem_addr >= 0 and mem_addr < rom_size,\
-            f'Memory address {mem_addr} out of range for {rom_size} bytes ROM!'
 
-        comment = f' // if A == B go to ROM[0x{hex_format(mem_addr)}]'
+    return Instruction(int((op_code << 4) + INST.ALU_OP_TO_B), comment=ALU_TO_B_COMMENTS[op_code])
 
-        return '\n'.join([hex_format((BRANCH_TYPES.EQ << 4) + INST.BRANCH) + comment, hex_format(mem_addr)])
-    
-    if label:
-        comment = f' // if A == B go to ROM[0x{label}]'
-
-        return '\n'.join([hex_format((BRANCH_TYPES.EQ << 4) + INST.BRANCH) + comment, label])
-
-    raise exc.InvalidArgumentException('Either mem_addr or label must be specified for breq function!')
-    
-def bgtq(mem_addr:int=None, label=None, rom_size=ROM_SIZE):
-    if mem_addr:
+def _branch(op_code:int, comment:str, name:str, mem_addr:int=None, label:str=None, rom_size=ROM_SIZE, operand_size=1):
+    if mem_addr is not None:
         mem_addr = convert_hex(mem_addr)
         assert mem_addr >= 0 and mem_addr < rom_size,\
             f'Memory address {mem_addr} out of range for {rom_size} bytes ROM!'
 
-        comment = f' // if A > B go to ROM[0x{hex_format(mem_addr)}]'
+        return Instruction(op_code, mem_addr, label=label, comment=comment, operand_size=operand_size)
 
-        return '\n'.join([hex_format((BRANCH_TYPES.GT << 4) + INST.BRANCH) + comment, hex_format(mem_addr)])
-    
     if label:
-        comment = f' // if A > B go to ROM[0x{label}]'
-
-        return '\n'.join([hex_format((BRANCH_TYPES.GT << 4) + INST.BRANCH) + comment, label])
-    
-    raise exc.InvalidArgumentException('Either mem_addr or label must be specified for bgtq function!')
-        
-def bltq(mem_addr:int=None, label=None, rom_size=ROM_SIZE):
-    if mem_addr:
-        mem_addr = convert_hex(mem_addr)
-        assert mem_addr >= 0 and mem_addr < rom_size,\
-            f'Memory address {mem_addr} out of range for {rom_size} bytes ROM!'
+        return Instruction(op_code, label=label, comment=comment, operand_size=operand_size)
 
-        comment = f' // if A < B go to ROM[0x{hex_format(mem_addr)}]'
-
-        return '\n'.join([hex_format((BRANCH_TYPES.LT << 4) + INST.BRANCH) + comment, hex_format(mem_addr)])
-    
-    if label:
-        comment = f' // if A < B go to ROM[0x{label}]'
+    raise exc.InvalidArgumentException(f'Either mem_addr or label must be specified for {name} function!')
 
-        return '\n'.join([hex_format((BRANCH_TYPES.LT << 4) + INST.BRANCH) + comment, label])
-    
-    raise exc.InvalidArgumentException('Either mem_addr or label must be specified for bltq function!')
-
-def goto(mem_addr:int=None, label=None, rom_size=ROM_SIZE):
-    if mem_addr:
-        mem_addr = convert_hex(mem_addr)
-        assert mem_addr >= 0 and mem_addr < rom_size,\
-            f'Memory address {mem_addr} out of range for {rom_size} bytes ROM!'
+def breq(mem_addr:int=None, label:str=None, rom_size=ROM_SIZE, operand_size=1):
+    return _branch(int((BRANCH_TYPES.EQ << 4) + INST.BRANCH), 'if A == B go to ROM[0x{}]', 'breq',
+                   mem_addr, label, rom_size, operand_size)
 
-        comment = f' // Go to ROM[0x{hex_format(mem_addr)}]'
+def bgtq(mem_addr:int=None, label=None, rom_size=ROM_SIZE, operand_size=1):
+    return _branch(int((BRANCH_TYPES.GT << 4) + INST.BRANCH), 'if A > B go to ROM[0x{}]', 'bgtq',
+                   mem_addr, label, rom_size, operand_size)
 
-        return '\n'.join([hex_format(INST.GOTO) + comment, hex_format(mem_addr)])
-    
-    if label:
-        comment = f' // Go to ROM[0x{label}]'
+def bltq(mem_addr:int=None, label=None, rom_size=ROM_SIZE, operand_size=1):
+    return _branch(int((BRANCH_TYPES.LT << 4) + INST.BRANCH), 'if A < B go to ROM[0x{}]', 'bltq',
+                   mem_addr, label, rom_size, operand_size)
 
-        return '\n'.join([hex_format(INST.GOTO) + comment, label])
-    
-    raise exc.InvalidArgumentException('Either mem_addr or label must be specified for goto function!')
+def goto(mem_addr:int=None, label=None, rom_size=ROM_SIZE, operand_size=1):
+    return _branch(int(INST.GOTO), 'Go to ROM[0x{}]', 'goto', mem_addr, label, rom_size, operand_size)
 
 def goto_idle():
-    comment = ' // Go to Idle state and wait for Interrupts'
-    return hex_format(INST.GOTO_IDLE) + comment
+    return Instruction(int(INST.GOTO_IDLE), comment='Go to Idle state and wait for Interrupts')
 
-def func_call(mem_addr:int=None, label:str=None, rom_size=ROM_SIZE):
-    if mem_addr:
-        mem_addr = convert_hex(mem_addr)
-        assert mem_addr >= 0 and mem_addr < rom_size,\
-            f'Memory address {mem_addr} out of range for {rom_size} bytes ROM!'
-        
-        comment = f' // Function call to ROM[0x{hex_format(mem_addr)}]. Context saved.'
-        
-        return '\n'.join([hex_format(INST.FUNC_CALL) + comment, hex_format(mem_addr)])
-
-    if label:
-        comment = f' // Function call to ROM[0x{label}]. Context saved.'
-        
-        return '\n'.join([hex_format(INST.FUNC_CALL) + comment, label])
+def func_call(mem_addr:int=None, label:str=None, rom_size=ROM_SIZE, operand_size=1):
+    return _branch(int(INST.FUNC_CALL), 'Function call to ROM[0x{}]. Context saved.', 'func_call',
+                   mem_addr, label, rom_size, operand_size)
 
 def func_return():
-    comment = ' // Restoring saved context after function call.'
-    return hex_format(INST.RETURN) + comment
+    return Instruction(int(INST.RETURN), comment='Restoring saved context after function call.')
 
 def deref_A():
-    comment = ' // A <- Mem[A]'
-    return hex_format(INST.DEREF_A) + comment
+    return Instruction(int(INST.DEREF_A), comment='A <- Mem[A]')
 
 def deref_B():
-    comment = ' // B <- Mem[B]'
-    return hex_format(INST.DEREF_B) + comment
\ No newline at end of file
+    return Instruction(int(INST.DEREF_B), comment='B <- Mem[B]')
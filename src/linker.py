@@ -0,0 +1,239 @@
+import json
+import utils
+from instructions import Instruction
+from assembler import AssemblyResult, build_result
+from token_parser import ConstantPool, get_immediate, iter_tokens, scan_program
+from targets import DEFAULT_TARGET, Target, get_target
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from constants import *
+import exceptions as exc
+
+# Version of the object file format, objects of another version have to be assembled again.
+OBJECT_FORMAT_VERSION = 1
+
+# Prefix of the labels only visible inside their module, renamed <LABEL>@<module index> when linking.
+LOCAL_LABEL_PREFIX = '_'
+
+# Relocation kinds: ROM address of a symbol (B-Type operands) and RAM address of a constant of
+# the constant pool (LI instructions, encoded as S-Type loads).
+ROM_RELOCATION = 'ROM'
+RAM_RELOCATION = 'RAM'
+
+# Attributes of an Instruction stored in an object file, in order.
+INSTRUCTION_FIELDS = ('opcode', 'operand', 'label', 'operand_size', 'comment', 'source', 'position')
+
+class Relocation(NamedTuple):
+    '''
+        Operand of an instruction patched by the linker.
+
+        Attributes:
+            index: Index of the instruction in the module.
+            kind: ROM_RELOCATION or RAM_RELOCATION.
+            symbol: Label of a ROM relocation, value of the constant of a RAM relocation.
+    '''
+    index: int
+    kind: str
+    symbol: object
+
+class ObjectFile(NamedTuple):
+    '''
+        Relocatable object file of an assembly module: the encoded instructions of the module with
+        their operands relative to the start of the module, its symbols and its relocations.
+
+        Labels starting with LOCAL_LABEL_PREFIX are local to the module, the other labels are
+        exported. B-Type instructions can use labels exported by other modules, which are imported.
+
+        Attributes:
+            target: Name of the target the module is assembled for, see targets.TARGETS.
+            source: Path of the assembly file of the module.
+            instructions: List of the instructions of the module.
+            symbols: Dictionary mapping the exported labels to the index of their instruction.
+            local_symbols: Dictionary mapping the local labels to the index of their instruction.
+            imports: List of the labels used but not defined by the module.
+            relocations: List of the Relocation of the operands.
+            ram_used: Sorted list of the RAM addresses used by the S-Type instructions of the module.
+    '''
+    target: str
+    source: str
+    instructions: List[Instruction]
+    symbols: Dict[str, int]
+    local_symbols: Dict[str, int]
+    imports: List[str]
+    relocations: List[Relocation]
+    ram_used: List[int]
+
+    def render(self) -> str:
+        '''
+            Function to render the object file as JSON, one relocation and one instruction per line.
+
+            Returns:
+                String corresponding to the content of the file.
+        '''
+        header = json.dumps({
+            'version' : OBJECT_FORMAT_VERSION,
+            'target' : self.target,
+            'source' : self.source,
+            'symbols' : self.symbols,
+            'local_symbols' : self.local_symbols,
+            'imports' : self.imports,
+            'ram_used' : self.ram_used
+        }, indent=2)
+
+        # Relocations and instructions are rendered one per line.
+        relocations = ',\n'.join('    ' + json.dumps(list(relocation)) for relocation in self.relocations)
+        instructions = ',\n'.join('    ' + json.dumps([getattr(instruction, field) for field in INSTRUCTION_FIELDS])
+                                  for instruction in self.instructions)
+
+        return (header[:-2] + ',\n  "relocations": [\n' + relocations + '\n  ],\n'
+                + '  "instructions": [\n' + instructions + '\n  ]\n}\n')
+
+    @classmethod
+    def parse(cls, text:str) -> 'ObjectFile':
+        '''
+            Function to parse an object file rendered by render.
+
+            Raises:
+                InvalidFileException if the content is not a valid object file of the current format.
+        '''
+        try:
+            content = json.loads(text)
+            if content.get('version') != OBJECT_FORMAT_VERSION:
+                raise exc.InvalidFileException(f'Object file version {content.get("version")} is not supported. '
+                                               f'Assemble the module again to get version {OBJECT_FORMAT_VERSION}.')
+
+            instructions = []
+            for fields in content['instructions']:
+                values = dict(zip(INSTRUCTION_FIELDS, fields))
+                instruction = Instruction(values['opcode'], values['operand'], values['label'], values['source'],
+                                          values['comment'], values['operand_size'])
+                instruction.position = tuple(values['position']) if values['position'] else None
+                instructions.append(instruction)
+
+            return cls(content['target'], content['source'], instructions, content['symbols'],
+                       content['local_symbols'], content['imports'],
+                       [Relocation(*relocation) for relocation in content['relocations']], content['ram_used'])
+
+        except (ValueError, KeyError, TypeError) as e:
+            raise exc.InvalidFileException(f'Invalid object file: {e}')
+
+def load(filename:str) -> ObjectFile:
+    '''
+        Function to load an object file.
+    '''
+    with open(filename, 'r') as f:
+        return ObjectFile.parse(f.read())
+
+def assemble_object(program:Iterable[str], positions:Optional[Iterable[Tuple[int, int]]]=None,
+                    filename:str='<source>', target:Target=DEFAULT_TARGET) -> ObjectFile:
+    '''
+        Function to assemble a cleaned module into a relocatable object file. The module is parsed
+        like a whole program, except that labels it doesn't define are imported.
+
+        Parameters:
+            program: Re-iterable of string corresponding to the cleaned lines of the module.
+            positions (optional): (line, column) of each line of the module in the source, see utils.get_source_positions.
+            filename (optional): Name of the source of the module.
+            target (optional): Core the module is assembled for, see targets.Target.
+
+        Returns:
+            ObjectFile of the module.
+    '''
+    # First pass: label addresses and constant pool, relative to the start of the module.
+    label_to_idx_dict = dict()
+    label_dict, constant_pool = scan_program(utils.iter_labels(program, label_to_idx_dict), target)
+
+    # Second pass: parse program, collecting the imported labels.
+    imports = set()
+    instructions = list(iter_tokens((line for _, line in utils.iter_labels(program)), label_dict, constant_pool, target, imports))
+
+    if positions is not None:
+        for instruction, position in zip(instructions, positions):
+            instruction.position = position
+
+    relocations = []
+    pool = ConstantPool()
+    for idx, instruction in enumerate(instructions):
+        if instruction.label is not None:
+            relocations.append(Relocation(idx, ROM_RELOCATION, instruction.label))
+            continue
+
+        pool.add(instruction.source)
+        if instruction.source.split(None, 1)[0] == TOKENS.LI.name:
+            relocations.append(Relocation(idx, RAM_RELOCATION, get_immediate(instruction.source.split()[2], instruction.source)))
+
+    symbols = {label : idx for label, idx in label_to_idx_dict.items() if not label.startswith(LOCAL_LABEL_PREFIX)}
+    local_symbols = {label : idx for label, idx in label_to_idx_dict.items() if label.startswith(LOCAL_LABEL_PREFIX)}
+
+    return ObjectFile(target.name, filename, instructions, symbols, local_symbols, sorted(imports),
+                      relocations, sorted(pool.used))
+
+def link(objects:List[ObjectFile], annotate:bool=False, optimize:bool=False) -> AssemblyResult:
+    '''
+        Function to link object files into a program. The modules are placed in the given order,
+        the first one at address 0. Symbols are resolved across the modules, the constant pools of
+        the modules are merged into a single deduplicated pool and the interrupt vectors are set
+        from the MOUSE and TIMER symbols. Nothing is parsed again: the operands are patched from
+        the relocation tables.
+
+        Parameters:
+            objects: List of the ObjectFile of the modules.
+            annotate (optional): Flag to also render the annotated .mem file content.
+            optimize (optional): Flag to optimize the linked program, see optimizer.optimize.
+
+        Returns:
+            AssemblyResult of the linked program.
+
+        Raises:
+            InvalidArgumentException if the modules are assembled for different targets.
+            InvalidLabelException if a symbol is exported by several modules or is not defined.
+            InvalidProgramSizeException if the program or the constant pool doesn't fit.
+    '''
+    if not objects:
+        raise exc.InvalidArgumentException('At least one object file is needed to link a program.')
+
+    target = get_target(objects[0].target)
+    for module in objects:
+        if module.target != target.name:
+            raise exc.InvalidArgumentException(f'Module {module.source} is assembled for {module.target} but '
+                                               f'{objects[0].source} is assembled for {target.name}.')
+
+    # Place the modules and build the global symbol table. Local labels are renamed after their module.
+    program = []
+    label_to_idx_dict = dict()
+    local_names = []
+    for idx, module in enumerate(objects):
+        for label, label_idx in module.symbols.items():
+            if label in label_to_idx_dict:
+                raise exc.InvalidLabelException(f'Symbol {label} of {module.source} is already defined by another module.')
+            label_to_idx_dict[label] = len(program) + label_idx
+
+        names = {label : f'{label}@{idx}' for label in module.local_symbols}
+        for label, label_idx in module.local_symbols.items():
+            label_to_idx_dict[names[label]] = len(program) + label_idx
+        local_names.append(names)
+
+        program += module.instructions
+
+    # Merge the constant pools, avoiding the RAM addresses used by any module.
+    pool = ConstantPool()
+    for module in objects:
+        pool.used.update(module.ram_used)
+        for relocation in module.relocations:
+            if relocation.kind == RAM_RELOCATION:
+                pool.values.setdefault(relocation.symbol, None)
+    constant_pool = pool.allocate(target.ram_size)
+
+    # Patch the operands.
+    for module, names in zip(objects, local_names):
+        for idx, kind, symbol in module.relocations:
+            instruction = module.instructions[idx]
+            if kind == RAM_RELOCATION:
+                instruction.operand = constant_pool[symbol]
+                continue
+
+            label = names.get(symbol, symbol)
+            if label not in label_to_idx_dict:
+                raise exc.InvalidLabelException(f'Label {symbol} used in line "{instruction.source}" of {module.source} is not defined.')
+            instruction.label = label
+
+    return build_result(program, label_to_idx_dict, constant_pool, annotate, optimize=optimize, target=target)
@@ -0,0 +1,202 @@
+import cfg
+import instructions as inst
+from instructions import Instruction
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from constants import *
+
+# Op-codes matched by the peephole rules.
+COPY_A = int((ALU_OPS.OUT_A << 4) + INST.ALU_OP_TO_A)
+LOADS = {int(INST.READ_MEM_TO_A) : REGISTERS.A.name, int(INST.READ_MEM_TO_B) : REGISTERS.B.name}
+STORES = {int(INST.WRITE_A_TO_MEM) : REGISTERS.A.name, int(INST.WRITE_B_TO_MEM) : REGISTERS.B.name}
+
+class OptimizationReport(NamedTuple):
+    '''
+        Savings of the optimizer.
+
+        Attributes:
+            bytes_saved: Number of ROM bytes saved.
+            cycles_saved: Estimated clock cycles saved, counting each rewritten instruction once.
+            rewrites: List of string describing each rewrite.
+    '''
+    bytes_saved: int
+    cycles_saved: int
+    rewrites: List[str]
+
+    def __str__(self) -> str:
+        return f'Saved {self.bytes_saved} bytes and {self.cycles_saved} cycles in {len(self.rewrites)} rewrites.'
+
+def _cycles(instruction:Instruction) -> int:
+    return INST_CYCLES[instruction.opcode & 0xF]
+
+def _rewrite(prev:Optional[Instruction], instruction:Instruction, is_target:bool,
+             next_idx:Optional[int], label_to_idx_dict:Dict[str, int], ram_size:int=RAM_SIZE) -> Tuple[Optional[Instruction], Optional[str]]:
+    '''
+        Function to apply the peephole rules to an instruction and the instruction executed just before it.
+
+        Parameters:
+            prev: Instruction right before the instruction, None if it is the first one.
+            instruction: Instruction to rewrite.
+            is_target: Flag indicating that a label points to the instruction.
+            next_idx: Index of the next instruction in the program, None for the last instruction.
+            label_to_idx_dict: Label to index in the program mapping.
+            ram_size (optional): Number of RAM addresses, addresses above are memory mapped.
+
+        Returns:
+            replacement: Instruction replacing the instruction, None to remove it.
+            rewrite: String describing the rewrite, None if no rule applies.
+    '''
+    # Removing an instruction moves its labels to the next instruction, so a labelled instruction
+    # can only be removed if it doesn't do anything, and if there is a next instruction.
+    if next_idx is not None:
+        # COPY A, i.e. A <- A
+        if instruction.opcode == COPY_A:
+            return None, f'Removed {instruction.source}'
+
+        # JUMP to the next instruction
+        if instruction.opcode == INST.GOTO and label_to_idx_dict.get(instruction.label) == next_idx:
+            return None, f'Removed {instruction.source} to the next instruction'
+
+    # A load reached by a jump can't rely on the previous store.
+    if prev is None or is_target:
+        return instruction, None
+
+    # Load of the value just stored, e.g. SB A 20 then LB A 20. Memory mapped addresses are volatile.
+    if (prev.opcode in STORES and instruction.opcode in LOADS and prev.operand == instruction.operand
+            and instruction.operand < ram_size):
+        if STORES[prev.opcode] == LOADS[instruction.opcode]:
+            return None, f'Removed {instruction.source} after {prev.source}'
+
+        if STORES[prev.opcode] == REGISTERS.A.name:
+            copy = inst.alu_to_B(ALU_OPS.OUT_A)
+            copy.source = f'{TOKENS.COPY.name} {REGISTERS.B.name}'
+            copy.position = instruction.position
+            return copy, f'Replaced {instruction.source} after {prev.source} by {copy.source}'
+
+    return instruction, None
+
+def optimize(program:List[Instruction], label_to_idx_dict:Dict[str, int],
+             ram_size:int=RAM_SIZE) -> Tuple[List[Instruction], Dict[str, int], OptimizationReport]:
+    '''
+        Function to optimize a parsed program, e.g. the output of token_parser.parse_tokens:
+            * Jumps to jumps are threaded to the final target, see cfg.thread_jumps.
+            * Blocks unreachable from address 0 and the interrupt handlers are removed, see cfg.remove_unreachable.
+            * Blocks are reordered to replace JUMPs by fall through, see cfg.reorder_blocks.
+            * Redundant instructions are rewritten, see peephole.
+        Operands of B-Type instructions are not updated, see resolve_labels.
+
+        Parameters:
+            program: List of instructions of the program.
+            label_to_idx_dict: Label to index in the program mapping, e.g. the output of utils.get_labels.
+            ram_size (optional): Number of RAM addresses, addresses above are memory mapped.
+
+        Returns:
+            program: List of instructions of the optimized program.
+            label_to_idx_dict: Label to index in the optimized program mapping.
+            report: OptimizationReport with the savings.
+    '''
+    reports = []
+
+    threaded = cfg.thread_jumps(program, label_to_idx_dict)
+    reports.append(OptimizationReport(0, sum(INST_CYCLES[INST.GOTO] * jumps for _, _, jumps in threaded),
+                                      [f'Threaded {instruction.source} to {label}' for instruction, label, _ in threaded]))
+
+    program, label_to_idx_dict, removed = cfg.remove_unreachable(program, label_to_idx_dict)
+    reports.append(OptimizationReport(sum(instruction.size for instruction in removed), 0,
+                                      [f'Removed unreachable {instruction.source}' for instruction in removed]))
+
+    program, label_to_idx_dict, removed = cfg.reorder_blocks(program, label_to_idx_dict)
+    reports.append(OptimizationReport(sum(instruction.size for instruction in removed), sum(_cycles(instruction) for instruction in removed),
+                                      [f'Removed {instruction.source}, {instruction.label} placed right after it' for instruction in removed]))
+
+    program, label_to_idx_dict, report = peephole(program, label_to_idx_dict, ram_size)
+    reports.append(report)
+
+    return program, label_to_idx_dict, OptimizationReport(sum(report.bytes_saved for report in reports),
+                                                          sum(report.cycles_saved for report in reports),
+                                                          [rewrite for report in reports for rewrite in report.rewrites])
+
+def peephole(program:List[Instruction], label_to_idx_dict:Dict[str, int],
+             ram_size:int=RAM_SIZE) -> Tuple[List[Instruction], Dict[str, int], OptimizationReport]:
+    '''
+        Function to apply the peephole optimizer to a parsed program until no more rule applies. The rules are:
+            * SB R X then LB R X: the load is removed.
+            * SB A X then LB B X: the load is replaced by COPY B.
+            * COPY A: removed.
+            * JUMP to the next instruction: removed.
+        Loads reached by a jump and loads of memory mapped addresses are never removed. Operands
+        of B-Type instructions are not updated, see resolve_labels.
+
+        Parameters:
+            program: List of instructions of the program.
+            label_to_idx_dict: Label to index in the program mapping, e.g. the output of utils.get_labels.
+            ram_size (optional): Number of RAM addresses, addresses above are memory mapped.
+
+        Returns:
+            program: List of instructions of the optimized program.
+            label_to_idx_dict: Label to index in the optimized program mapping.
+            report: OptimizationReport with the savings.
+    '''
+    bytes_saved = 0
+    cycles_saved = 0
+    rewrites = []
+    changed = True
+
+    while changed:
+        changed = False
+        targets = set(label_to_idx_dict.values())
+        optimized = []
+        new_idx = []
+
+        for idx, instruction in enumerate(program):
+            new_idx.append(len(optimized))
+
+            # Only instructions following each other in the original program form a window.
+            prev = optimized[-1] if optimized and idx > 0 and optimized[-1] is program[idx - 1] else None
+            next_idx = idx + 1 if idx + 1 < len(program) else None
+
+            replacement, rewrite = _rewrite(prev, instruction, idx in targets, next_idx, label_to_idx_dict, ram_size)
+            if rewrite is None:
+                optimized.append(instruction)
+                continue
+
+            changed = True
+            rewrites.append(rewrite)
+            bytes_saved += instruction.size
+            cycles_saved += _cycles(instruction)
+
+            if replacement is not None:
+                optimized.append(replacement)
+                bytes_saved -= replacement.size
+                cycles_saved -= _cycles(replacement)
+
+        program = optimized
+        label_to_idx_dict = {label : new_idx[idx] for label, idx in label_to_idx_dict.items()}
+
+    return program, label_to_idx_dict, OptimizationReport(bytes_saved, cycles_saved, rewrites)
+
+def resolve_labels(program:List[Instruction], label_to_idx_dict:Dict[str, int]) -> Dict[str, int]:
+    '''
+        Function to compute the ROM address of every label of a program and to update the
+        operand of the instructions referring to a label.
+
+        Parameters:
+            program: List of instructions of the program.
+            label_to_idx_dict: Label to index in the program mapping.
+
+        Returns:
+            Dictionary mapping the labels to their ROM address.
+    '''
+    addresses = []
+    addr = 0
+
+    for instruction in program:
+        addresses.append(addr)
+        addr += instruction.size
+
+    label_to_addr_dict = {label : addresses[idx] for label, idx in label_to_idx_dict.items()}
+
+    for instruction in program:
+        if instruction.label is not None:
+            instruction.operand = label_to_addr_dict[instruction.label]
+
+    return label_to_addr_dict
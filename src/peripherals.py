@@ -0,0 +1,201 @@
+from typing import Optional
+from constants import *
+import exceptions as exc
+
+class Peripheral:
+    '''
+        Base class of the peripheral models attached to the data bus of the simulator, see
+        Simulator.attach. Reads and writes of the bus addresses from base_addr to
+        base_addr + size - 1 are forwarded to the model with the offset of the address.
+
+        Attributes:
+            base_addr: First bus address of the peripheral.
+            size: Number of bus addresses of the peripheral, 0 if it is not memory mapped.
+            simulator: Simulator the peripheral is attached to, None until it is attached.
+    '''
+
+    def __init__(self, base_addr:int=0, size:int=0):
+        self.base_addr = base_addr
+        self.size = size
+        self.simulator = None
+
+    def attach(self, simulator) -> None:
+        '''
+            Function called when the peripheral is attached to a simulator.
+        '''
+        self.simulator = simulator
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+            Function called when the simulator is reset.
+        '''
+        pass
+
+    def save_state(self) -> bytes:
+        '''
+            Function to save the state of the peripheral, for a simulator snapshot, see Simulator.snapshot.
+        '''
+        return b''
+
+    def load_state(self, state:bytes) -> None:
+        '''
+            Function to restore the state saved by save_state.
+        '''
+        pass
+
+    def read(self, offset:int) -> int:
+        '''
+            Function to read the register at the given offset from the base address.
+        '''
+        return 0
+
+    def write(self, offset:int, value:int) -> None:
+        '''
+            Function to write the register at the given offset from the base address.
+        '''
+        pass
+
+class Registers(Peripheral):
+    '''
+        Peripheral made of plain registers, returning the last value written to them.
+
+        Attributes:
+            registers: bytearray holding the value of each register.
+    '''
+
+    def __init__(self, base_addr:int, size:int):
+        super().__init__(base_addr, size)
+        self.registers = bytearray(size)
+
+    def reset(self) -> None:
+        self.registers[:] = bytes(self.size)
+
+    def save_state(self) -> bytes:
+        return bytes(self.registers)
+
+    def load_state(self, state:bytes) -> None:
+        self.registers[:] = state
+
+    def read(self, offset:int) -> int:
+        return self.registers[offset]
+
+    def write(self, offset:int, value:int) -> None:
+        self.registers[offset] = value
+
+class Leds(Registers):
+    '''
+        16 LEDs, the lower 8 at LEDS_BASE_ADDR and the upper 8 at the next address.
+    '''
+
+    def __init__(self, base_addr:int=LEDS_BASE_ADDR):
+        super().__init__(base_addr, 2)
+
+    @property
+    def value(self) -> int:
+        '''
+            16-bit value shown on the LEDs.
+        '''
+        return self.registers[1] << 8 | self.registers[0]
+
+class Seg7(Registers):
+    '''
+        7-segment display, showing the last byte written to SEG7_BASE_ADDR.
+    '''
+
+    def __init__(self, base_addr:int=SEG7_BASE_ADDR):
+        super().__init__(base_addr, 1)
+
+    @property
+    def value(self) -> int:
+        '''
+            Value shown on the display.
+        '''
+        return self.registers[0]
+
+class Switches(Registers):
+    '''
+        16 slide switches, the lower 8 at SWITCH_BASE_ADDR and the upper 8 at the next address.
+        The switches are inputs, so writes from the processor are ignored.
+    '''
+
+    def __init__(self, base_addr:int=SWITCH_BASE_ADDR, value:int=0):
+        super().__init__(base_addr, 2)
+        self.initial_value = value
+
+    def reset(self) -> None:
+        self.set(self.initial_value)
+
+    def write(self, offset:int, value:int) -> None:
+        pass
+
+    def set(self, value:int) -> None:
+        '''
+            Function to set the 16-bit position of the switches.
+        '''
+        self.registers[0] = value & 0xFF
+        self.registers[1] = (value >> 8) & 0xFF
+
+class Mouse(Registers):
+    '''
+        Mouse with its status, X and Y registers from MOUSE_BASE_ADDR. Every mouse event
+        updates the registers and raises the MOUSE interrupt.
+    '''
+    STATUS, X, Y = range(3)
+
+    def __init__(self, base_addr:int=MOUSE_BASE_ADDR):
+        super().__init__(base_addr, 3)
+
+    def write(self, offset:int, value:int) -> None:
+        pass
+
+    def move(self, x:int, y:int, status:int=0, time:Optional[int]=None) -> None:
+        '''
+            Function to schedule a mouse event.
+
+            Parameters:
+                x, y: New position of the mouse.
+                status (optional): New status byte of the mouse, e.g. the pressed buttons.
+                time (optional): Simulated time of the event in clock cycles, the current time by default.
+        '''
+        simulator = self.simulator
+        simulator.schedule(simulator.time if time is None else time, self._update, x, y, status)
+
+    def _update(self, x:int, y:int, status:int) -> None:
+        self.registers[self.STATUS] = status & 0xFF
+        self.registers[self.X] = x & 0xFF
+        self.registers[self.Y] = y & 0xFF
+        self.simulator.interrupt(self.simulator.target.mouse_vector)
+
+class Timer(Peripheral):
+    '''
+        Timer raising the TIMER interrupt periodically. It is not memory mapped.
+
+        Attributes:
+            period: Number of clock cycles between two interrupts.
+            ticks: Number of interrupts raised since the last reset.
+    '''
+
+    def __init__(self, period:int):
+        if period <= 0:
+            raise exc.InvalidArgumentException(f'Timer period must be positive but got {period}.')
+
+        super().__init__()
+        self.period = period
+        self.ticks = 0
+
+    def reset(self) -> None:
+        self.ticks = 0
+        self.simulator.schedule(self.simulator.time + self.period, self._tick, self.simulator.time + self.period)
+
+    def save_state(self) -> bytes:
+        return self.ticks.to_bytes(8, 'little')
+
+    def load_state(self, state:bytes) -> None:
+        self.ticks = int.from_bytes(state, 'little')
+
+    def _tick(self, time:int) -> None:
+        # Schedule from the time of the tick, not the time of its delivery, to avoid drifting.
+        self.ticks += 1
+        self.simulator.interrupt(self.simulator.target.timer_vector)
+        self.simulator.schedule(time + self.period, self._tick, time + self.period)
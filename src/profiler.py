@@ -0,0 +1,259 @@
+import io
+import csv
+import json
+import bisect
+import utils
+import exceptions as exc
+from simulator import Simulator, CALL, RETURN, IDLE
+from targets import DEFAULT_TARGET, Target
+from typing import Dict, List, NamedTuple, Optional
+from constants import *
+
+class FlatEntry(NamedTuple):
+    '''
+        Entry of the flat profile, i.e. the counts of the instructions following a label up to the next label.
+
+        Attributes:
+            symbol: Label of the code, or the hexadecimal address of the code before the first label.
+            address: ROM address of the label.
+            instructions: Number of executed instructions.
+            cycles: Estimated clock cycles of the executed instructions.
+            percent: Share of the cycles of the whole run.
+    '''
+    symbol: str
+    address: int
+    instructions: int
+    cycles: int
+    percent: float
+
+class CallEntry(NamedTuple):
+    '''
+        Entry of the call graph profile, i.e. the counts of the calls from a function to another.
+        Interrupt handlers and the code at address 0 are called from the root symbol "<idle>".
+
+        Attributes:
+            caller: Symbol of the calling function.
+            callee: Symbol of the called function.
+            calls: Number of calls.
+            cycles: Estimated clock cycles spent in the called function and its callees.
+    '''
+    caller: str
+    callee: str
+    calls: int
+    cycles: int
+
+# Symbol of the caller of the interrupt handlers and of the code at address 0.
+ROOT_SYMBOL = '<idle>'
+
+class Profiler:
+    '''
+        Profiler counting the executed instructions and cycles of each ROM address and of each
+        call between functions. Functions are tracked from the FUNC and RETURN instructions and
+        from the interrupts serviced when the processor is idle.
+
+        A profiler is enabled by setting it as the profiler of a simulator. Profiled runs execute
+        one instruction at a time, while runs without a profiler are not slowed down at all.
+
+            profiler = Profiler(result.labels, result.target)
+            simulator.profiler = profiler
+            simulator.run(1_000_000)
+            print(profiler.report())
+
+        Attributes:
+            labels: Dictionary mapping the labels to their ROM address.
+            target: Core of the profiled programs, setting the number of ROM addresses, see targets.Target.
+            instructions: Number of executed instructions of each ROM address.
+            cycles: Estimated clock cycles of the executed instructions of each ROM address.
+            calls: Dictionary mapping the (caller, callee) function addresses to their [calls, cycles] counts.
+    '''
+
+    def __init__(self, labels:Optional[Dict[str, int]]=None, target:Target=DEFAULT_TARGET):
+        self.labels = dict(labels) if labels else dict()
+        self.target = target
+        self._symbols = sorted((addr, label) for label, addr in self.labels.items())
+        self._addresses = [addr for addr, _ in self._symbols]
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+            Function to clear the counts.
+        '''
+        self.instructions = [0] * self.target.rom_size
+        self.cycles = [0] * self.target.rom_size
+        self.calls = dict()
+        # Shadow call stack of (function address, caller address, cycles at the call) frames.
+        self._stack = []
+
+    def symbol(self, addr:Optional[int]) -> str:
+        '''
+            Function to get the symbol of a ROM address, i.e. the closest label at or before the address.
+        '''
+        if addr is None:
+            return ROOT_SYMBOL
+
+        idx = bisect.bisect_right(self._addresses, addr) - 1
+        if idx < 0:
+            return f'{addr:02X}'
+
+        return self._symbols[idx][1]
+
+    def _enter(self, addr:int, caller:Optional[int], cycles:int) -> None:
+        self._stack.append((addr, caller, cycles))
+        self.calls.setdefault((caller, addr), [0, 0])[0] += 1
+
+    def _leave(self, cycles:int) -> None:
+        addr, caller, start = self._stack.pop()
+        self.calls[(caller, addr)][1] += cycles - start
+
+    def _leave_all(self, cycles:int) -> None:
+        while self._stack:
+            self._leave(cycles)
+
+    def _record(self, simulator:Simulator, pc:int, kind:int, operand:Optional[int], a:int, b:int, time:int) -> None:
+        '''
+            Function called after each profiled instruction, with the ROM address, decoded kind and
+            operand of the instruction, and the registers and simulated time before it. Extended
+            by the subclasses collecting more than the counts, see tracer.Tracer.
+        '''
+        pass
+
+    def run(self, simulator:Simulator, max_instructions:Optional[int]=None, until:Optional[int]=None) -> int:
+        '''
+            Function to run the simulator one instruction at a time, counting every instruction.
+            Called by Simulator.run when the profiler is enabled, see Simulator.run for the parameters.
+        '''
+        if len(simulator.rom) != self.target.rom_size:
+            raise exc.InvalidArgumentException(f'Profiler for the {self.target.name} target can\'t profile a simulator of the {simulator.target.name} target.')
+
+        limit = -1 if max_instructions is None else max_instructions
+        program = simulator.program
+        instructions = self.instructions
+        cycles = self.cycles
+        count = 0
+
+        # Code entered without an interrupt, e.g. after a reset.
+        if not self._stack and not simulator.idle:
+            self._enter(simulator.pc, None, simulator.cycles)
+
+        simulator.profiler = None
+        try:
+            while count != limit:
+                if simulator.idle:
+                    if not simulator._service_interrupt(until):
+                        break
+                    self._enter(simulator.pc, None, simulator.cycles)
+
+                pc = simulator.pc
+                kind, _, operand, _, _ = program[pc]
+                a, b, time = simulator.a, simulator.b, simulator.time
+                start = simulator.cycles
+
+                Simulator.run(simulator, 1, until)
+                count += 1
+                instructions[pc] += 1
+                cycles[pc] += simulator.cycles - start
+                self._record(simulator, pc, kind, operand, a, b, time)
+
+                if kind == CALL:
+                    self._enter(operand, self._stack[-1][0] if self._stack else None, simulator.cycles)
+                elif kind == RETURN and self._stack:
+                    self._leave(simulator.cycles)
+                elif kind == IDLE:
+                    self._leave_all(simulator.cycles)
+                    # Interrupt serviced right after going idle.
+                    if not simulator.idle:
+                        self._enter(simulator.pc, None, simulator.cycles)
+        finally:
+            simulator.profiler = self
+
+        return count
+
+    def flat_profile(self) -> List[FlatEntry]:
+        '''
+            Function to fold the counts of the ROM addresses onto their symbol.
+
+            Returns:
+                List of FlatEntry sorted by decreasing cycles.
+        '''
+        folded = dict()
+        for addr in range(self.target.rom_size):
+            if self.instructions[addr]:
+                symbol = self.symbol(addr)
+                start = self.labels.get(symbol, addr)
+                entry = folded.setdefault(symbol, [min(start, addr), 0, 0])
+                entry[1] += self.instructions[addr]
+                entry[2] += self.cycles[addr]
+
+        total = sum(self.cycles) or 1
+        entries = [FlatEntry(symbol, addr, count, cycles, 100 * cycles / total)
+                   for symbol, (addr, count, cycles) in folded.items()]
+
+        return sorted(entries, key=lambda entry: (-entry.cycles, entry.address))
+
+    def call_graph(self) -> List[CallEntry]:
+        '''
+            Function to get the call graph profile. Calls still running are not included in the cycles.
+
+            Returns:
+                List of CallEntry sorted by decreasing cycles.
+        '''
+        entries = [CallEntry(self.symbol(caller), self.symbol(callee), calls, cycles)
+                   for (caller, callee), (calls, cycles) in self.calls.items()]
+
+        return sorted(entries, key=lambda entry: (-entry.cycles, entry.caller, entry.callee))
+
+    def report(self, top:Optional[int]=None) -> str:
+        '''
+            Function to render the flat and call graph profiles as text.
+
+            Parameters:
+                top (optional): Maximum number of entries of each profile, all by default.
+
+            Returns:
+                String corresponding to the report.
+        '''
+        lines = ['Flat profile:',
+                 f'{"Symbol":<16} {"Address":>7} {"Instructions":>12} {"Cycles":>12} {"%":>6}']
+        for entry in self.flat_profile()[:top]:
+            lines.append(f'{entry.symbol:<16} {entry.address:>7X} {entry.instructions:>12} {entry.cycles:>12} {entry.percent:>6.2f}')
+
+        lines += ['',
+                  'Call graph:',
+                  f'{"Caller":<16} {"Callee":<16} {"Calls":>8} {"Cycles":>12}']
+        for entry in self.call_graph()[:top]:
+            lines.append(f'{entry.caller:<16} {entry.callee:<16} {entry.calls:>8} {entry.cycles:>12}')
+
+        return '\n'.join(lines)
+
+    def to_csv(self) -> str:
+        '''
+            Function to export the flat profile as CSV.
+        '''
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(FlatEntry._fields)
+        for entry in self.flat_profile():
+            writer.writerow([entry.symbol, f'{entry.address:02X}', entry.instructions, entry.cycles, f'{entry.percent:.2f}'])
+
+        return output.getvalue()
+
+    def to_json(self) -> str:
+        '''
+            Function to export the flat profile, the call graph profile and the counts of each ROM address as JSON.
+        '''
+        return json.dumps({
+            'flat' : [entry._asdict() for entry in self.flat_profile()],
+            'calls' : [entry._asdict() for entry in self.call_graph()],
+            'addresses' : [{'address' : addr, 'symbol' : self.symbol(addr),
+                            'instructions' : self.instructions[addr], 'cycles' : self.cycles[addr]}
+                           for addr in range(self.target.rom_size) if self.instructions[addr]]
+        }, indent=2)
+
+    def save(self, filename:str) -> bool:
+        '''
+            Function to save the profile, as JSON if the file name ends with .json, as CSV otherwise.
+
+            Returns:
+                True if the file was written, False if it already had the same content.
+        '''
+        return utils.write_file(self.to_json() if filename.endswith('.json') else self.to_csv(), filename)
@@ -0,0 +1,418 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import utils
+import exceptions as exc
+import xml.etree.ElementTree as ET
+from assembler import assemble_program
+from simulator import Simulator
+from peripherals import Leds, Seg7, Switches, Mouse, Timer
+from tracer import Tracer, TraceBuffer
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import constants as const
+
+# Default programs directory, next to the source folder.
+DEFAULT_PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs')
+
+# Number of instructions simulated between two checks of the cycle limit.
+RUN_SLICE = 1000
+
+# Status of a test.
+PASSED, FAILED, ERROR, SKIPPED, UPDATED = 'passed', 'failed', 'error', 'skipped', 'updated'
+
+class Stimuli(NamedTuple):
+    '''
+        Stimuli and limits of a regression test, declared per program in the manifest file.
+
+        Attributes:
+            max_instructions: Maximum number of executed instructions.
+            max_cycles: Simulated time in clock cycles at which the test stops. The idle processor skips
+                        ahead to the next event up to this time. Busy code is checked every RUN_SLICE instructions.
+            ram: Path to the initial RAM .mem file, relative to the programs directory, zero RAM by default.
+            switches: 16-bit position of the slide switches.
+            timer: Period of the timer interrupt in clock cycles, no timer by default.
+            mouse: List of [time, x, y] or [time, x, y, status] mouse events.
+            trace: Flag to also compare the digest of the binary execution trace, see tracer.TraceBuffer.
+    '''
+    max_instructions: int = 100_000
+    max_cycles: int = 1_000_000
+    ram: Optional[str] = None
+    switches: int = 0
+    timer: Optional[int] = None
+    mouse: Tuple[Tuple[int, ...], ...] = ()
+    trace: bool = False
+
+class TestResult(NamedTuple):
+    '''
+        Result of a regression test.
+
+        Attributes:
+            name: Name of the program, without extension.
+            status: One of PASSED, FAILED, ERROR, SKIPPED or UPDATED.
+            seconds: Time taken by the test.
+            message: String describing the differences or the error, empty if the test passed.
+    '''
+    name: str
+    status: str
+    seconds: float
+    message: str = ''
+
+def arg_parse() -> argparse.Namespace:
+    '''
+        Function to parse command line arguments.
+
+        Returns:
+            A namedtuple with the arguments.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='regression.py',
+        description='Golden output regression tests of the programs.'
+    )
+
+    parser.add_argument('--programs', '-p',
+                        type=str,
+                        default=DEFAULT_PROGRAMS_DIR,
+                        help='Path to the programs directory holding the .asm files, the manifest and the golden files.')
+    parser.add_argument('--tests', '-t',
+                        type=str,
+                        nargs='+',
+                        default=None,
+                        help='Names of the programs to test, all by default.')
+    parser.add_argument('--update', '-u',
+                        action='store_true',
+                        default=False,
+                        help='Flag to record the golden files from the current outputs instead of comparing against them.')
+    parser.add_argument('--changed', '-c',
+                        action='store_true',
+                        default=False,
+                        help='Flag to skip the tests that passed with the same program, stimuli, golden file and tools.')
+    parser.add_argument('--jobs', '-j',
+                        type=int,
+                        default=None,
+                        help='Number of processes running the tests. Defaults to the number of CPUs.')
+    parser.add_argument('--junit',
+                        type=str,
+                        default=None,
+                        help='Path to the JUnit XML report.')
+
+    return parser.parse_args()
+
+def load_manifest(programs_dir:str) -> Dict[str, Stimuli]:
+    '''
+        Function to load the stimuli of the programs from the manifest file of the programs
+        directory, a JSON object mapping program names to objects with the fields of Stimuli.
+
+        Returns:
+            Dictionary mapping the program names to their stimuli. Programs missing from the
+            manifest use the default stimuli.
+
+        Raises:
+            InvalidFileException if the manifest is not valid.
+    '''
+    path = os.path.join(programs_dir, const.REGRESSION_MANIFEST_FILE)
+    if not os.path.exists(path):
+        return dict()
+
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+
+        return {name : Stimuli(**{**entry, 'mouse' : tuple(map(tuple, entry.get('mouse', ())))})
+                for name, entry in manifest.items()}
+
+    except (ValueError, TypeError, AttributeError) as e:
+        raise exc.InvalidFileException(f'Manifest {path} is not valid: {e}')
+
+def get_tools_digest() -> str:
+    '''
+        Function to compute the digest of the assembler and simulator sources, so that a change
+        of the tools runs the tests again.
+    '''
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+
+    return digest.hexdigest()
+
+def get_source_hash(programs_dir:str, name:str, stimuli:Stimuli, tools_digest:str) -> str:
+    '''
+        Function to compute the hash of everything a test depends on: the program, its stimuli and
+        initial RAM file, its golden file and the tools.
+
+        Returns:
+            String corresponding to the HEX digest of the hash.
+    '''
+    digest = hashlib.sha256()
+    digest.update(f'{tools_digest}:{json.dumps(stimuli._asdict(), sort_keys=True)}\n'.encode())
+
+    paths = [os.path.join(programs_dir, name + const.ASSEMBLY_FILE_EXTENSION),
+             os.path.join(programs_dir, const.GOLDEN_DIR, name + const.GOLDEN_FILE_EXTENSION)]
+    if stimuli.ram:
+        paths.append(os.path.join(programs_dir, stimuli.ram))
+
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        else:
+            digest.update(b'\0' * 32)
+
+    return digest.hexdigest()
+
+def simulate(input_path:str, stimuli:Stimuli, ram_path:Optional[str]=None) -> Dict:
+    '''
+        Function to assemble a program and simulate it with the given stimuli. Errors of the
+        assembler and of the simulator are part of the outcome, so programs expected to fail can
+        be tested too.
+
+        Parameters:
+            input_path: Path to the .asm file.
+            stimuli: Stimuli of the test.
+            ram_path (optional): Path to the initial RAM .mem file.
+
+        Returns:
+            Dictionary with the digest of the ROM image, the error if any, the executed instructions
+            and cycles, the final RAM as HEX, the LEDs and 7-segment display values and the digest
+            of the trace if enabled.
+    '''
+    outcome = {'rom' : None, 'error' : None}
+
+    try:
+        raw_program = utils.AsmFile(input_path)
+        result = assemble_program(utils.Stream(raw_program, utils.iter_clean), filename=input_path)
+
+        rom = hashlib.sha256(result.rom)
+        rom.update(','.join(map(str, sorted(result.high_z))).encode())
+        outcome['rom'] = rom.hexdigest()
+
+        ram = None
+        if ram_path is not None:
+            with open(ram_path, 'r') as f:
+                ram = utils.parse_ram(f.read())
+
+        simulator = Simulator.from_result(result, ram=ram)
+        leds, seg7, mouse = Leds(), Seg7(), Mouse()
+        simulator.attach(leds, seg7, Switches(value=stimuli.switches), mouse)
+        if stimuli.timer:
+            simulator.attach(Timer(stimuli.timer))
+
+        for event_time, *position in stimuli.mouse:
+            mouse.move(*position, time=event_time)
+
+        tracer = None
+        if stimuli.trace:
+            simulator.profiler = tracer = Tracer(result.labels, TraceBuffer(capacity=max(stimuli.max_instructions, 1)), result.target)
+
+        try:
+            executed = 0
+            while executed < stimuli.max_instructions and simulator.time < stimuli.max_cycles:
+                count = min(RUN_SLICE, stimuli.max_instructions - executed)
+                slice_count = simulator.run(count, until=stimuli.max_cycles)
+                executed += slice_count
+                # Idle with no event due before the cycle limit.
+                if slice_count < count:
+                    break
+        except Exception as e:
+            outcome['error'] = f'{type(e).__name__}: {e}'
+
+        outcome.update({
+            'instructions' : simulator.instructions,
+            'cycles' : simulator.time,
+            'ram' : simulator.ram.hex().upper(),
+            'leds' : leds.value,
+            'seg7' : seg7.value
+        })
+
+        if tracer is not None:
+            outcome['trace'] = hashlib.sha256(tracer.trace.to_bytes()).hexdigest()
+
+    except Exception as e:
+        outcome['error'] = f'{type(e).__name__}: {e}'
+
+    return outcome
+
+def compare(expected:Dict, outcome:Dict) -> List[str]:
+    '''
+        Function to compare the outcome of a test against its golden outcome.
+
+        Returns:
+            List of string describing each difference, empty if the outcomes match.
+    '''
+    differences = []
+    for key in sorted(expected.keys() | outcome.keys()):
+        want, got = expected.get(key), outcome.get(key)
+        if want == got:
+            continue
+
+        if key == 'ram' and want and got:
+            addresses = [addr for addr in range(len(want) // 2) if want[2 * addr:2 * addr + 2] != got[2 * addr:2 * addr + 2]]
+            differences.append('ram differs at ' + ', '.join(f'{addr:02X}: {want[2 * addr:2 * addr + 2]} != {got[2 * addr:2 * addr + 2]}'
+                                                             for addr in addresses))
+        else:
+            differences.append(f'{key}: expected {want}, got {got}')
+
+    return differences
+
+def run_test(name:str, input_path:str, stimuli:Stimuli, ram_path:Optional[str], golden_path:str, update:bool) -> TestResult:
+    '''
+        Function to run a single regression test, comparing the outcome of the program against
+        its golden file or recording the golden file if update is set.
+
+        Returns:
+            TestResult of the test.
+    '''
+    start = time.perf_counter()
+
+    if not update and not os.path.exists(golden_path):
+        return TestResult(name, ERROR, time.perf_counter() - start, f'Golden file {golden_path} does not exist, run with --update.')
+
+    outcome = simulate(input_path, stimuli, ram_path)
+
+    if update:
+        utils.mkdir(os.path.dirname(golden_path))
+        utils.write_file(json.dumps(outcome, indent=2) + '\n', golden_path)
+        return TestResult(name, UPDATED, time.perf_counter() - start)
+
+    with open(golden_path, 'r') as f:
+        expected = json.load(f)
+
+    differences = compare(expected, outcome)
+    return TestResult(name, FAILED if differences else PASSED, time.perf_counter() - start, '\n'.join(differences))
+
+def render_junit(results:List[TestResult], seconds:float) -> str:
+    '''
+        Function to render the results as a JUnit XML report.
+
+        Parameters:
+            results: List of TestResult.
+            seconds: Wall time of the whole run.
+
+        Returns:
+            String corresponding to the report.
+    '''
+    suite = ET.Element('testsuite', name='regression', tests=str(len(results)),
+                       failures=str(sum(result.status == FAILED for result in results)),
+                       errors=str(sum(result.status == ERROR for result in results)),
+                       skipped=str(sum(result.status == SKIPPED for result in results)),
+                       time=f'{seconds:.3f}')
+
+    for result in results:
+        case = ET.SubElement(suite, 'testcase', classname='programs', name=result.name, time=f'{result.seconds:.3f}')
+        if result.status == FAILED:
+            ET.SubElement(case, 'failure', message=result.message.splitlines()[0]).text = result.message
+        elif result.status == ERROR:
+            ET.SubElement(case, 'error', message=result.message)
+        elif result.status == SKIPPED:
+            ET.SubElement(case, 'skipped', message=result.message)
+
+    root = ET.Element('testsuites')
+    root.append(suite)
+    ET.indent(root)
+
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding='unicode') + '\n'
+
+def run(programs_dir:str, names:Optional[List[str]]=None, update:bool=False, changed:bool=False,
+        jobs:Optional[int]=None) -> List[TestResult]:
+    '''
+        Function to run the regression tests of the programs of a directory in a process pool.
+        The hash of each passed test is saved in the state file of the golden directory, so
+        that with changed set, only the tests whose program, stimuli, RAM file, golden file or
+        tools changed since they last passed are run again.
+
+        Parameters:
+            programs_dir: Path to the programs directory.
+            names (optional): Names of the programs to test, all by default.
+            update (optional): Flag to record the golden files instead of comparing against them.
+            changed (optional): Flag to skip the tests that passed with the same hash.
+            jobs (optional): Number of processes, the number of CPUs by default.
+
+        Returns:
+            List of TestResult sorted by name.
+
+        Raises:
+            InvalidArgumentException if the number of processes is below 1.
+            InvalidFileException if a program doesn't exist or the manifest is not valid.
+    '''
+    if jobs is not None and jobs < 1:
+        raise exc.InvalidArgumentException(f'Number of processes must be at least 1 but got {jobs}.')
+
+    manifest = load_manifest(programs_dir)
+    if names is None:
+        names = sorted(os.path.splitext(os.path.basename(path))[0]
+                       for path in glob.glob(os.path.join(programs_dir, '*' + const.ASSEMBLY_FILE_EXTENSION)))
+
+    golden_dir = os.path.join(programs_dir, const.GOLDEN_DIR)
+    state_path = os.path.join(golden_dir, const.REGRESSION_STATE_FILE)
+    state = dict()
+    if os.path.exists(state_path):
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+
+    tools_digest = get_tools_digest()
+    results = []
+    tasks = []
+    for name in names:
+        input_path = os.path.join(programs_dir, name + const.ASSEMBLY_FILE_EXTENSION)
+        if not os.path.exists(input_path):
+            raise exc.InvalidFileException(f'Program {input_path} does not exists.')
+
+        stimuli = manifest.get(name, Stimuli())
+        if changed and not update and state.get(name) == get_source_hash(programs_dir, name, stimuli, tools_digest):
+            results.append(TestResult(name, SKIPPED, 0.0, 'Unchanged since it last passed.'))
+            continue
+
+        ram_path = os.path.join(programs_dir, stimuli.ram) if stimuli.ram else None
+        tasks.append((name, input_path, stimuli, ram_path, os.path.join(golden_dir, name + const.GOLDEN_FILE_EXTENSION), update))
+
+    if len(tasks) <= 1 or jobs == 1:
+        results += [run_test(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results += list(executor.map(run_test, *zip(*tasks)))
+
+    # Hash after running, so that recorded golden files are part of it.
+    for result in results:
+        if result.status in (PASSED, UPDATED):
+            state[result.name] = get_source_hash(programs_dir, result.name, manifest.get(result.name, Stimuli()), tools_digest)
+        elif result.status != SKIPPED:
+            state.pop(result.name, None)
+
+    if os.path.isdir(golden_dir):
+        utils.write_file(json.dumps(state, indent=2, sort_keys=True) + '\n', state_path)
+
+    return sorted(results)
+
+def main():
+    # Parse command line arguments
+    args = arg_parse()
+
+    start = time.perf_counter()
+    try:
+        results = run(args.programs, args.tests, args.update, args.changed, args.jobs)
+    except Exception as e:
+        print(f'{type(e).__name__}: {e}')
+        sys.exit(1)
+    seconds = time.perf_counter() - start
+
+    for result in results:
+        print(f'{result.name:<24} {result.status:<8} {result.seconds:>7.3f} s')
+        if result.status in (FAILED, ERROR):
+            for line in result.message.splitlines():
+                print(f'    {line}')
+
+    counts = {status : sum(result.status == status for result in results) for status in (PASSED, FAILED, ERROR, SKIPPED, UPDATED)}
+    print(', '.join(f'{count} {status}' for status, count in counts.items() if count) + f' in {seconds:.3f} s.')
+
+    if args.junit:
+        utils.write_file(render_junit(results, seconds), args.junit)
+
+    sys.exit(1 if counts[FAILED] or counts[ERROR] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,605 @@
+import zlib
+import heapq
+import struct
+import itertools
+from typing import Callable, FrozenSet, Iterable, List, Optional, Tuple, Union
+from constants import *
+from targets import DEFAULT_TARGET, Target
+import exceptions as exc
+
+############################################################
+# Kinds of decoded instructions. Memory instructions are split on whether their address
+# is in RAM or in the memory mapped peripherals, which is known when the ROM is decoded.
+(LOAD_A, LOAD_B, STORE_A, STORE_B,
+ LOAD_A_IO, LOAD_B_IO, STORE_A_IO, STORE_B_IO,
+ ALU_A, ALU_B, BRANCH, GOTO, IDLE, CALL, RETURN,
+ DEREF_A, DEREF_B, INVALID) = range(18)
+
+def _alu(op_code:int, a:int, b:int) -> int:
+    '''
+        Function to compute the 8-bit result of an ALU operation.
+    '''
+    if op_code == ALU_OPS.ADD:   return (a + b) & 0xFF
+    if op_code == ALU_OPS.SUB:   return (a - b) & 0xFF
+    if op_code == ALU_OPS.MUL:   return (a * b) & 0xFF
+    if op_code == ALU_OPS.SL_A:  return (a << 1) & 0xFF
+    if op_code == ALU_OPS.SR_A:  return a >> 1
+    if op_code == ALU_OPS.INC_A: return (a + 1) & 0xFF
+    if op_code == ALU_OPS.INC_B: return (b + 1) & 0xFF
+    if op_code == ALU_OPS.DEC_A: return (a - 1) & 0xFF
+    if op_code == ALU_OPS.DEC_B: return (b - 1) & 0xFF
+    if op_code == ALU_OPS.EQ:    return int(a == b)
+    if op_code == ALU_OPS.GT:    return int(a > b)
+    if op_code == ALU_OPS.LT:    return int(a < b)
+    if op_code == ALU_OPS.AND:   return a & b
+    if op_code == ALU_OPS.OR:    return a | b
+    if op_code == ALU_OPS.XOR:   return a ^ b
+    if op_code == ALU_OPS.NOT_A: return ~a & 0xFF
+    if op_code == ALU_OPS.OUT_A: return a
+
+    raise exc.ImplementationErrorException(f'ALU op-code {op_code} is not implemented!')
+
+# Result of each ALU operation for every pair of register values, indexed by A << 8 | B.
+ALU_TABLES = [bytes([_alu(op_code, a, b) for a in range(256) for b in range(256)])
+              for op_code in sorted(ALU_OPS)]
+
+def _decode(byte:int) -> Tuple[int, Optional[bytes], int, int]:
+    '''
+        Function to decode an op-code byte. The lower nibble selects the instruction, the upper
+        nibble the ALU operation or branch condition.
+
+        Returns:
+            kind: Kind of the decoded instruction.
+            table: ALU table of the ALU operation or branch condition, None for other instructions.
+            size: Number of ROM bytes of the instruction.
+            cycles: Estimated clock cycles of the instruction.
+    '''
+    inst, upper = byte & 0xF, byte >> 4
+
+    if inst not in INST._value2member_map_:
+        return INVALID, None, 1, 0
+
+    cycles = INST_CYCLES[inst]
+
+    if inst == INST.READ_MEM_TO_A:  return LOAD_A, None, 2, cycles
+    if inst == INST.READ_MEM_TO_B:  return LOAD_B, None, 2, cycles
+    if inst == INST.WRITE_A_TO_MEM: return STORE_A, None, 2, cycles
+    if inst == INST.WRITE_B_TO_MEM: return STORE_B, None, 2, cycles
+    if inst == INST.ALU_OP_TO_A:    return ALU_A, ALU_TABLES[upper], 1, cycles
+    if inst == INST.ALU_OP_TO_B:    return ALU_B, ALU_TABLES[upper], 1, cycles
+    if inst == INST.GOTO:           return GOTO, None, 2, cycles
+    if inst == INST.GOTO_IDLE:      return IDLE, None, 1, cycles
+    if inst == INST.FUNC_CALL:      return CALL, None, 2, cycles
+    if inst == INST.RETURN:         return RETURN, None, 1, cycles
+    if inst == INST.DEREF_A:        return DEREF_A, None, 1, cycles
+    if inst == INST.DEREF_B:        return DEREF_B, None, 1, cycles
+
+    if inst == INST.BRANCH:
+        if upper not in BRANCH_TYPES._value2member_map_:
+            return INVALID, None, 1, 0
+        return BRANCH, ALU_TABLES[upper], 2, cycles
+
+    raise exc.ImplementationErrorException(f'Instruction {inst} is not implemented!')
+
+# Decoded instruction of each op-code byte.
+DECODE_TABLE = [_decode(byte) for byte in range(256)]
+
+# Decoded high impedance op-codes, i.e. COPY A and COPY B, indexed by their lower nibble.
+HIGH_Z_DECODE = {
+    INST.ALU_OP_TO_A : (ALU_A, ALU_TABLES[ALU_OPS.OUT_A], 1, INST_CYCLES[INST.ALU_OP_TO_A]),
+    INST.ALU_OP_TO_B : (ALU_B, ALU_TABLES[ALU_OPS.OUT_A], 1, INST_CYCLES[INST.ALU_OP_TO_B])
+}
+
+# Memory instruction kinds accessing the memory mapped peripherals.
+IO_KINDS = {LOAD_A : LOAD_A_IO, LOAD_B : LOAD_B_IO, STORE_A : STORE_A_IO, STORE_B : STORE_B_IO}
+
+# Instruction kinds with a ROM address operand, of the operand size of the target.
+ROM_OPERAND_KINDS = {BRANCH, GOTO, CALL}
+
+# Machine state snapshots, see Simulator.snapshot. The header holds the magic bytes, the CRC-32
+# of the ROM, A, B, PC, context, idle flag, number of pending interrupts, executed instructions,
+# cycles, idle cycles, next event sequence number, number of peripherals and number of events.
+SNAPSHOT_MAGIC = b'RVSNAP01'
+SNAPSHOT_HEADER = struct.Struct('<8sIBBHHBBQQQQHI')
+
+# Scheduled event of a snapshot: time, sequence number, owner of the callback (-1 for the
+# simulator, index of the peripheral otherwise), length of the callback name and number of
+# arguments, followed by the name and the arguments as signed 64-bit integers.
+SNAPSHOT_EVENT = struct.Struct('<QQhBB')
+
+class Simulator:
+    '''
+        Instruction set simulator of the 8-bit processor, executing an assembled ROM image.
+
+        Every ROM address is decoded once, when the simulator is created, into a tuple of
+        (kind, ALU table, operand, cycles, next address), so executing an instruction is a
+        single list lookup followed by the handling of its kind.
+
+        Attributes:
+            target: Core the ROM image is assembled for, setting the ROM and RAM sizes, the size of
+                    the ROM address operands and the interrupt vectors, see targets.Target.
+            rom: bytearray corresponding to the ROM image.
+            ram: bytearray corresponding to the RAM.
+            io: bytearray holding the last value written to each memory mapped peripheral address.
+            bus: Peripheral model attached to each bus address, None for addresses backed by io.
+            peripherals: List of the attached peripheral models.
+            events: Heap of the scheduled (time, sequence number, callback, arguments) events.
+            profiler: Profiler counting the executed instructions, None if profiling is disabled, see profiler.py.
+            a, b: Values of the A and B registers.
+            pc: Program counter.
+            context: Return address saved by the last function call.
+            idle: True if the processor waits for interrupts.
+            pending: List of the vector addresses of the raised, not yet serviced interrupts.
+            instructions: Number of executed instructions.
+            cycles: Estimated number of clock cycles of the executed instructions.
+            idle_cycles: Number of clock cycles spent idle, skipped to the next event.
+    '''
+
+    def __init__(self, rom:Union[bytes, bytearray], high_z:FrozenSet[int]=frozenset(),
+                 ram:Optional[Union[bytes, bytearray]]=None, target:Target=DEFAULT_TARGET):
+        '''
+            Parameters:
+                rom: ROM image, e.g. the rom of an AssemblyResult.
+                high_z (optional): Set of ROM addresses with a high impedance upper nibble.
+                ram (optional): Initial content of the RAM, zero by default.
+                target (optional): Core the ROM image is assembled for, see targets.Target.
+
+            Raises:
+                InvalidProgramSizeException if the ROM or RAM image doesn't fit in the memory.
+        '''
+        if len(rom) > target.rom_size:
+            raise exc.InvalidProgramSizeException(f'ROM image is {len(rom)} bytes for {target.rom_size} bytes ROM of the {target.name} target.')
+
+        self.target = target
+        # Interrupt vectors in order of priority.
+        self.vectors = [target.mouse_vector, target.timer_vector]
+        self.rom = bytearray(rom) + bytearray(b'\xFF') * (target.rom_size - len(rom))
+        self.high_z = frozenset(high_z)
+        self.ram = bytearray(target.ram_size)
+        self.io = bytearray(BUS_SIZE)
+        self.bus = [None] * BUS_SIZE
+        self.peripherals = []
+        self._event_ids = itertools.count()
+        self.profiler = None
+        self.program = self.decode()
+        self.reset(ram)
+
+    @classmethod
+    def from_result(cls, result, ram:Optional[Union[bytes, bytearray]]=None) -> 'Simulator':
+        '''
+            Function to create a simulator from the result of assembler.assemble. The constant
+            pool of the program is loaded into the RAM, over the given RAM image if any.
+        '''
+        if result.constant_pool:
+            ram = bytearray(ram or b'').ljust(result.target.ram_size, b'\0')
+            for value, addr in result.constant_pool.items():
+                ram[addr] = value
+
+        return cls(result.rom, result.high_z, ram, target=result.target)
+
+    def decode(self) -> List[Tuple[int, Optional[bytes], Optional[int], int, int]]:
+        '''
+            Function to decode every ROM address.
+
+            Returns:
+                List of (kind, ALU table, operand, cycles, next address) tuples indexed by ROM address.
+        '''
+        rom = self.rom
+        rom_size = len(rom)
+        ram_size = self.target.ram_size
+        operand_bytes = self.target.operand_bytes
+        program = []
+
+        for pc, byte in enumerate(rom):
+            if pc in self.high_z and byte & 0xF in HIGH_Z_DECODE:
+                kind, table, size, cycles = HIGH_Z_DECODE[byte & 0xF]
+            else:
+                kind, table, size, cycles = DECODE_TABLE[byte]
+
+            operand = None
+            if kind in ROM_OPERAND_KINDS:
+                size = 1 + operand_bytes
+
+            if size > 1:
+                if pc + size <= rom_size:
+                    operand = int.from_bytes(rom[pc + 1:pc + size], 'little')
+                    # The program counter only keeps the ROM address bits of the operand.
+                    if kind in ROM_OPERAND_KINDS:
+                        operand %= rom_size
+                    elif operand >= ram_size and kind in IO_KINDS:
+                        kind = IO_KINDS[kind]
+                else:
+                    # Operand falls outside of the ROM.
+                    kind, table, cycles = INVALID, None, 0
+
+            program.append((kind, table, operand, cycles, (pc + size) % rom_size))
+
+        return program
+
+    def reset(self, ram:Optional[Union[bytes, bytearray]]=None) -> None:
+        '''
+            Function to reset the processor and the memories.
+
+            Parameters:
+                ram (optional): Initial content of the RAM, zero by default.
+        '''
+        if ram is not None and len(ram) > len(self.ram):
+            raise exc.InvalidProgramSizeException(f'RAM image is {len(ram)} bytes for {len(self.ram)} bytes RAM.')
+
+        self.ram[:] = bytes(len(self.ram))
+        if ram is not None:
+            self.ram[:len(ram)] = ram
+        self.io[:] = bytes(BUS_SIZE)
+
+        self.a = 0
+        self.b = 0
+        self.pc = 0
+        self.context = 0
+        self.idle = False
+        self.pending = []
+        self.instructions = 0
+        self.cycles = 0
+        self.idle_cycles = 0
+        self.events = []
+
+        for peripheral in self.peripherals:
+            peripheral.reset()
+
+    @property
+    def time(self) -> int:
+        '''
+            Simulated time in clock cycles, i.e. the cycles of the executed instructions plus the
+            skipped idle cycles. Only updated when the processor goes idle and at the end of run.
+        '''
+        return self.cycles + self.idle_cycles
+
+    def attach(self, *peripherals) -> None:
+        '''
+            Function to attach peripheral models to the data bus, see peripherals.py.
+
+            Parameters:
+                peripherals: Peripheral models to attach.
+
+            Raises:
+                InvalidAddressException if a peripheral overlaps the RAM or an attached peripheral.
+        '''
+        for peripheral in peripherals:
+            addresses = range(peripheral.base_addr, peripheral.base_addr + peripheral.size)
+
+            if peripheral.size and (addresses.start < len(self.ram) or addresses.stop > BUS_SIZE):
+                raise exc.InvalidAddressException(f'Peripheral at {addresses.start:02X} is outside of the memory mapped peripherals.')
+
+            for addr in addresses:
+                if self.bus[addr] is not None:
+                    raise exc.InvalidAddressException(f'Peripheral at {addresses.start:02X} overlaps the peripheral at {self.bus[addr].base_addr:02X}.')
+
+            for addr in addresses:
+                self.bus[addr] = peripheral
+
+            self.peripherals.append(peripheral)
+            peripheral.attach(self)
+
+    def read_io(self, addr:int) -> int:
+        '''
+            Function to read a memory mapped peripheral address. Returns the value of the attached
+            peripheral model, or the last value written to the address if there is none.
+        '''
+        peripheral = self.bus[addr]
+        if peripheral is None:
+            return self.io[addr]
+
+        return peripheral.read(addr - peripheral.base_addr) & 0xFF
+
+    def write_io(self, addr:int, value:int) -> None:
+        '''
+            Function to write a memory mapped peripheral address.
+        '''
+        self.io[addr] = value
+
+        peripheral = self.bus[addr]
+        if peripheral is not None:
+            peripheral.write(addr - peripheral.base_addr, value)
+
+    def schedule(self, time:int, callback:Callable, *args) -> None:
+        '''
+            Function to schedule an event. Events are delivered in order of time, then in order of
+            scheduling, when the processor goes idle, i.e. when it can take interrupts.
+
+            Parameters:
+                time: Simulated time of the event in clock cycles, see time.
+                callback: Function called with args when the event is delivered.
+                args: Arguments of the callback.
+        '''
+        heapq.heappush(self.events, (time, next(self._event_ids), callback, args))
+
+    def schedule_interrupt(self, time:int, vector:int) -> None:
+        '''
+            Function to schedule an interrupt to be raised at the given simulated time.
+        '''
+        self.schedule(time, self.interrupt, vector)
+
+    def interrupt(self, vector:int) -> None:
+        '''
+            Function to raise an interrupt. It is serviced the next time the processor is idle.
+
+            Parameters:
+                vector: ROM address holding the address of the interrupt handler, e.g. target.mouse_vector.
+        '''
+        if vector not in self.pending:
+            self.pending.append(vector)
+
+    def _deliver_events(self, until:Optional[int]=None) -> None:
+        '''
+            Function to deliver the events due by the current time. Without pending interrupts,
+            the idle time is skipped to the next event as long as it is due by until.
+        '''
+        events = self.events
+
+        while True:
+            while events and events[0][0] <= self.time:
+                _, _, callback, args = heapq.heappop(events)
+                callback(*args)
+
+            if self.pending or until is None:
+                return
+
+            if not events or events[0][0] > until:
+                # Stay idle until the end of the simulated time.
+                self.idle_cycles += max(until - self.time, 0)
+                return
+
+            self.idle_cycles += events[0][0] - self.time
+
+    def _service_interrupt(self, until:Optional[int]=None) -> bool:
+        '''
+            Function to jump to the handler of the pending interrupt with the highest priority,
+            delivering the scheduled events first.
+
+            Parameters:
+                until (optional): Simulated time up to which the idle time can be skipped to the next event.
+
+            Returns:
+                True if an interrupt was serviced, False if no interrupt is pending.
+        '''
+        if self.events or until is not None:
+            self._deliver_events(until)
+
+        for vector in self.vectors:
+            if vector in self.pending:
+                self.pending.remove(vector)
+                break
+        else:
+            if not self.pending:
+                return False
+            vector = self.pending.pop(0)
+
+        self.pc = int.from_bytes(self.rom[vector:vector + self.target.operand_bytes], 'little') % len(self.rom)
+        self.idle = False
+        return True
+
+    def snapshot(self) -> bytes:
+        '''
+            Function to save the full machine state to a compact binary snapshot: registers, program
+            counter, return context, RAM, peripheral registers and models, pending interrupts,
+            scheduled events and counters. A simulator of the same ROM with the same peripherals
+            attached can resume from the snapshot, see restore.
+
+            Returns:
+                bytes corresponding to the snapshot.
+
+            Raises:
+                InvalidArgumentException if an event calls back a function that is not a method of
+                the simulator or of one of its peripherals.
+        '''
+        # Peek at the next event sequence number.
+        next_event_id = next(self._event_ids)
+        self._event_ids = itertools.count(next_event_id)
+
+        chunks = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, zlib.crc32(self.rom), self.a, self.b, self.pc, self.context,
+                                       self.idle, len(self.pending), self.instructions, self.cycles, self.idle_cycles,
+                                       next_event_id, len(self.peripherals), len(self.events)),
+                  struct.pack(f'<{len(self.pending)}H', *self.pending),
+                  bytes(self.ram),
+                  bytes(self.io)]
+
+        for peripheral in self.peripherals:
+            name = type(peripheral).__name__.encode()
+            state = peripheral.save_state()
+            chunks += [struct.pack('<BH', len(name), len(state)), name, state]
+
+        owners = [self, *self.peripherals]
+        for time, event_id, callback, args in self.events:
+            owner = getattr(callback, '__self__', None)
+            if not any(owner is candidate for candidate in owners):
+                raise exc.InvalidArgumentException(f'Event callback {callback} can\'t be saved in a snapshot, only methods of the simulator and its peripherals can.')
+
+            name = callback.__name__.encode()
+            owner_idx = [idx for idx, candidate in enumerate(owners) if candidate is owner][0] - 1
+            chunks += [SNAPSHOT_EVENT.pack(time, event_id, owner_idx, len(name), len(args)), name,
+                       struct.pack(f'<{len(args)}q', *args)]
+
+        return b''.join(chunks)
+
+    def restore(self, snapshot:Union[bytes, bytearray]) -> None:
+        '''
+            Function to restore the machine state saved by snapshot. The simulator must run the
+            same ROM and have the same peripherals attached, in the same order.
+
+            Parameters:
+                snapshot: bytes corresponding to the snapshot.
+
+            Raises:
+                InvalidArgumentException if the snapshot is not valid or was taken on another ROM or
+                with other peripherals.
+        '''
+        try:
+            (magic, rom_crc, a, b, pc, context, idle, pending_count, instructions, cycles, idle_cycles,
+             next_event_id, peripheral_count, event_count) = SNAPSHOT_HEADER.unpack_from(snapshot)
+            if magic != SNAPSHOT_MAGIC:
+                raise exc.InvalidArgumentException('Data is not a simulator snapshot.')
+            if rom_crc != zlib.crc32(self.rom):
+                raise exc.InvalidArgumentException('Snapshot was taken on another ROM.')
+            if peripheral_count != len(self.peripherals):
+                raise exc.InvalidArgumentException(f'Snapshot has {peripheral_count} peripherals but {len(self.peripherals)} are attached.')
+
+            offset = SNAPSHOT_HEADER.size
+            pending = list(struct.unpack_from(f'<{pending_count}H', snapshot, offset))
+            offset += 2 * pending_count
+            ram = snapshot[offset:offset + len(self.ram)]
+            offset += len(self.ram)
+            io = snapshot[offset:offset + BUS_SIZE]
+            offset += BUS_SIZE
+
+            states = []
+            for peripheral in self.peripherals:
+                name_length, state_length = struct.unpack_from('<BH', snapshot, offset)
+                offset += 3
+                name = bytes(snapshot[offset:offset + name_length]).decode()
+                offset += name_length
+                if name != type(peripheral).__name__:
+                    raise exc.InvalidArgumentException(f'Snapshot has a {name} peripheral where a {type(peripheral).__name__} is attached.')
+                states.append(bytes(snapshot[offset:offset + state_length]))
+                offset += state_length
+
+            owners = [self, *self.peripherals]
+            events = []
+            for _ in range(event_count):
+                time, event_id, owner_idx, name_length, arg_count = SNAPSHOT_EVENT.unpack_from(snapshot, offset)
+                offset += SNAPSHOT_EVENT.size
+                name = bytes(snapshot[offset:offset + name_length]).decode()
+                offset += name_length
+                args = struct.unpack_from(f'<{arg_count}q', snapshot, offset)
+                offset += 8 * arg_count
+                events.append((time, event_id, getattr(owners[owner_idx + 1], name), args))
+
+            if len(ram) != len(self.ram) or len(io) != BUS_SIZE or offset != len(snapshot):
+                raise exc.InvalidArgumentException('Snapshot is truncated or has trailing data.')
+
+        except (struct.error, AttributeError, IndexError, UnicodeDecodeError) as e:
+            raise exc.InvalidArgumentException(f'Snapshot is not valid: {e}')
+
+        self.a, self.b, self.pc, self.context = a, b, pc, context
+        self.idle = bool(idle)
+        self.pending = pending
+        self.instructions, self.cycles, self.idle_cycles = instructions, cycles, idle_cycles
+        self.ram[:] = ram
+        self.io[:] = io
+        self.events = events
+        self._event_ids = itertools.count(next_event_id)
+
+        for peripheral, state in zip(self.peripherals, states):
+            peripheral.load_state(state)
+
+    def step(self) -> bool:
+        '''
+            Function to execute a single instruction.
+
+            Returns:
+                True if an instruction was executed, False if the processor is idle without pending interrupts.
+        '''
+        return self.run(1) == 1
+
+    def run(self, max_instructions:Optional[int]=None, until:Optional[int]=None) -> int:
+        '''
+            Function to execute instructions until the processor goes idle with no pending
+            interrupts or the instruction limit is reached.
+
+            Parameters:
+                max_instructions (optional): Maximum number of instructions to execute, unlimited by default.
+                until (optional): Simulated time in clock cycles up to which the idle processor skips
+                                  ahead to the next scheduled event. By default, the processor only
+                                  takes the events that are already due.
+
+            Returns:
+                Number of executed instructions.
+
+            Raises:
+                InvalidInstructionException if the processor fetches a byte that is not an instruction.
+        '''
+        if self.profiler is not None:
+            return self.profiler.run(self, max_instructions, until)
+
+        if self.idle and not self._service_interrupt(until):
+            return 0
+
+        limit = -1 if max_instructions is None else max_instructions
+        program = self.program
+        ram = self.ram
+        ram_size = len(ram)
+        read_io = self.read_io
+        write_io = self.write_io
+        a, b, pc, context = self.a, self.b, self.pc, self.context
+        count = 0
+        cycles = 0
+
+        try:
+            while count != limit:
+                kind, table, operand, cost, next_pc = program[pc]
+
+                if kind == ALU_A:
+                    a = table[a << 8 | b]
+                    pc = next_pc
+                elif kind == ALU_B:
+                    b = table[a << 8 | b]
+                    pc = next_pc
+                elif kind == LOAD_A:
+                    a = ram[operand]
+                    pc = next_pc
+                elif kind == LOAD_B:
+                    b = ram[operand]
+                    pc = next_pc
+                elif kind == STORE_A:
+                    ram[operand] = a
+                    pc = next_pc
+                elif kind == STORE_B:
+                    ram[operand] = b
+                    pc = next_pc
+                elif kind == BRANCH:
+                    pc = operand if table[a << 8 | b] else next_pc
+                elif kind == GOTO:
+                    pc = operand
+                elif kind == CALL:
+                    context = next_pc
+                    pc = operand
+                elif kind == RETURN:
+                    pc = context
+                elif kind == LOAD_A_IO:
+                    a = read_io(operand)
+                    pc = next_pc
+                elif kind == LOAD_B_IO:
+                    b = read_io(operand)
+                    pc = next_pc
+                elif kind == STORE_A_IO:
+                    write_io(operand, a)
+                    pc = next_pc
+                elif kind == STORE_B_IO:
+                    write_io(operand, b)
+                    pc = next_pc
+                elif kind == DEREF_A:
+                    a = ram[a] if a < ram_size else read_io(a)
+                    pc = next_pc
+                elif kind == DEREF_B:
+                    b = ram[b] if b < ram_size else read_io(b)
+                    pc = next_pc
+                elif kind == IDLE:
+                    count += 1
+                    self.cycles += cycles + cost
+                    cycles = 0
+                    self.pc = pc = next_pc
+                    self.idle = True
+                    if not self._service_interrupt(until):
+                        break
+                    pc = self.pc
+                    continue
+                else:
+                    raise exc.InvalidInstructionException(f'Byte {self.rom[pc]:02X} at ROM address {pc:02X} is not a valid instruction.')
+
+                count += 1
+                cycles += cost
+
+        finally:
+            self.a, self.b, self.pc, self.context = a, b, pc, context
+            self.instructions += count
+            self.cycles += cycles
+
+        return count
@@ -0,0 +1,114 @@
+from array import array
+from typing import List, Optional, Tuple
+from instructions import Instruction
+from constants import *
+import exceptions as exc
+
+# First line of a source map file.
+SOURCE_MAP_HEADER = '// Source map: <ROM address> <file index> <line> <column>'
+
+class SourceMap:
+    '''
+        Index from ROM address to the position of the instruction in its assembly file. Every
+        byte of an instruction maps to the instruction. The index is held in arrays, one entry
+        per ROM address, so looking up a program counter is a constant time array access.
+
+        Attributes:
+            files: List of the paths of the assembly files.
+            file_idx: Index in files of the file of each ROM address.
+            lines: Line of each ROM address, starting from 1, 0 if the address is not mapped.
+            columns: Column of each ROM address, starting from 1, 0 if the address is not mapped.
+    '''
+
+    def __init__(self, files:Optional[List[str]]=None, size:int=ROM_SIZE):
+        self.files = list(files) if files else []
+        self.file_idx = array('H', bytes(2 * size))
+        self.lines = array('I', bytes(4 * size))
+        self.columns = array('I', bytes(4 * size))
+
+    @classmethod
+    def from_layout(cls, layout:List[Tuple[int, Instruction]], filename:str, size:int=ROM_SIZE) -> 'SourceMap':
+        '''
+            Function to build the source map of an assembled program.
+
+            Parameters:
+                layout: List of (ROM address, instruction) pairs, e.g. the layout of an AssemblyResult.
+                filename: Path of the assembly file of the program.
+                size (optional): Number of ROM addresses.
+
+            Returns:
+                SourceMap of the instructions with a known position.
+        '''
+        source_map = cls([filename], size)
+
+        for addr, instruction in layout:
+            if instruction.position is None: continue
+
+            line, column = instruction.position
+            for idx in range(addr, addr + instruction.size):
+                source_map.lines[idx] = line
+                source_map.columns[idx] = column
+
+        return source_map
+
+    def lookup(self, addr:int) -> Optional[Tuple[str, int, int]]:
+        '''
+            Function to get the source position of a ROM address.
+
+            Returns:
+                (file, line, column) of the instruction at the address, None if the address is not mapped.
+        '''
+        line = self.lines[addr]
+        if line == 0:
+            return None
+
+        return self.files[self.file_idx[addr]], line, self.columns[addr]
+
+    def render(self) -> str:
+        '''
+            Function to render the source map file, listing the files then one mapped ROM address per line.
+
+            Returns:
+                String corresponding to the content of the file.
+        '''
+        output = [SOURCE_MAP_HEADER]
+        output += [f'FILE {idx} {filename}' for idx, filename in enumerate(self.files)]
+        output += [f'{addr:02X} {self.file_idx[addr]} {line} {self.columns[addr]}'
+                   for addr, line in enumerate(self.lines) if line]
+
+        return '\n'.join(output) + '\n'
+
+    @classmethod
+    def parse(cls, text:str, size:int=ROM_SIZE) -> 'SourceMap':
+        '''
+            Function to parse a source map file rendered by render.
+
+            Raises:
+                InvalidFileException if the content is not a valid source map.
+        '''
+        source_map = cls(size=size)
+
+        try:
+            for line in text.splitlines():
+                if not line or line.startswith('//'): continue
+
+                if line.startswith('FILE '):
+                    source_map.files.append(line.split(None, 2)[2])
+                    continue
+
+                addr, file_idx, line_number, column = (int(field, base) for field, base in zip(line.split(), (16, 10, 10, 10)))
+                source_map.file_idx[addr] = file_idx
+                source_map.lines[addr] = line_number
+                source_map.columns[addr] = column
+
+        except (ValueError, IndexError, OverflowError) as e:
+            raise exc.InvalidFileException(f'Invalid source map line "{line}": {e}')
+
+        return source_map
+
+def load(filename:str, size:int=ROM_SIZE) -> SourceMap:
+    '''
+        Function to load a source map file.
+    '''
+    with open(filename, 'r') as f:
+        return SourceMap.parse(f.read(), size)
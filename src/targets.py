@@ -0,0 +1,66 @@
+from typing import Dict, NamedTuple
+from constants import *
+import exceptions as exc
+
+class Target(NamedTuple):
+    '''
+        Description of a version of the processor core the assembler can target.
+
+        The data bus stays 8-bit wide on every core, so S-Type and LI operands are always one
+        byte. ROM addresses, i.e. the operands of B-Type instructions and the interrupt vectors,
+        take operand_bytes bytes, least significant byte first.
+
+        Attributes:
+            name: Name of the target, used on the command line.
+            rom_addr_width: Width of the program counter, i.e. of the ROM addresses.
+            ram_addr_width: Width of the RAM addresses, at most BUS_ADDR_WIDTH.
+            operand_bytes: Number of bytes of a ROM address operand.
+            mouse_vector: ROM address of the MOUSE interrupt vector.
+            timer_vector: ROM address of the TIMER interrupt vector.
+    '''
+    name: str
+    rom_addr_width: int
+    ram_addr_width: int
+    operand_bytes: int
+    mouse_vector: int
+    timer_vector: int
+
+    @property
+    def rom_size(self) -> int:
+        return 2 ** self.rom_addr_width
+
+    @property
+    def ram_size(self) -> int:
+        return 2 ** self.ram_addr_width
+
+    @property
+    def vectors(self) -> Dict[str, int]:
+        '''
+            Dictionary mapping the interrupt labels to the ROM address of their vector.
+        '''
+        return {MOUSE_INTERRUPT : self.mouse_vector, TIMER_INTERRUPT : self.timer_vector}
+
+# Basys 3 core with an 8-bit program counter.
+BASYS3 = Target('basys3', ROM_ADDR_WIDTH, RAM_ADDR_WIDTH, 1, MOUSE_INTERRUPT_ADDR, TIMER_INTERRUPT_ADDR)
+
+# Cores with a 12-bit and a 16-bit program counter, with 2 byte vectors at the end of the ROM.
+CORE12 = Target('core12', 12, RAM_ADDR_WIDTH, 2, 2 ** 12 - 2, 2 ** 12 - 4)
+CORE16 = Target('core16', 16, RAM_ADDR_WIDTH, 2, 2 ** 16 - 2, 2 ** 16 - 4)
+
+DEFAULT_TARGET = BASYS3
+
+# name -> Target
+TARGETS = {target.name : target for target in [BASYS3, CORE12, CORE16]}
+
+def get_target(name:str) -> Target:
+    '''
+        Function to look up a target by name.
+
+        Raises:
+            InvalidArgumentException if the target is not supported.
+    '''
+    target = TARGETS.get(name)
+    if target is None:
+        raise exc.InvalidArgumentException(f'Target {name} is not supported. Use one of {list(TARGETS)} instead.')
+
+    return target
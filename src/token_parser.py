@@ -1,10 +1,84 @@
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import exceptions as exc
 import instructions as inst
+from instructions import Instruction
+from utils import convert_hex
+from targets import DEFAULT_TARGET, Target
 from constants import *
-from utils import update_labels
 
-def parse_S(line:str) -> str:
+############################################################
+# Static encoding tables, built once at import time from the encoders. Each entry maps
+# the token and its registers to the (op-code, comment) pair of the instruction.
+
+# ALU operation of each R-Type arithmetic token
+R_ALU_OPS = {
+    TOKENS.ADD.name  : ALU_OPS.ADD,
+    TOKENS.SUB.name  : ALU_OPS.SUB,
+    TOKENS.MUL.name  : ALU_OPS.MUL,
+    TOKENS.SLA.name  : ALU_OPS.SL_A,
+    TOKENS.SRA.name  : ALU_OPS.SR_A,
+    TOKENS.SEQ.name  : ALU_OPS.EQ,
+    TOKENS.SGT.name  : ALU_OPS.GT,
+    TOKENS.SLT.name  : ALU_OPS.LT,
+    TOKENS.AND.name  : ALU_OPS.AND,
+    TOKENS.OR.name   : ALU_OPS.OR,
+    TOKENS.XOR.name  : ALU_OPS.XOR,
+    TOKENS.NOT.name  : ALU_OPS.NOT_A,
+    TOKENS.COPY.name : ALU_OPS.OUT_A
+}
+
+# ALU operation of each RR-Type token, indexed by token and source register
+RR_ALU_OPS = {
+    (TOKENS.INC.name, REGISTERS.A.name) : ALU_OPS.INC_A,
+    (TOKENS.INC.name, REGISTERS.B.name) : ALU_OPS.INC_B,
+    (TOKENS.DEC.name, REGISTERS.A.name) : ALU_OPS.DEC_A,
+    (TOKENS.DEC.name, REGISTERS.B.name) : ALU_OPS.DEC_B
+}
+
+ALU_ENCODERS = {
+    REGISTERS.A.name : inst.alu_to_A,
+    REGISTERS.B.name : inst.alu_to_B
+}
+
+def _encoding(instruction:Instruction) -> Tuple[int, str]:
+    return instruction.opcode, instruction.comment
+
+# (token, register) -> (op-code, comment)
+S_ENCODING = {
+    (TOKENS.LB.name, REGISTERS.A.name) : _encoding(inst.read_mem_to_A(0)),
+    (TOKENS.LB.name, REGISTERS.B.name) : _encoding(inst.read_mem_to_B(0)),
+    (TOKENS.SB.name, REGISTERS.A.name) : _encoding(inst.write_A_to_mem(0)),
+    (TOKENS.SB.name, REGISTERS.B.name) : _encoding(inst.write_B_to_mem(0))
+}
+
+# (token, register) -> (op-code, comment)
+R_ENCODING = {(token, reg) : _encoding(encoder(op_code))
+              for token, op_code in R_ALU_OPS.items()
+              for reg, encoder in ALU_ENCODERS.items()}
+R_ENCODING[(TOKENS.DEREF.name, REGISTERS.A.name)] = _encoding(inst.deref_A())
+R_ENCODING[(TOKENS.DEREF.name, REGISTERS.B.name)] = _encoding(inst.deref_B())
+
+# (token, target register, source register) -> (op-code, comment)
+RR_ENCODING = {(token, target_reg, source_reg) : _encoding(encoder(op_code))
+               for (token, source_reg), op_code in RR_ALU_OPS.items()
+               for target_reg, encoder in ALU_ENCODERS.items()}
+
+# token -> (op-code, comment)
+B_ENCODING = {
+    TOKENS.BEQ.name  : _encoding(inst.breq(0)),
+    TOKENS.BGT.name  : _encoding(inst.bgtq(0)),
+    TOKENS.BLT.name  : _encoding(inst.bltq(0)),
+    TOKENS.JUMP.name : _encoding(inst.goto(0)),
+    TOKENS.FUNC.name : _encoding(inst.func_call(0))
+}
+
+# token -> (op-code, comment)
+D_ENCODING = {
+    TOKENS.IDLE.name   : _encoding(inst.goto_idle()),
+    TOKENS.RETURN.name : _encoding(inst.func_return())
+}
+
+def parse_S(line:str) -> Instruction:
     '''
         Function to parse preprocessed S-Type instructions, e.g. <TOKEN> {A, B} <ADDRESS>.
 
@@ -12,11 +86,12 @@ def parse_S(line:str) -> str:
             line: String corresponding to an S-Type instruction.
             
         Returns:
-            String corresponding to the HEX representation of the instruction.
+            Instruction corresponding to the encoding of the line.
             
         Raises:
             InvalidArgumentException if incorrect number of arguments found.
             InvalidRegisterException if the target register is not supported.
+            InvalidAddressException if the address is not a valid 8-bit HEX value.
     '''
     args = line.split()
     if len(args) != S_ARG_COUNT + 1:
@@ -24,29 +99,20 @@ def parse_S(line:str) -> str:
                                            arguments but got {len(args) - 1} in line "{line}".')
     
     # Parse line
-    token = args[0]
-    reg = args[1]
-    addr = args[2]
+    token, reg, addr = args
     
-    if reg not in REGISTERS._member_map_:
+    encoding = S_ENCODING.get((token, reg))
+    if encoding is None:
         raise exc.InvalidRegisterException(f'Register {reg} provided for {token} \
                                            is not supported. Use one of {REGISTERS._member_names_} instead.')
     
-    opps_A = {
-        TOKENS.LB.name : lambda: inst.read_mem_to_A(addr, check=False),
-        TOKENS.SB.name : lambda: inst.write_A_to_mem(addr, check=False)
-    }
-    opps_B = {
-        TOKENS.LB.name : lambda: inst.read_mem_to_B(addr, check=False),
-        TOKENS.SB.name : lambda: inst.write_B_to_mem(addr, check=False)
-    }
-    
-    if reg == REGISTERS.A.name:
-        return opps_A[token]()
+    addr = convert_hex(addr)
+    if not 0 <= addr <= 0xFF:
+        raise exc.InvalidAddressException(f'Address {args[2]} in line "{line}" doesn\'t fit in the 8-bit operand.')
     
-    return opps_B[token]()
+    return Instruction(encoding[0], addr, comment=encoding[1])
     
-def parse_R(line:str) -> str:
+def parse_R(line:str) -> Instruction:
     '''
         Function to parse R-Type instructions, e.g. <TOKEN> {A, B}.
 
@@ -54,7 +120,7 @@ def parse_R(line:str) -> str:
             line: String corresponding to an R-Type instruction.
             
         Returns:
-            String corresponding to the HEX representation of the instruction.
+            Instruction corresponding to the encoding of the line.
             
         Raises:
             InvalidArgumentException if incorrect number of arguments found.
@@ -66,52 +132,16 @@ def parse_R(line:str) -> str:
                                            arguments but got {len(args) - 1} in line "{line}".')
     
     # Parse line
-    token = args[0]
-    reg = args[1]
+    token, reg = args
     
-    if reg not in REGISTERS._member_map_:
+    encoding = R_ENCODING.get((token, reg))
+    if encoding is None:
         raise exc.InvalidRegisterException(f'Register {reg} provided for {token} \
                                            is not supported. Use one of {REGISTERS._member_names_} instead.')
         
-    opps_A = {
-        TOKENS.ADD.name   : lambda: inst.alu_to_A(ALU_OPS.ADD),
-        TOKENS.SUB.name   : lambda: inst.alu_to_A(ALU_OPS.SUB),
-        TOKENS.MUL.name   : lambda: inst.alu_to_A(ALU_OPS.MUL),
-        TOKENS.SLA.name   : lambda: inst.alu_to_A(ALU_OPS.SL_A),
-        TOKENS.SRA.name   : lambda: inst.alu_to_A(ALU_OPS.SR_A),
-        TOKENS.SEQ.name   : lambda: inst.alu_to_A(ALU_OPS.EQ),
-        TOKENS.SGT.name   : lambda: inst.alu_to_A(ALU_OPS.GT),
-        TOKENS.SLT.name   : lambda: inst.alu_to_A(ALU_OPS.LT),
-        TOKENS.AND.name   : lambda: inst.alu_to_A(ALU_OPS.AND),
-        TOKENS.OR.name    : lambda: inst.alu_to_A(ALU_OPS.OR),
-        TOKENS.XOR.name   : lambda: inst.alu_to_A(ALU_OPS.XOR),
-        TOKENS.NOT.name   : lambda: inst.alu_to_A(ALU_OPS.NOT_A),
-        TOKENS.COPY.name  : lambda: inst.alu_to_A(ALU_OPS.OUT_A),
-        TOKENS.DEREF.name : lambda: inst.deref_A()
-    }
-    opps_B = {
-        TOKENS.ADD.name   : lambda: inst.alu_to_B(ALU_OPS.ADD),
-        TOKENS.SUB.name   : lambda: inst.alu_to_B(ALU_OPS.SUB),
-        TOKENS.MUL.name   : lambda: inst.alu_to_B(ALU_OPS.MUL),
-        TOKENS.SLA.name   : lambda: inst.alu_to_B(ALU_OPS.SL_A),
-        TOKENS.SRA.name   : lambda: inst.alu_to_B(ALU_OPS.SR_A),
-        TOKENS.SEQ.name   : lambda: inst.alu_to_B(ALU_OPS.EQ),
-        TOKENS.SGT.name   : lambda: inst.alu_to_B(ALU_OPS.GT),
-        TOKENS.SLT.name   : lambda: inst.alu_to_B(ALU_OPS.LT),
-        TOKENS.AND.name   : lambda: inst.alu_to_B(ALU_OPS.AND),
-        TOKENS.OR.name    : lambda: inst.alu_to_B(ALU_OPS.OR),
-        TOKENS.XOR.name   : lambda: inst.alu_to_B(ALU_OPS.XOR),
-        TOKENS.NOT.name   : lambda: inst.alu_to_B(ALU_OPS.NOT_A),
-        TOKENS.COPY.name  : lambda: inst.alu_to_B(ALU_OPS.OUT_A),
-        TOKENS.DEREF.name : lambda: inst.deref_B()
-    }
-    
-    if reg == REGISTERS.A.name:
-        return opps_A[token]()
-    
-    return opps_B[token]()
+    return Instruction(encoding[0], comment=encoding[1])
     
-def parse_RR(line:str) -> str:
+def parse_RR(line:str) -> Instruction:
     '''
         Function to parse RR-Type instructions, e.g. e.g. <TOKEN> {A, B} {A, B}.
         
@@ -119,7 +149,7 @@ def parse_RR(line:str) -> str:
             line: String corresponding to an RR-Type instruction.
             
         Returns:
-            String corresponding to the HEX representation of the instruction.
+            Instruction corresponding to the encoding of the line.
             
         Raises:
             InvalidArgumentException if incorrect number of arguments found.
@@ -131,55 +161,36 @@ def parse_RR(line:str) -> str:
                                            arguments but got {len(args) - 1} in line "{line}".')
     
     # Parse line
-    token = args[0]
-    target_reg = args[1]
-    source_reg = args[2]
+    token, target_reg, source_reg = args
     
-    if target_reg not in REGISTERS._member_map_:
-        raise exc.InvalidRegisterException(f'Target register {target_reg} provided for {token} \
-                                           is not supported. Use one of {REGISTERS._member_names_} instead.')
-    if source_reg not in REGISTERS._member_map_:
+    encoding = RR_ENCODING.get((token, target_reg, source_reg))
+    if encoding is None:
+        if target_reg not in REGISTERS._member_map_:
+            raise exc.InvalidRegisterException(f'Target register {target_reg} provided for {token} \
+                                               is not supported. Use one of {REGISTERS._member_names_} instead.')
         raise exc.InvalidRegisterException(f'Source register {source_reg} provided for {token} \
                                            is not supported. Use one of {REGISTERS._member_names_} instead.')
       
-    opps_A = {
-        REGISTERS.A.name : {
-            TOKENS.INC.name : lambda: inst.alu_to_A(ALU_OPS.INC_A),
-            TOKENS.DEC.name : lambda: inst.alu_to_A(ALU_OPS.DEC_A)
-        },
-        REGISTERS.B.name : {
-            TOKENS.INC.name : lambda: inst.alu_to_A(ALU_OPS.INC_B),
-            TOKENS.DEC.name : lambda: inst.alu_to_A(ALU_OPS.DEC_B)
-        }
-    }
-    opps_B = {
-        REGISTERS.A.name: {
-            TOKENS.INC.name : lambda: inst.alu_to_B(ALU_OPS.INC_A),
-            TOKENS.DEC.name : lambda: inst.alu_to_B(ALU_OPS.DEC_A)
-        },
-        REGISTERS.B.name: {
-            TOKENS.INC.name : lambda: inst.alu_to_B(ALU_OPS.INC_B),
-            TOKENS.DEC.name : lambda: inst.alu_to_B(ALU_OPS.DEC_B)
-        }
-    }
-    
-    if target_reg == REGISTERS.A.name:
-        return opps_A[source_reg][token]()
-    
-    return opps_B[source_reg][token]()
+    return Instruction(encoding[0], comment=encoding[1])
 
-def parse_B(line:str):
+def parse_B(line:str, label_to_addr_dict:Dict[str, int], operand_size:int=1,
+            imports:Optional[Set[str]]=None) -> Instruction:
     '''
         Function to parse B-Type instructions, e.g. <TOKEN> <LABEL>.
 
         Parameters:
             line: String corresponding to an B-Type instruction.
+            label_to_addr_dict: Label to ROM address mapping of the program.
+            operand_size (optional): Number of bytes of the ROM address operand, see targets.Target.
+            imports (optional): Set the undefined labels are added to, e.g. when assembling an object
+                                file. The operand of the instruction is then left unresolved.
             
         Returns:
-            String corresponding to the HEX representation of the instruction.
+            Instruction corresponding to the encoding of the line.
             
         Raises:
             InvalidArgumentException if incorrect number of arguments found.
+            InvalidLabelException if the label is not defined in the program.
     '''
     args = line.split()
     if len(args) != B_ARG_COUNT + 1:
@@ -187,20 +198,18 @@ def parse_B(line:str):
                                            arguments but got {len(args) - 1} in line "{line}".')
     
     # Parse line
-    token = args[0]
-    label = args[1]
+    token, label = args
     
-    opps = {
-        TOKENS.BEQ.name  : lambda: inst.breq(label=label),
-        TOKENS.BGT.name  : lambda: inst.bgtq(label=label),
-        TOKENS.BLT.name  : lambda: inst.bltq(label=label),
-        TOKENS.JUMP.name : lambda: inst.goto(label=label),
-        TOKENS.FUNC.name : lambda: inst.func_call(label=label)
-    }
+    addr = label_to_addr_dict.get(label)
+    if addr is None and imports is not None:
+        imports.add(label)
+    elif addr is None:
+        raise exc.InvalidLabelException(f'Label {label} used in line "{line}" is not defined.')
     
-    return opps[token]()
+    encoding = B_ENCODING[token]
+    return Instruction(encoding[0], addr, label=label, comment=encoding[1], operand_size=operand_size)
     
-def parse_D(line:str):
+def parse_D(line:str) -> Instruction:
     '''
         Function to parse D-Type instructions, <TOKEN> (no additional operand).
 
@@ -208,7 +217,7 @@ def parse_D(line:str):
             line: String corresponding to an D-Type instruction.
             
         Returns:
-            String corresponding to the HEX representation of the instruction.
+            Instruction corresponding to the encoding of the line.
             
         Raises:
             InvalidArgumentException if incorrect number of arguments found.
@@ -218,75 +227,325 @@ def parse_D(line:str):
         raise exc.InvalidArgumentException(f'D-Type instruction expects {D_ARG_COUNT} \
                                            arguments but got {len(args) - 1} in line "{line}".')
     
+    encoding = D_ENCODING[args[0]]
+    return Instruction(encoding[0], comment=encoding[1])
+
+def parse_I(line:str, constant_pool:Dict[int, int]) -> Instruction:
+    '''
+        Function to parse immediate load pseudo-instructions, e.g. LI {A, B} <VALUE>, into the
+        load of the value from the constant pool.
+
+        Parameters:
+            line: String corresponding to an immediate load instruction.
+            constant_pool: Value to RAM address mapping of the constant pool, see get_constant_pool.
+
+        Returns:
+            Instruction corresponding to the encoding of the line.
+
+        Raises:
+            InvalidArgumentException if incorrect number of arguments found or if the value is not a valid 8-bit HEX value.
+            InvalidRegisterException if the target register is not supported.
+    '''
+    args = line.split()
+    if len(args) != I_ARG_COUNT + 1:
+        raise exc.InvalidArgumentException(f'Immediate load instruction expects {I_ARG_COUNT} \
+                                           arguments but got {len(args) - 1} in line "{line}".')
+
     # Parse line
-    token = args[0]
+    _, reg, value = args
+
+    encoding = S_ENCODING.get((TOKENS.LB.name, reg))
+    if encoding is None:
+        raise exc.InvalidRegisterException(f'Register {reg} provided for {TOKENS.LI.name} \
+                                           is not supported. Use one of {REGISTERS._member_names_} instead.')
+
+    value = get_immediate(value, line)
+    return Instruction(encoding[0], constant_pool[value], comment=f'{reg} <- 0x{value:02X} (Mem[0x{{}}])')
+
+def get_immediate(value:str, line:str) -> int:
+    '''
+        Function to convert the value of an immediate load instruction to integer.
+
+        Parameters:
+            value: String corresponding to the HEX value.
+            line: String corresponding to the instruction, used in the error message.
+
+        Returns:
+            Integer value.
+
+        Raises:
+            InvalidArgumentException if the value is not a valid 8-bit HEX value.
+    '''
+    try:
+        value = int(value, base=16)
+    except ValueError:
+        raise exc.InvalidArgumentException(f'Value {value} in line "{line}" is not a valid hexadecimal value.')
+
+    if not 0 <= value <= 0xFF:
+        raise exc.InvalidArgumentException(f'Value {value:X} in line "{line}" doesn\'t fit in 8 bits.')
+
+    return value
+
+class ConstantPool:
+    '''
+        Builder of the constant pool of the immediate load instructions of a program, fed one
+        line at a time. Each distinct value is stored once, in the highest RAM addresses not used
+        by a LB or SB instruction of the program. Addresses only accessed with DEREF are not
+        known and must not overlap the pool.
+
+        Attributes:
+            values: Distinct values of the immediate load instructions, in order of first use.
+            used: RAM addresses of the S-Type instructions.
+    '''
+
+    def __init__(self):
+        self.values = dict()
+        self.used = set()
+
+    def add(self, line:str, args:Optional[List[str]]=None) -> None:
+        '''
+            Function to record the value or the address of a cleaned line without label.
+
+            Parameters:
+                line: String corresponding to a cleaned line of the assembly file.
+                args (optional): Tokens of the line if already split, line.split() by default.
+
+            Raises:
+                InvalidArgumentException if the value is not a valid 8-bit HEX value.
+        '''
+        if args is None:
+            args = line.split()
+        if args[0] in I_TYPE and len(args) == I_ARG_COUNT + 1:
+            self.values.setdefault(get_immediate(args[2], line), None)
+        elif args[0] in S_TYPE and len(args) == S_ARG_COUNT + 1:
+            self.used.add(convert_hex(args[2]))
+
+    def allocate(self, ram_size:int=RAM_SIZE) -> Dict[int, int]:
+        '''
+            Function to allocate the RAM address of the recorded values.
+
+            Returns:
+                Dictionary mapping each value to its RAM address, in order of first use.
+
+            Raises:
+                InvalidProgramSizeException if the constants don't fit in the unused RAM.
+        '''
+        free = (addr for addr in reversed(range(ram_size)) if addr not in self.used)
+
+        constant_pool = dict()
+        for value in self.values:
+            addr = next(free, None)
+            if addr is None:
+                raise exc.InvalidProgramSizeException(f'Constant pool of {len(self.values)} values doesn\'t fit in the RAM not used by the program.')
+            constant_pool[value] = addr
+
+        return constant_pool
+
+def get_constant_pool(program:Iterable[str], ram_size:int=RAM_SIZE) -> Dict[int, int]:
+    '''
+        Function to allocate the constant pool of the immediate load instructions of a program, see ConstantPool.
+
+        Parameters:
+            program: Iterable of string corresponding to the cleaned lines of the assembly file, without labels.
+            ram_size (optional): Number of RAM addresses.
+
+        Returns:
+            Dictionary mapping each value to its RAM address, in order of first use.
+
+        Raises:
+            InvalidArgumentException if a value is not a valid 8-bit HEX value.
+            InvalidProgramSizeException if the constants don't fit in the unused RAM.
+    '''
+    pool = ConstantPool()
+    for line in program:
+        pool.add(line)
+
+    return pool.allocate(ram_size)
+
+def get_instruction_sizes(target:Target=DEFAULT_TARGET) -> Dict[str, int]:
+    '''
+        Function to get the number of ROM bytes of each token on a target. Instructions with a
+        data operand take 2 bytes, B-Type instructions take 1 byte plus the ROM address operand.
+    '''
+    return {**{token : 2 for token in S_TYPE | I_TYPE},
+            **{token : 1 + target.operand_bytes for token in B_TYPE},
+            **{token : 1 for token in R_TYPE | RR_TYPE | D_TYPE}}
+
+# Number of ROM bytes of each token on the default target.
+INSTRUCTION_SIZES = get_instruction_sizes()
+
+# Parser of each token without label operand
+TOKEN_PARSERS = {**{token : parse_S for token in S_TYPE},
+                 **{token : parse_R for token in R_TYPE},
+                 **{token : parse_RR for token in RR_TYPE},
+                 **{token : parse_D for token in D_TYPE}}
+
+def get_instruction_size(line:str, instruction_sizes:Dict[str, int]=INSTRUCTION_SIZES) -> int:
+    '''
+        Function to get the number of ROM bytes an instruction occupies without encoding it.
+
+        Parameters:
+            line: String corresponding to a cleaned line of the assembly file.
+            instruction_sizes (optional): Token to size mapping of the target, see get_instruction_sizes.
+
+        Returns:
+            Integer number of bytes of the instruction.
+
+        Raises:
+            InvalidTokenException if token found in the instruction is not supported.
+            ImplementationErrorException if a supported token is not mapped to an instruction type.
+    '''
+    token = line.split(None, 1)[0]
+    
+    size = instruction_sizes.get(token)
+    if size is not None:
+        return size
     
-    opps = {
-        TOKENS.IDLE.name   : lambda: inst.goto_idle(),
-        TOKENS.RETURN.name : lambda: inst.func_return()
-    }
+    if token not in TOKENS._member_map_:
+        raise exc.InvalidTokenException(f'Unsupported token {token} found in line "{line}"')
     
-    return opps[token]()
+    # Supported token without instruction type -> should not happend.
+    raise exc.ImplementationErrorException(f'Token {token} is not mapped to any instruction type!')
 
-def parse_tokens(program:List[str], label_to_idx_dict:Dict[str, int]) -> List[str]:
+def get_label_addresses(program:Iterable[str], label_to_idx_dict:Dict[str, int],
+                        target:Target=DEFAULT_TARGET) -> Dict[str, int]:
     '''
-        Function to parse tokens in a program and update label mapping accordingly.
+        Function to compute the final ROM address of every label (first pass of the assembler).
+        The address of each line is the sum of the sizes of the lines before it.
 
         Parameters:
-            program: List of string corresponding to the cleaned lines of the assembly file.
+            program: Iterable of string corresponding to the cleaned lines of the assembly file.
             label_to_idx_dict: Label to original index in the cleaned assembly file mapping.
+            target (optional): Target of the program, see targets.Target.
+
+        Returns:
+            Dictionary mapping the labels to their ROM address.
+    '''
+    idx_to_label_dict = {line_idx : label for label, line_idx in label_to_idx_dict.items()}
+    instruction_sizes = get_instruction_sizes(target)
+    label_to_addr_dict = dict()
     
+    # Index to keep track of location in ROM.
+    idx = 0
+    
+    for line_idx, line in enumerate(program):
+        label = idx_to_label_dict.get(line_idx)
+        if label is not None:
+            label_to_addr_dict[label] = idx
+        idx += get_instruction_size(line, instruction_sizes)
+        
+    return label_to_addr_dict
+
+def scan_program(program:Iterable[Tuple[Optional[str], str]], target:Target=DEFAULT_TARGET) -> Tuple[Dict[str, int], Dict[int, int]]:
+    '''
+        Function to run the first pass of the assembler over a stream of lines, e.g. the output
+        of utils.iter_labels, computing the final ROM address of every label and allocating the
+        constant pool. Only the tables are kept, the lines are dropped as soon as they are read.
+
+        Parameters:
+            program: Iterable of (label, instruction) pairs, with label None for lines without label.
+            target (optional): Target of the program, see targets.Target.
+
         Returns:
-            List of string corresponding to the HEX encoding of the program.
+            label_to_addr_dict: Dictionary mapping the labels to their ROM address.
+            constant_pool: Value to RAM address mapping, see ConstantPool.
 
         Raises:
             InvalidTokenException if token found in an instruction is not supported.
-            ImplementationErrorException if a supported token is not mapped to an instruction type.
+            InvalidArgumentException if an immediate load value is not a valid 8-bit HEX value.
+            InvalidProgramSizeException if the constant pool doesn't fit in the RAM.
     '''
-    parsed_program = []
-    
+    instruction_sizes = get_instruction_sizes(target)
+    label_to_addr_dict = dict()
+    pool = ConstantPool()
+
     # Index to keep track of location in ROM.
     idx = 0
-    
+
+    for label, line in program:
+        if label is not None:
+            label_to_addr_dict[label] = idx
+
+        # Split each line once for both its size and the constant pool.
+        args = line.split()
+        size = instruction_sizes.get(args[0])
+        idx += size if size is not None else get_instruction_size(line, instruction_sizes)
+        pool.add(line, args)
+
+    return label_to_addr_dict, pool.allocate(target.ram_size)
+
+def iter_tokens(program:Iterable[str], label_to_addr_dict:Dict[str, int], constant_pool:Dict[int, int],
+                target:Target=DEFAULT_TARGET, imports:Optional[Set[str]]=None) -> Iterator[Instruction]:
+    '''
+        Generator stage encoding the cleaned lines of a program one at a time (second pass of the
+        assembler), looking up the address of B-Type operands in the resolved label table and the
+        address of immediate load values in the constant pool.
+
+        Parameters:
+            program: Iterable of string corresponding to the cleaned lines of the assembly file, without labels.
+            label_to_addr_dict: Label to ROM address mapping of the program.
+            constant_pool: Value to RAM address mapping of the program.
+            target (optional): Target of the program, see targets.Target.
+            imports (optional): Set the undefined labels are added to instead of raising, see parse_B.
+
+        Returns:
+            Iterator of the instructions of the program.
+
+        Raises:
+            InvalidLabelException if a B-Type instruction uses an undefined label and imports is not given.
+    '''
     for line in program:
-        token = line.split()[0]
-        
-        if token not in TOKENS._member_map_:
-            raise exc.InvalidTokenException(f'Unsupported token {token} found in line "{line}"')
+        token = line.split(None, 1)[0]
         
-        # S-Type instruction
-        if token in S_TYPE:
-            parsed_program.append(parse_S(line))
-            label_to_idx_dict = update_labels(label_to_idx_dict, idx)
-            idx += 2
-            continue
-                
-        # R-Type instruction
-        if token in R_TYPE:
-            parsed_program.append(parse_R(line))
-            idx += 1
-            continue
-            
-        # RR-Type instruction
-        if token in RR_TYPE:
-            parsed_program.append(parse_RR(line))
-            idx += 1
-            continue
-            
         # B-Type instruction
         if token in B_TYPE:
-            parsed_program.append(parse_B(line))
-            label_to_idx_dict = update_labels(label_to_idx_dict, idx)
-            idx += 2
-            continue
+            instruction = parse_B(line, label_to_addr_dict, target.operand_bytes, imports)
+
+        # Immediate load instruction
+        elif token in I_TYPE:
+            instruction = parse_I(line, constant_pool)
             
-        # D-Type instruction
-        if token in D_TYPE:
-            parsed_program.append(parse_D(line))
-            idx += 1
-            continue
-
-        # If it falls through all checks, unmapped token -> should not happend.
-        raise exc.ImplementationErrorException(f'Token {token} is not mapped to any instruction type!')
+        # S-Type, R-Type, RR-Type and D-Type instructions
+        else:
+            instruction = TOKEN_PARSERS[token](line)
+        
+        instruction.source = line
+        yield instruction
+
+def parse_tokens(program:List[str], label_to_idx_dict:Dict[str, int], constant_pool:Optional[Dict[int, int]]=None,
+                 target:Target=DEFAULT_TARGET) -> Tuple[List[Instruction], Dict[str, int]]:
+    '''
+        Function to parse tokens in a program. Label addresses are resolved in a first pass
+        over the program, then each instruction is encoded in a second pass, looking up the
+        address of B-Type operands in the resolved label table and the address of immediate
+        load values in the constant pool.
+
+        Parameters:
+            program: List of string corresponding to the cleaned lines of the assembly file.
+            label_to_idx_dict: Label to original index in the cleaned assembly file mapping.
+            constant_pool (optional): Value to RAM address mapping, allocated with get_constant_pool if not provided.
+            target (optional): Target of the program, see targets.Target.
+    
+        Returns:
+            parsed_program: List of instructions corresponding to the encoding of the program.
+            label_to_addr_dict: Dictionary mapping the labels to their ROM address.
+
+        Raises:
+            InvalidTokenException if token found in an instruction is not supported.
+            InvalidLabelException if a B-Type instruction uses an undefined label.
+            InvalidProgramSizeException if the constant pool doesn't fit in the RAM.
+            ImplementationErrorException if a supported token is not mapped to an instruction type.
+    '''
+    # First pass: final address of each label and constant pool. Also validates every token.
+    if constant_pool is None:
+        line_labels = [None] * len(program)
+        for label, line_idx in label_to_idx_dict.items():
+            line_labels[line_idx] = label
+        label_to_addr_dict, constant_pool = scan_program(zip(line_labels, program), target)
+    else:
+        label_to_addr_dict = get_label_addresses(program, label_to_idx_dict, target)
+    
+    # Second pass: encode instructions.
+    parsed_program = list(iter_tokens(program, label_to_addr_dict, constant_pool, target))
         
-    return parsed_program, label_to_idx_dict
\ No newline at end of file
+    return parsed_program, label_to_addr_dict
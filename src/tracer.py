@@ -0,0 +1,319 @@
+import struct
+from profiler import Profiler
+from simulator import *
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from constants import *
+import exceptions as exc
+
+# Fixed-width binary trace record, little-endian: cycle (uint64), pc (uint16), op-code (uint8),
+# bus address (uint8) and value (uint8).
+RECORD = struct.Struct('<QHBBB')
+
+# Header of the binary trace files, followed by the records.
+TRACE_MAGIC = b'RVTRACE1'
+
+# Number of records held by a trace buffer by default, i.e. 13 MB of records.
+DEFAULT_TRACE_CAPACITY = 2 ** 20
+
+class TraceRecord(NamedTuple):
+    '''
+        Record of an executed instruction.
+
+        Attributes:
+            cycle: Simulated time at the start of the instruction, in clock cycles.
+            pc: ROM address of the instruction.
+            op: Op-code byte of the instruction.
+            addr: Bus address read or written, the operand of other two byte instructions, 0 otherwise.
+            value: Byte read or written, result of the ALU operations, 1 if a branch is taken, 0 otherwise.
+    '''
+    cycle: int
+    pc: int
+    op: int
+    addr: int
+    value: int
+
+class TraceBuffer:
+    '''
+        Ring buffer of binary trace records. Records are packed into a preallocated buffer. When
+        the buffer is full, it is flushed to the trace file if there is one, so the file holds the
+        full trace, otherwise the oldest records are overwritten and the buffer holds the last
+        capacity records.
+
+        Attributes:
+            capacity: Maximum number of records held in memory.
+            count: Number of records in the buffer.
+            dropped: Number of records overwritten without being flushed.
+            written: Number of records flushed to the trace file.
+    '''
+
+    def __init__(self, capacity:int=DEFAULT_TRACE_CAPACITY, filename:Optional[str]=None):
+        '''
+            Parameters:
+                capacity (optional): Maximum number of records held in memory.
+                filename (optional): Path to the trace file the records are flushed to.
+        '''
+        self.capacity = capacity
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._start = 0
+        self.count = 0
+        self.dropped = 0
+        self.written = 0
+
+        self._file = None
+        if filename is not None:
+            self._file = open(filename, 'wb')
+            self._file.write(TRACE_MAGIC)
+
+    def append(self, cycle:int, pc:int, op:int, addr:int, value:int) -> None:
+        '''
+            Function to append a record, see TraceRecord.
+        '''
+        if self.count == self.capacity:
+            if self._file is not None:
+                self.flush()
+            else:
+                # Overwrite the oldest record.
+                RECORD.pack_into(self._buffer, self._start * RECORD.size, cycle, pc, op, addr, value)
+                self._start = (self._start + 1) % self.capacity
+                self.dropped += 1
+                return
+
+        RECORD.pack_into(self._buffer, (self._start + self.count) % self.capacity * RECORD.size, cycle, pc, op, addr, value)
+        self.count += 1
+
+    def to_bytes(self) -> bytes:
+        '''
+            Function to get the records of the buffer, oldest first, as bytes.
+        '''
+        start = self._start * RECORD.size
+        end = start + self.count * RECORD.size
+
+        if end <= len(self._buffer):
+            return bytes(self._buffer[start:end])
+
+        return bytes(self._buffer[start:]) + bytes(self._buffer[:end - len(self._buffer)])
+
+    def records(self) -> Iterator[TraceRecord]:
+        '''
+            Function to iterate over the records of the buffer, oldest first.
+        '''
+        return map(TraceRecord._make, RECORD.iter_unpack(self.to_bytes()))
+
+    def flush(self) -> None:
+        '''
+            Function to write the records of the buffer to the trace file and to empty the buffer.
+        '''
+        if self._file is None:
+            return
+
+        self._file.write(self.to_bytes())
+        self.written += self.count
+        self._start = 0
+        self.count = 0
+
+    def close(self) -> None:
+        '''
+            Function to flush the records and close the trace file.
+        '''
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def save(self, filename:str) -> None:
+        '''
+            Function to save the records of the buffer to a trace file, e.g. the last records of a
+            buffer without trace file.
+        '''
+        with open(filename, 'wb') as f:
+            f.write(TRACE_MAGIC)
+            f.write(self.to_bytes())
+
+def load_trace(filename:str) -> Iterator[TraceRecord]:
+    '''
+        Function to load a binary trace file written by TraceBuffer.
+
+        Returns:
+            Iterator of the TraceRecord of the file, in order of execution.
+
+        Raises:
+            InvalidFileException if the file is not a trace file or is truncated.
+    '''
+    with open(filename, 'rb') as f:
+        content = f.read()
+
+    if not content.startswith(TRACE_MAGIC):
+        raise exc.InvalidFileException(f'File {filename} is not a trace file.')
+
+    records = memoryview(content)[len(TRACE_MAGIC):]
+    if len(records) % RECORD.size:
+        raise exc.InvalidFileException(f'Trace file {filename} is truncated.')
+
+    return map(TraceRecord._make, RECORD.iter_unpack(records))
+
+class BranchCoverage(NamedTuple):
+    '''
+        Outcomes of a conditional branch.
+
+        Attributes:
+            address: ROM address of the branch.
+            taken: Number of times the branch was taken.
+            not_taken: Number of times the branch was not taken.
+    '''
+    address: int
+    taken: int
+    not_taken: int
+
+    @property
+    def covered(self) -> bool:
+        return self.taken > 0 and self.not_taken > 0
+
+class Tracer(Profiler):
+    '''
+        Profiler also collecting the execution coverage of each ROM address, the outcomes of the
+        conditional branches, the reads and writes of each bus address and, optionally, a full
+        trace of the executed instructions into a TraceBuffer. Enabled like a profiler:
+
+            tracer = Tracer(result.labels, TraceBuffer(filename='run.trace'), result.target)
+            simulator.profiler = tracer
+            simulator.run(1_000_000)
+            tracer.trace.close()
+            print(tracer.coverage_report(result))
+
+        Attributes:
+            trace: TraceBuffer the executed instructions are recorded into, None to only collect the counts.
+            taken: Number of times each branch was taken, indexed by ROM address.
+            not_taken: Number of times each branch was not taken, indexed by ROM address.
+            reads: Number of reads of each bus address, including DEREF reads.
+            writes: Number of writes of each bus address.
+    '''
+
+    def __init__(self, labels:Optional[Dict[str, int]]=None, trace:Optional[TraceBuffer]=None,
+                 target:Target=DEFAULT_TARGET):
+        self.trace = trace
+        super().__init__(labels, target)
+
+    def reset(self) -> None:
+        '''
+            Function to clear the counts. The trace buffer is left untouched.
+        '''
+        super().reset()
+        self.taken = [0] * self.target.rom_size
+        self.not_taken = [0] * self.target.rom_size
+        self.reads = [0] * BUS_SIZE
+        self.writes = [0] * BUS_SIZE
+
+    def _record(self, simulator:Simulator, pc:int, kind:int, operand:Optional[int], a:int, b:int, time:int) -> None:
+        addr, value = operand or 0, 0
+
+        if kind == LOAD_A or kind == LOAD_A_IO:
+            value = simulator.a
+            self.reads[addr] += 1
+        elif kind == LOAD_B or kind == LOAD_B_IO:
+            value = simulator.b
+            self.reads[addr] += 1
+        elif kind == STORE_A or kind == STORE_A_IO:
+            value = a
+            self.writes[addr] += 1
+        elif kind == STORE_B or kind == STORE_B_IO:
+            value = b
+            self.writes[addr] += 1
+        elif kind == DEREF_A:
+            addr, value = a, simulator.a
+            self.reads[addr] += 1
+        elif kind == DEREF_B:
+            addr, value = b, simulator.b
+            self.reads[addr] += 1
+        elif kind == ALU_A:
+            value = simulator.a
+        elif kind == ALU_B:
+            value = simulator.b
+        elif kind == BRANCH:
+            value = simulator.program[pc][1][a << 8 | b]
+            if value:
+                self.taken[pc] += 1
+            else:
+                self.not_taken[pc] += 1
+
+        if self.trace is not None:
+            self.trace.append(time, pc, simulator.rom[pc], addr & 0xFF, value)
+
+    def branches(self) -> List[BranchCoverage]:
+        '''
+            Function to get the outcomes of the executed conditional branches.
+
+            Returns:
+                List of BranchCoverage sorted by ROM address.
+        '''
+        return [BranchCoverage(addr, self.taken[addr], self.not_taken[addr])
+                for addr in range(self.target.rom_size) if self.taken[addr] or self.not_taken[addr]]
+
+    def ram_accesses(self) -> List[Tuple[int, int, int]]:
+        '''
+            Function to get the accessed bus addresses.
+
+            Returns:
+                List of (bus address, reads, writes) sorted by address.
+        '''
+        return [(addr, self.reads[addr], self.writes[addr])
+                for addr in range(BUS_SIZE) if self.reads[addr] or self.writes[addr]]
+
+    def coverage_report(self, result) -> str:
+        '''
+            Function to render the coverage of an assembled program as text: the executed
+            instructions and the branches taken both ways per label, then the source lines never
+            executed and the branches only ever going one way, then the accessed RAM addresses.
+
+            Parameters:
+                result: AssemblyResult of the simulated program, see assembler.assemble. The source
+                        lines are only reported if the program was assembled with positions.
+
+            Returns:
+                String corresponding to the report.
+        '''
+        # Code of the program, without the interrupt vectors and the data bytes.
+        code = [(addr, instruction) for addr, instruction in result.layout if instruction.comment is not None]
+
+        summary = dict()
+        missed = []
+        one_way = []
+        for addr, instruction in code:
+            symbol = self.symbol(addr)
+            entry = summary.setdefault(symbol, [self.labels.get(symbol, addr), 0, 0, 0, 0])
+            entry[1] += 1
+            entry[2] += self.instructions[addr] > 0
+
+            line = f'line {instruction.position[0]:<5}' if instruction.position else ''
+            where = f'{symbol}+{addr - entry[0]:X}'
+
+            if not self.instructions[addr]:
+                missed.append(f'  {where:<20} {line} {instruction.source}')
+            elif self.taken[addr] or self.not_taken[addr]:
+                branch = BranchCoverage(addr, self.taken[addr], self.not_taken[addr])
+                entry[3] += 1
+                entry[4] += branch.covered
+                if not branch.taken:
+                    one_way.append(f'  {where:<20} {line} {instruction.source:<16} never taken, not taken {branch.not_taken} times')
+                elif not branch.not_taken:
+                    one_way.append(f'  {where:<20} {line} {instruction.source:<16} always taken, taken {branch.taken} times')
+
+        executed = sum(entry[2] for entry in summary.values())
+        branches = sum(entry[3] for entry in summary.values())
+        covered = sum(entry[4] for entry in summary.values())
+
+        lines = [f'Coverage: {executed}/{len(code)} instructions executed ({100 * executed / max(len(code), 1):.1f}%), '
+                 f'{covered}/{branches} executed branches taken both ways.',
+                 '',
+                 f'{"Symbol":<16} {"Address":>7} {"Instructions":>12} {"Executed":>8} {"%":>6} {"Branches":>8}']
+        for symbol, (address, count, hit, branch_count, branch_covered) in sorted(summary.items(), key=lambda item: item[1][0]):
+            lines.append(f'{symbol:<16} {address:>7X} {count:>12} {hit:>8} {100 * hit / count:>6.1f} {f"{branch_covered}/{branch_count}":>8}')
+
+        lines += ['', 'Never executed:'] + (missed or ['  None'])
+        lines += ['', 'Branches going one way only:'] + (one_way or ['  None'])
+
+        lines += ['', 'RAM accesses:', f'{"Address":>7} {"Reads":>10} {"Writes":>10}']
+        for addr, reads, writes in self.ram_accesses():
+            if addr < self.target.ram_size:
+                lines.append(f'{addr:>7X} {reads:>10} {writes:>10}')
+
+        return '\n'.join(lines)
@@ -1,7 +1,9 @@
 import os
+import glob
+import secrets
 from constants import ROM_SIZE, RAM_SIZE
 import exceptions as exc
-from typing import Tuple, List, Union, Dict
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
 
 def mkdir(path:str) -> None:
     '''
@@ -13,6 +15,72 @@ def mkdir(path:str) -> None:
     if not os.path.exists(path):
         os.makedirs(path)
 
+def expand_inputs(paths:List[str], extension:str='.asm') -> List[str]:
+    '''
+        Function to expand input paths into a list of files. Directories are replaced by the files
+        with the given extension they contain and glob patterns are replaced by the matching paths.
+
+        Parameters:
+            paths: List of string corresponding to file paths, directories or glob patterns.
+            extension (optional): String corresponding to the extension of the files to take from directories.
+
+        Returns:
+            List of string corresponding to the unique file paths, in order of appearance.
+    '''
+    files = dict()
+    
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(glob.escape(path), '*' + extension)))
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path, recursive=True))
+        else:
+            matches = [path]
+            
+        for match in matches:
+            files[match] = None
+            
+    return list(files)
+
+class AsmFile:
+    '''
+        Lines of an .asm file, read lazily from the file every time they are iterated, so that
+        the assembler passes can stream the file instead of holding it in memory.
+
+        Attributes:
+            path: String corresponding to the path to the .asm file.
+    '''
+
+    def __init__(self, path:str):
+        self.path = path
+
+    def __iter__(self) -> Iterator[str]:
+        with open(self.path, 'r') as f:
+            yield from f
+
+class Stream:
+    '''
+        Re-iterable pipeline of generator stages. Every iteration starts a new pass over the source,
+        e.g. an AsmFile, through the stages, so no stage output is held in memory between passes.
+
+            program = Stream(AsmFile(path), iter_clean)
+
+        Attributes:
+            source: Re-iterable source of lines, e.g. an AsmFile or a list.
+            stages: Generator functions, each taking the iterator returned by the previous stage.
+    '''
+
+    def __init__(self, source:Iterable[str], *stages:Callable[[Iterator], Iterator]):
+        self.source = source
+        self.stages = stages
+
+    def __iter__(self) -> Iterator:
+        lines = iter(self.source)
+        for stage in self.stages:
+            lines = stage(lines)
+
+        return lines
+
 def read_asm(path:str) -> List[str]:
     '''
         Fucntion to read .asm file line-by-line.
@@ -26,7 +94,21 @@ def read_asm(path:str) -> List[str]:
     with open(path, 'r') as f:
         return f.readlines()
 
-def clean_program(program:List[str], prefix:str='//') -> List[str]:
+def iter_clean(program:Iterable[str], prefix:str='//') -> Iterator[str]:
+    '''
+        Generator stage of clean_program, yielding the cleaned lines one at a time.
+    '''
+    for line in program:
+        line = line.strip()
+        # Remove empty lines
+        if line == '': continue
+        
+        idx = line.find(prefix)
+        if idx == -1: yield line.strip().upper()
+        elif idx == 0: continue
+        else: yield line[:idx-1].strip().upper()
+
+def clean_program(program:Iterable[str], prefix:str='//') -> List[str]:
     '''
         Function to clean assembly program. Removes comments based on the specified
         prefix, leading and trailing white space and makes the whole code upper case.
@@ -38,40 +120,65 @@ def clean_program(program:List[str], prefix:str='//') -> List[str]:
         Returns:
             List of string, each string corresponding to an assembly instruction.
     '''
-    cleaned_program = []
-    
-    for line in program:
-        line = line.strip()
-        # Remove empty lines
-        if line == '': continue
-        
-        idx = line.find(prefix)
-        if idx == -1: cleaned_program.append(line.strip().upper())
-        elif idx == 0: continue
-        else: cleaned_program.append(line[:idx-1].strip().upper())
-            
-    return cleaned_program
+    return list(iter_clean(program, prefix))
 
-def get_labels(program:List[str], suffix:str=':') -> Tuple[List[str], Dict[str, int]]:
+def iter_source_positions(program:Iterable[str], prefix:str='//', suffix:str=':') -> Iterator[Tuple[int, int]]:
     '''
-        Function to extract labels from program specified by suffix.
+        Generator stage of get_source_positions, yielding the position of each instruction one at a time.
+    '''
+    for line_idx, line in enumerate(program):
+        stripped = line.strip()
+        # Same lines as dropped by clean_program
+        if stripped == '' or stripped.find(prefix) == 0: continue
+
+        column = len(line) - len(line.lstrip())
+
+        idx = stripped.find(prefix)
+        if idx > 0: stripped = stripped[:idx]
+
+        # Skip the label in front of the instruction
+        idx = stripped.find(suffix)
+        if idx > 0:
+            instruction = stripped[idx+1:]
+            column += idx + 1 + len(instruction) - len(instruction.lstrip())
+
+        yield line_idx + 1, column + 1
+
+def get_source_positions(program:Iterable[str], prefix:str='//', suffix:str=':') -> List[Tuple[int, int]]:
+    '''
+        Function to locate the instructions of the program returned by clean_program in the raw program.
 
         Parameters:
-            program: List of string corresponding to lines of program.
+            program: List of string corresponding to the raw program lines.
+            prefix (optional): String indicating the start of a comment.
             suffix (optional): String indicating the end of a label.
 
         Returns:
-            stripped_program: List of string corresponding to the lines of program without the labels.
-            label_to_idx_dict: Dictionary mapping the labels to their original location in the program
-                               starting from 0.
+            List of (line, column) tuples, starting from 1, of the first token of each instruction.
+    '''
+    return list(iter_source_positions(program, prefix, suffix))
+
+def iter_labels(program:Iterable[str], label_to_idx_dict:Optional[Dict[str, int]]=None,
+                suffix:str=':') -> Iterator[Tuple[Optional[str], str]]:
+    '''
+        Generator stage of get_labels, yielding the label and the instruction of each line one at a time.
+
+        Parameters:
+            program: Iterable of string corresponding to the cleaned lines of the program.
+            label_to_idx_dict (optional): Dictionary the labels are added to as they are found, mapped to
+                                          their location in the program starting from 0.
+            suffix (optional): String indicating the end of a label.
+
+        Returns:
+            Iterator of (label, instruction) pairs, with label None for lines without label.
 
         Raises:
             InvalidLabelException: if the label is an empty string or placed on an empty line or comment line or
                                    if a label is not unique.
     '''
-    label_to_idx_dict = dict()
-    stripped_program = []
-    
+    if label_to_idx_dict is None:
+        label_to_idx_dict = dict()
+
     for label_idx, line in enumerate(program):
         idx = line.find(suffix)
         
@@ -79,62 +186,39 @@ def get_labels(program:List[str], suffix:str=':') -> Tuple[List[str], Dict[str,
             raise exc.InvalidLabelException(f'Label suffixed by "{suffix}" can\'t be empty in line "{line}"')
         
         if idx == len(line) - 1:
-            print(line)
             raise exc.InvalidLabelException(f'Label suffixed by "{suffix}" must be followed by instruction in line "{line}"')
         
         if idx > 0:
-            stripped_program.append(line[idx+1:].strip())
             label = line[:idx]
             if label in label_to_idx_dict:
                 raise exc.InvalidLabelException(f'Label {label} already used! You can only use each label once and they are case insensitive.')
             label_to_idx_dict[label] = label_idx
+            yield label, line[idx+1:].strip()
             continue
             
-        stripped_program.append(line)
-   
-    return stripped_program, label_to_idx_dict
+        yield None, line
 
-def update_labels(label_to_idx_dict:Dict[str, int], curr_idx:int):
+def get_labels(program:Iterable[str], suffix:str=':') -> Tuple[List[str], Dict[str, int]]:
     '''
-        Function to update label to ROM index mapping for assembly parsing. Only labels
-        after the current line index are updated by incrementing their address.
+        Function to extract labels from program specified by suffix.
 
         Parameters:
-            label_to_idx_dict: Label to current index mapping in the current loop of the
-                               assembl file parsing.
-            curr_idx: Index of the currently processed line.
+            program: List of string corresponding to lines of program.
+            suffix (optional): String indicating the end of a label.
 
         Returns:
-            Label to index mapping with necessary adjusments.
-    '''
-    for key in label_to_idx_dict.keys():
-        # Only update labels that are after the current line
-        if label_to_idx_dict[key] <= curr_idx: continue
-        
-        # Shift address by 1
-        label_to_idx_dict[key] += 1
-   
-    return label_to_idx_dict
-            
-def insert_labels(program:List[str], labels:Dict[str, int]) -> List[str]:
-    '''
-        Function to replace placeholder labels with actual ROM address in the assembly
-        program. Labels are inserted in decreasing lenght to avoid incorrect replacement
-        due to a label being a substring of a longer label.
-
-        Parameters:
-            program: HEX encoded assembly program with comments.
-            labels: Label to ROM address mapping for the program.
+            stripped_program: List of string corresponding to the lines of program without the labels.
+            label_to_idx_dict: Dictionary mapping the labels to their original location in the program
+                               starting from 0.
 
-        Returns:
-            Program with labels replaced with corresponding ROM addresses.
+        Raises:
+            InvalidLabelException: if the label is an empty string or placed on an empty line or comment line or
+                                   if a label is not unique.
     '''
-    joined_program = '\n'.join(program)
-    
-    for key in sorted(labels.keys(), key=lambda x: len(x), reverse=True):
-        joined_program = joined_program.replace(key, hex_format(labels[key]))
-        
-    return joined_program.split('\n')
+    label_to_idx_dict = dict()
+    stripped_program = [line for _, line in iter_labels(program, label_to_idx_dict, suffix)]
+   
+    return stripped_program, label_to_idx_dict
 
 def convert_hex(num:str) -> int:
     '''
@@ -157,29 +241,31 @@ def convert_hex(num:str) -> int:
     except ValueError:
         raise exc.InvalidAddressException(f'String {num} is not a valid hexadecimal value.')
         
-def hex_format(value:Union[int, str]) -> str:
+def hex_format(value:Union[int, str], width:int=8) -> str:
     '''
-        Function to format integer into 8-bit hex representation.
+        Function to format integer into hex representation of the given width.
         
         Parameter:
             value: Integer or string to be formatted.
+            width (optional): Number of bits of the representation, 8 by default.
             
         Returns:
-            String corresponding to formatted number.
+            String corresponding to formatted number, zero padded to the digits of the width.
             
         Raises:
-            AssertionError if value converted to integer doesn't fit in 8-bit.
+            AssertionError if value converted to integer doesn't fit in the width.
     '''
     num = convert_hex(value)
     
-    assert 0 <= num < 2**8, f'Number {num} is too big for 8-bit representation!'
-    return f'{num:02X}'
+    assert 0 <= num < 2**width, f'Number {num} is too big for {width}-bit representation!'
+    return f'{int(num):0{(width + 3) // 4}X}'
 
-def insert_functions(program:List[str], functions:List[Tuple[List[str], int]], rom_size:int=ROM_SIZE) -> List[str]:
+def insert_functions(program:List['Instruction'], functions:List[Tuple[List['Instruction'], int]],
+                     rom_size:int=ROM_SIZE) -> List[Tuple[int, 'Instruction']]:
     '''
         Function to insert functions at a specific locations.
         
-        Each function consist of a list of instuctions (strings) and a start index.
+        Each function consist of a list of instuctions and a start index.
         
         Parameters:
             program: base program to insert functions into.
@@ -187,76 +273,286 @@ def insert_functions(program:List[str], functions:List[Tuple[List[str], int]], r
             rom_size: size of the ROM to fit final program.
             
         Returns:
-            Copy of the program with inserted functions.
+            List of (ROM address, instruction) pairs of the program with inserted functions.
             
         Raises:
-            AssertionError: if function with given start index doesn't fit in ROM or
-                            if region is already occupied in ROM where function is inserted.
+            InvalidProgramSizeException: if program or function with given start index doesn't fit in ROM or
+                                         if region is already occupied in ROM where function is inserted.
     
     '''
-    prog_copy = [''] * rom_size
+    layout = []
+    occupied = bytearray(rom_size)
+    
+    idx = 0
+    for instruction in program:
+        layout.append((idx, instruction))
+        idx += instruction.size
     
-    for i, line in enumerate('\n'.join(program).split('\n')):
-        prog_copy[i] = line 
+    if idx > rom_size:
+        raise exc.InvalidProgramSizeException(f'Program is {idx} bytes for {rom_size} bytes ROM.')
+    occupied[:idx] = b'\x01' * idx
     
     for function, idx in functions:
+        function_size = sum(instruction.size for instruction in function)
+        
         # Check function fits in the ROM
-        assert idx + len(function) <= rom_size,\
-            f'Function length of {len(function)} is too long at index={idx} from {rom_size} bytes ROM.'
-
-        # Insert the function line by line
-        for line in '\n'.join(function).split('\n'):
-            # Check location in ROM is empty
-            if prog_copy[idx]:
-                raise Exception(f'ROM region {idx} is not empty. Risk of overwriting instructions.')
-
-            # Insert function line and move ROM index
-            prog_copy[idx] = line
-            idx += 1
+        if idx + function_size > rom_size:
+            raise exc.InvalidProgramSizeException(f'Function length of {function_size} is too long at index={idx} from {rom_size} bytes ROM.')
+
+        # Check location in ROM is empty
+        if any(occupied[idx:idx + function_size]):
+            raise exc.InvalidProgramSizeException(f'ROM region {idx} is not empty. Risk of overwriting instructions.')
+        
+        # Insert the function instruction by instruction and move ROM index
+        occupied[idx:idx + function_size] = b'\x01' * function_size
+        for instruction in function:
+            layout.append((idx, instruction))
+            idx += instruction.size
     
-    return prog_copy
+    return layout
 
-def generate_rom(program:List[str], filename:str, size:int=ROM_SIZE) -> None:
+def render_rom(layout:List[Tuple[int, 'Instruction']], size:int=ROM_SIZE) -> str:
     '''
-        Function to generate ROM .mem file from a program and write it to a file.
+        Function to render a program into the content of a ROM .mem file. Instructions are
+        rendered to text only here, empty ROM locations are filled with FF.
         
         Parameters:
-            program: list of instructions (str).
-            filename: path to file to write ROM.
+            layout: list of (ROM address, instruction) pairs, e.g. the output of insert_functions.
             size: size of the ROM to fit program into.
             
+        Returns:
+            String corresponding to the content of the ROM file.
+            
         Raises:
-            AssertionError: if program doesn't fit in given ROM size.
+            InvalidProgramSizeException: if program doesn't fit in given ROM size.
     '''
-    rom = '\n'.join(program)
-    rom_size = len(rom.split('\n'))
-    assert rom_size <= size, f'Program is {rom_size} bytes for {size} bytes ROM.'
+    rom = ['FF'] * size
     
-    # Fill empty lines in ROM with FF
-    for i, line in enumerate(program):
-        if not line: program[i] = 'FF'
+    for idx, instruction in layout:
+        lines = instruction.render()
+        if idx + len(lines) > size:
+            raise exc.InvalidProgramSizeException(f'Program is {idx + len(lines)} bytes for {size} bytes ROM.')
+        rom[idx:idx + len(lines)] = lines
     
-    rom = '\n'.join(program)
+    return '\n'.join(rom)
+
+def generate_image(layout:List[Tuple[int, 'Instruction']], size:int=ROM_SIZE) -> Tuple[bytearray, FrozenSet[int]]:
+    '''
+        Function to encode a program into a ROM image, one byte per ROM address. Empty ROM
+        locations are filled with FF.
+
+        The upper nibble of op-codes above 0xFF (e.g. COPY) is high impedance (Z), which a
+        byte can't hold. Such bytes only keep their lower nibble in the image and their
+        address is returned separately.
+        
+        Parameters:
+            layout: list of (ROM address, instruction) pairs, e.g. the output of insert_functions.
+            size: size of the ROM to fit program into.
+            
+        Returns:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
+            
+        Raises:
+            InvalidProgramSizeException: if program doesn't fit in given ROM size.
+    '''
+    image = bytearray(b'\xFF') * size
+    high_z = set()
     
-    with open(filename, 'w') as f:
-        f.write(rom)
+    for idx, instruction in layout:
+        if idx + instruction.size > size:
+            raise exc.InvalidProgramSizeException(f'Program is {idx + instruction.size} bytes for {size} bytes ROM.')
         
-def generate_ram(data_entries:List[Tuple[int, str]], filename, size=RAM_SIZE) -> None:
+        opcode = instruction.opcode
+        if opcode > 0xFF:
+            high_z.add(idx)
+            opcode &= 0xF
+        image[idx] = opcode
+        
+        if instruction.operand is not None:
+            image[idx + 1:idx + instruction.size] = instruction.operand.to_bytes(instruction.operand_size, 'little')
+    
+    return image, frozenset(high_z)
+
+def parse_rom(rom:str, size:int=ROM_SIZE) -> Tuple[bytearray, FrozenSet[int]]:
     '''
-        Function to generate RAM .mem file from entries and write it to a file.
+        Function to parse the content of a ROM .mem file back into a ROM image, the inverse of
+        render_rom followed by generate_image. Comments are ignored.
         
         Parameters:
-            data_entries: list of (RAM address, value (str)) pairs.
-            filename: path to file to write RAM.
-            size: size of the RAM to fit entries into.
+            rom: String corresponding to the content of the ROM file.
+            size: size of the ROM.
+            
+        Returns:
+            image: bytearray corresponding to the content of the ROM.
+            high_z: set of ROM addresses with a high impedance upper nibble.
             
+        Raises:
+            InvalidProgramSizeException: if the file has more bytes than the ROM size.
+            InvalidAddressException: if a line is not a valid HEX byte.
+    '''
+    image = bytearray(b'\xFF') * size
+    high_z = set()
+    
+    idx = 0
+    for line in rom.splitlines():
+        value = line.split('//', 1)[0].strip()
+        if not value: continue
+        
+        if idx >= size:
+            raise exc.InvalidProgramSizeException(f'ROM file has more than {size} bytes.')
+        
+        if value[0] in 'zZ':
+            high_z.add(idx)
+            value = value[1:]
+        
+        byte = convert_hex(value)
+        if not 0 <= byte <= 0xFF:
+            raise exc.InvalidAddressException(f'Value {line} at ROM address {idx} is not a valid HEX byte.')
+        
+        image[idx] = byte
+        idx += 1
+    
+    return image, frozenset(high_z)
+
+def write_file(content:Union[str, bytes], filename:str) -> bool:
+    '''
+        Function to write the content of a memory file only if it differs from the existing file.
+        An unchanged file is left untouched, keeping its modification time, so tools like Vivado
+        don't consider the memory file stale. A changed file is written to a temporary file and
+        renamed over the target, so readers never see a partially written file.
+        
+        Parameters:
+            content: String or bytes corresponding to the content of the file.
+            filename: path to file to write.
+            
+        Returns:
+            True if the file was written, False if it was already up to date.
+    '''
+    data = content.encode() if isinstance(content, str) else content
+    
+    try:
+        # Cheap size check first, only read the file if the sizes match.
+        if os.path.getsize(filename) == len(data):
+            with open(filename, 'rb') as f:
+                if f.read() == data: return False
+    except FileNotFoundError:
+        pass
+    
+    tmp_filename = os.path.join(os.path.dirname(filename),
+                                f'.{os.path.basename(filename)}.{os.getpid()}.{secrets.token_hex(4)}.tmp')
+    try:
+        with open(tmp_filename, 'xb') as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename): os.remove(tmp_filename)
+        raise
+    
+    return True
+
+def generate_rom(layout:List[Tuple[int, 'Instruction']], filename:str, size:int=ROM_SIZE) -> bool:
+    '''
+        Function to generate ROM .mem file from a program and write it to a file if it changed.
+        
+        Parameters:
+            layout: list of (ROM address, instruction) pairs, e.g. the output of insert_functions.
+            filename: path to file to write ROM.
+            size: size of the ROM to fit program into.
+            
+        Returns:
+            True if the file was written, False if it was already up to date.
+            
+        Raises:
+            InvalidProgramSizeException: if program doesn't fit in given ROM size.
+    '''
+    return write_file(render_rom(layout, size), filename)
+        
+def generate_ram_image(constant_pool:Dict[int, int], size:int=RAM_SIZE) -> bytearray:
+    '''
+        Function to generate the initial RAM image holding a constant pool.
+
+        Parameters:
+            constant_pool: Value to RAM address mapping, see token_parser.get_constant_pool.
+            size (optional): Number of RAM addresses.
+
+        Returns:
+            bytearray corresponding to the RAM image, one byte per RAM address.
+    '''
+    ram = bytearray(size)
+    for value, addr in constant_pool.items():
+        ram[addr] = value
+
+    return ram
+
+def render_ram(data_entries:List[Tuple[int, Union[int, str]]], size=RAM_SIZE) -> str:
+    '''
+        Function to render the content of a RAM .mem file from entries.
+
+        Parameters:
+            data_entries: list of (RAM address, value) pairs.
+            size: size of the RAM to fit entries into.
+
+        Returns:
+            String corresponding to the content of the file.
+
         Raises:
             IndexError: list index out of range error if RAM address isn't in the RAM.
     '''
     ram = [0]*size
     for i, d in data_entries:
         ram[i] = d
-    
-    ram = '\n'.join(map(hex_format, ram))
-    with open(filename, 'w') as f:
-        f.write(ram)
\ No newline at end of file
+
+    return '\n'.join(map(hex_format, ram))
+
+def generate_ram(data_entries:List[Tuple[int, str]], filename, size=RAM_SIZE) -> bool:
+    '''
+        Function to generate RAM .mem file from entries and write it to a file if it changed.
+        
+        Parameters:
+            data_entries: list of (RAM address, value (str)) pairs.
+            filename: path to file to write RAM.
+            size: size of the RAM to fit entries into.
+            
+        Returns:
+            True if the file was written, False if it was already up to date.
+            
+        Raises:
+            IndexError: list index out of range error if RAM address isn't in the RAM.
+    '''
+    return write_file(render_ram(data_entries, size), filename)
+
+def parse_ram(ram:str, size:int=RAM_SIZE) -> bytearray:
+    '''
+        Function to parse the content of a RAM .mem file back into a RAM image, the inverse of
+        render_ram. Comments are ignored.
+
+        Parameters:
+            ram: String corresponding to the content of the RAM file.
+            size: size of the RAM.
+
+        Returns:
+            bytearray corresponding to the content of the RAM, zero after the last value of the file.
+
+        Raises:
+            InvalidProgramSizeException: if the file has more bytes than the RAM size.
+            InvalidAddressException: if a line is not a valid HEX byte.
+    '''
+    image = bytearray(size)
+
+    idx = 0
+    for line in ram.splitlines():
+        value = line.split('//', 1)[0].strip()
+        if not value: continue
+
+        if idx >= size:
+            raise exc.InvalidProgramSizeException(f'RAM file has more than {size} bytes.')
+
+        byte = convert_hex(value)
+        if not 0 <= byte <= 0xFF:
+            raise exc.InvalidAddressException(f'Value {line} at RAM address {idx} is not a valid HEX byte.')
+
+        image[idx] = byte
+        idx += 1
+
+    return image
@@ -0,0 +1,306 @@
+from simulator import Simulator, BRANCH, GOTO, CALL, RETURN, IDLE, INVALID
+from targets import DEFAULT_TARGET, Target
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+from constants import *
+import exceptions as exc
+
+# Labels of the interrupt handlers, in order of priority.
+HANDLER_LABELS = [MOUSE_INTERRUPT, TIMER_INTERRUPT]
+
+# Maximum number of nested loops and function calls, each level takes a few Python stack frames.
+MAX_NESTING = 100
+
+class Bound(NamedTuple):
+    '''
+        Worst-case execution bound of a piece of code.
+
+        Attributes:
+            instructions: Maximum number of executed instructions, None if unbounded.
+            cycles: Maximum number of estimated clock cycles, None if unbounded.
+            problems: List of string describing what prevents bounding the code, e.g. loops without a bound.
+    '''
+    instructions: Optional[int]
+    cycles: Optional[int]
+    problems: List[str]
+
+    @property
+    def bounded(self) -> bool:
+        return self.cycles is not None
+
+    def __str__(self) -> str:
+        if self.bounded:
+            return f'{self.instructions} instructions, {self.cycles} cycles'
+
+        return 'unbounded: ' + '; '.join(self.problems)
+
+# (instructions, cycles) of a path, None if unbounded.
+Cost = Optional[Tuple[int, int]]
+
+def _max(a:Cost, b:Cost) -> Cost:
+    if a is None or b is None:
+        return None
+
+    return max(a[0], b[0]), max(a[1], b[1])
+
+def _add(a:Cost, b:Cost) -> Cost:
+    if a is None or b is None:
+        return None
+
+    return a[0] + b[0], a[1] + b[1]
+
+class Analyzer:
+    '''
+        Static analyzer bounding the instructions and clock cycles executed from an entry point
+        of an assembled program until its RETURN or IDLE instruction, including called functions.
+
+        The code is split into strongly connected components. Loops need a bound on the number
+        of times they jump back to their header, given by the label or the ROM address of the
+        header. A loop with N iterations is bounded by N + 1 times the longest path through its body.
+
+        Attributes:
+            program: Decoded ROM, see Simulator.decode.
+            labels: Dictionary mapping the labels to their ROM address.
+            loop_bounds: Dictionary mapping the ROM address of the loop headers to their maximum number of iterations.
+    '''
+
+    def __init__(self, rom:Union[bytes, bytearray], high_z:FrozenSet[int]=frozenset(),
+                 labels:Optional[Dict[str, int]]=None, loop_bounds:Optional[Dict[Union[str, int], int]]=None,
+                 target:Target=DEFAULT_TARGET):
+        '''
+            Parameters:
+                rom: ROM image, e.g. the rom of an AssemblyResult.
+                high_z (optional): Set of ROM addresses with a high impedance upper nibble.
+                labels (optional): Dictionary mapping the labels to their ROM address.
+                loop_bounds (optional): Maximum number of iterations of the loops, indexed by the label
+                                        or the ROM address of their header.
+                target (optional): Core the ROM image is assembled for, see targets.Target.
+
+            Raises:
+                InvalidLabelException if a loop bound refers to an undefined label.
+        '''
+        self.program = Simulator(rom, high_z, target=target).program
+        self.labels = dict(labels) if labels else dict()
+        self._names = {addr : label for label, addr in sorted(self.labels.items(), reverse=True)}
+
+        self.loop_bounds = dict()
+        for header, bound in (loop_bounds or dict()).items():
+            if isinstance(header, str):
+                if header not in self.labels:
+                    raise exc.InvalidLabelException(f'Loop bound given for undefined label {header}.')
+                header = self.labels[header]
+            self.loop_bounds[header] = bound
+
+        self._functions = dict()
+        self._calls = []
+        self._problems = []
+        self._depth = 0
+
+    def name(self, addr:int) -> str:
+        '''
+            Function to get the label of a ROM address, or its hexadecimal value if it has no label.
+        '''
+        return self._names.get(addr, f'{addr:02X}')
+
+    def _problem(self, problem:str) -> None:
+        if problem not in self._problems:
+            self._problems.append(problem)
+
+    def analyze(self, entry:Union[str, int]) -> Bound:
+        '''
+            Function to bound the code from an entry point to its RETURN or IDLE instruction.
+
+            Parameters:
+                entry: Label or ROM address of the entry point.
+
+            Returns:
+                Bound of the code.
+        '''
+        if isinstance(entry, str):
+            entry = self.labels[entry]
+
+        self._problems = []
+        cost = self._region(entry)
+
+        if cost is None:
+            return Bound(None, None, self._problems)
+
+        return Bound(cost[0], cost[1], [])
+
+    def _function(self, addr:int) -> Cost:
+        '''
+            Function to bound a function called with FUNC, from its first instruction to its RETURN.
+        '''
+        if addr in self._calls:
+            self._problem(f'Recursive call to {self.name(addr)}')
+            return None
+
+        if addr not in self._functions:
+            self._calls.append(addr)
+            start = len(self._problems)
+            cost = self._region(addr)
+            self._functions[addr] = cost, self._problems[start:]
+            self._calls.pop()
+
+        cost, problems = self._functions[addr]
+        for problem in problems:
+            self._problem(problem)
+
+        return cost
+
+    def _successors(self, addr:int) -> List[int]:
+        kind, _, operand, _, next_pc = self.program[addr]
+
+        if kind == BRANCH: return [operand, next_pc]
+        if kind == GOTO:   return [operand]
+        if kind in (RETURN, IDLE, INVALID): return []
+
+        return [next_pc]
+
+    def _cost(self, addr:int) -> Cost:
+        kind, _, operand, cycles, _ = self.program[addr]
+
+        if kind == INVALID:
+            self._problem(f'Invalid instruction at {addr:02X}')
+            return None
+
+        if kind == CALL:
+            return _add((1, cycles), self._function(operand))
+
+        return 1, cycles
+
+    def _region(self, entry:int, nodes:Optional[Set[int]]=None) -> Cost:
+        '''
+            Function to compute the longest path from an entry point. If nodes is given, only the
+            given addresses are explored and the path ends when jumping back to the entry point,
+            i.e. it bounds one iteration of the loop with the entry point as header.
+        '''
+        if self._depth >= MAX_NESTING:
+            self._problem(f'Loops and function calls nested more than {MAX_NESTING} levels deep at {self.name(entry)}')
+            return None
+
+        self._depth += 1
+        try:
+            return self._longest_path(entry, nodes)
+        finally:
+            self._depth -= 1
+
+    def _longest_path(self, entry:int, nodes:Optional[Set[int]]) -> Cost:
+        def successors(addr:int) -> List[int]:
+            if nodes is None:
+                return self._successors(addr)
+
+            return [succ for succ in self._successors(addr) if succ in nodes and succ != entry]
+
+        components = _strongly_connected_components(entry, successors)
+        component_idx = {addr : idx for idx, component in enumerate(components) for addr in component}
+        longest = []
+
+        # Components come in reverse topological order, so successors are computed first.
+        for idx, component in enumerate(components):
+            cost = self._component(component, entry, successors, component_idx)
+
+            after = (0, 0)
+            for addr in component:
+                for succ in successors(addr):
+                    if component_idx[succ] != idx:
+                        after = _max(after, longest[component_idx[succ]])
+
+            longest.append(_add(cost, after))
+
+        return longest[component_idx[entry]]
+
+    def _component(self, component:List[int], entry:int, successors, component_idx:Dict[int, int]) -> Cost:
+        '''
+            Function to bound a strongly connected component, a single instruction or a loop.
+        '''
+        addr = component[0]
+        if len(component) == 1 and addr not in successors(addr):
+            return self._cost(addr)
+
+        # Headers are the instructions of the loop entered from outside of the loop.
+        members = set(component)
+        headers = {entry} & members
+        for pred in component_idx:
+            if pred not in members:
+                headers |= {succ for succ in successors(pred) if succ in members}
+
+        if len(headers) != 1:
+            self._problem(f'Loop entered at {", ".join(self.name(header) for header in sorted(headers))} has several entry points')
+            return None
+
+        header = headers.pop()
+        if header not in self.loop_bounds:
+            self._problem(f'Loop at {self.name(header)} has no bound')
+            return None
+
+        iteration = self._region(header, members)
+        if iteration is None:
+            return None
+
+        iterations = self.loop_bounds[header] + 1
+        return iteration[0] * iterations, iteration[1] * iterations
+
+def _strongly_connected_components(entry:int, successors) -> List[List[int]]:
+    '''
+        Function to find the strongly connected components reachable from an entry point (Tarjan).
+        The depth first search keeps its own stack of (address, successor iterator) pairs, so
+        long straight-line code doesn't hit the recursion limit.
+
+        Returns:
+            List of the components, each a list of addresses, in reverse topological order.
+    '''
+    index = dict()
+    lowlink = dict()
+    stack = []
+    on_stack = set()
+    components = []
+
+    def enter(addr:int) -> Tuple[int, Iterator[int]]:
+        index[addr] = lowlink[addr] = len(index)
+        stack.append(addr)
+        on_stack.add(addr)
+        return addr, iter(successors(addr))
+
+    path = [enter(entry)]
+    while path:
+        addr, succs = path[-1]
+
+        for succ in succs:
+            if succ not in index:
+                path.append(enter(succ))
+                break
+            elif succ in on_stack:
+                lowlink[addr] = min(lowlink[addr], index[succ])
+        else:
+            # All successors visited, leave the address.
+            path.pop()
+            if path:
+                parent = path[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[addr])
+
+            if lowlink[addr] == index[addr]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == addr: break
+                components.append(component)
+
+    return components
+
+def analyze_handlers(result, loop_bounds:Optional[Dict[Union[str, int], int]]=None) -> Dict[str, Bound]:
+    '''
+        Function to bound the interrupt handlers of an assembled program.
+
+        Parameters:
+            result: AssemblyResult of the program, see assembler.assemble.
+            loop_bounds (optional): Maximum number of iterations of the loops, indexed by the label
+                                    or the ROM address of their header.
+
+        Returns:
+            Dictionary mapping the label of each interrupt handler of the program to its Bound.
+    '''
+    analyzer = Analyzer(result.rom, result.high_z, result.labels, loop_bounds, result.target)
+
+    return {label : analyzer.analyze(label) for label in HANDLER_LABELS if label in result.labels}
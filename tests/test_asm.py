@@ -0,0 +1,71 @@
+'''
+    Checks of the command line assembler.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import io
+import os
+import sys
+import tempfile
+import contextlib
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import asm
+import cache
+import formats
+
+PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs', 'mouse.asm')
+
+class TestBuildCache(unittest.TestCase):
+
+    def test_cached_build_twice(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            output_path = os.path.join(tmp_dir, 'mouse.mem')
+
+            asm.assemble_file(PROGRAM, output_path, '.mem', True, cache_dir)
+            with open(output_path) as f:
+                first = f.read()
+
+            # Second build is a cache hit writing the .mem file only.
+            asm.assemble_file(PROGRAM, output_path, '.mem', True, cache_dir)
+            with open(output_path) as f:
+                self.assertEqual(f.read(), first)
+
+            # Cache hit with an image based format.
+            asm.assemble_file(PROGRAM, output_path, '.mem', True, cache_dir, output_formats=[formats.MEM_FORMAT, 'hex'])
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'mouse.hex')))
+
+    def test_cached_optimized_build_reports(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, 'cache')
+            output_path = os.path.join(tmp_dir, 'mouse.mem')
+
+            report = asm.assemble_file(PROGRAM, output_path, '.mem', True, cache_dir, optimize=True)
+            self.assertTrue(report.startswith('Saved '))
+
+            report = asm.assemble_file(PROGRAM, output_path, '.mem', True, cache_dir, optimize=True)
+            self.assertIn('build cache', report)
+
+    def test_failed_store_leaves_no_temp_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             mock.patch.object(cache.os, 'replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                cache.store(tmp_dir, 'key', 'rom', 1024)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+class TestArguments(unittest.TestCase):
+
+    def test_invalid_jobs(self):
+        for jobs in ['0', '-2']:
+            with mock.patch.object(sys, 'argv', ['asm.py', '-i', PROGRAM, '-j', jobs]), \
+                 contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as context:
+                asm.main()
+            self.assertEqual(context.exception.code, 1)
+
+if __name__ == '__main__':
+    unittest.main()
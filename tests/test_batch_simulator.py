@@ -0,0 +1,114 @@
+'''
+    Checks of the lockstep batch simulator against the instruction set simulator, lane by lane.
+    Skipped if NumPy, an optional dependency, is not installed.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import glob
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+try:
+    import numpy
+except ImportError:
+    raise unittest.SkipTest('The batch simulator requires NumPy.')
+
+import exceptions as exc
+from assembler import assemble
+from simulator import Simulator
+from batch_simulator import BatchSimulator
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs')
+
+# Lanes split on the switches, call the same function from two places so that they return to
+# different addresses, and loop a number of times read from the RAM.
+DIVERGENT = '''
+        LB A E0
+        LI B 80
+        BLT LOW
+        FUNC F
+        SB A 10
+        JUMP LOOP
+LOW:    FUNC F
+        SB A 11
+LOOP:   LB A 00
+        LI B 00
+        BEQ END
+        DEC A A
+        SB A 00
+        LB A 12
+        INC A A
+        SB A 12
+        JUMP LOOP
+END:    LB A 01
+        DEREF A
+        SB A C0
+        IDLE
+F:      INC A A
+        LB B 01
+        BGT SKIP
+        SLA A
+SKIP:   RETURN
+'''
+
+class TestBatchSimulator(unittest.TestCase):
+
+    def check(self, result, rams, inputs, max_instructions):
+        '''
+            Function to check that every lane of the batch simulator ends in the state of a
+            Simulator run on the same RAM image and input values.
+        '''
+        batch = BatchSimulator.from_result(result, rams, inputs=inputs)
+        total = batch.run(max_instructions)
+        expected_total = 0
+
+        for lane, ram in enumerate(rams):
+            sim = Simulator.from_result(result, ram=ram)
+            for addr, values in inputs.items():
+                sim.io[addr] = values[lane]
+
+            try:
+                expected_total += sim.run(max_instructions)
+                faulted = False
+            except exc.InvalidInstructionException:
+                expected_total += sim.instructions
+                faulted = True
+
+            with self.subTest(lane=lane):
+                self.assertEqual((int(batch.a[lane]), int(batch.b[lane]), int(batch.pc[lane])), (sim.a, sim.b, sim.pc))
+                self.assertEqual(bytes(batch.memory[lane]), bytes(sim.ram) + bytes(sim.io[len(sim.ram):]))
+                self.assertEqual((int(batch.instructions[lane]), int(batch.cycles[lane])), (sim.instructions, sim.cycles))
+                self.assertEqual((bool(batch.idle[lane]), bool(batch.faulted[lane])), (sim.idle, faulted))
+
+        self.assertEqual(total, expected_total)
+
+    def test_divergent_lanes(self):
+        rng = random.Random(1)
+        result = assemble(DIVERGENT)
+        rams = [bytes([rng.randrange(8), rng.randrange(256)]) + bytes(rng.randrange(256) for _ in range(126))
+                for _ in range(64)]
+        inputs = {0xE0: [rng.randrange(256) for _ in range(64)]}
+
+        for max_instructions in [None, 1, 7, 23]:
+            with self.subTest(max_instructions=max_instructions):
+                self.check(result, rams, inputs, max_instructions)
+
+    def test_programs(self):
+        rng = random.Random(2)
+        for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.asm'))):
+            with open(path, 'r') as f:
+                result = assemble(f.read())
+
+            rams = [bytes(rng.randrange(256) for _ in range(result.target.ram_size)) for _ in range(16)]
+            inputs = {addr : [rng.randrange(256) for _ in range(16)] for addr in [0xA0, 0xA1, 0xE0]}
+
+            with self.subTest(program=os.path.basename(path)):
+                self.check(result, rams, inputs, 3000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+'''
+    Checks of the basic block compiling simulator against the instruction set simulator.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import glob
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import targets
+import block_simulator
+from assembler import assemble
+from simulator import Simulator
+from block_simulator import BlockSimulator
+from peripherals import Leds, Mouse, Switches, Timer
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs')
+
+# Number of random ROM images and example programs compared per run.
+TRIAL_COUNT = 100
+
+def get_state(simulator:Simulator) -> tuple:
+    return (simulator.a, simulator.b, simulator.pc, simulator.context, bytes(simulator.ram), bytes(simulator.io),
+            simulator.instructions, simulator.cycles, simulator.idle, simulator.time,
+            tuple(peripheral.save_state() for peripheral in simulator.peripherals))
+
+class TestEquivalence(unittest.TestCase):
+
+    def test_matches_interpreter(self):
+        rng = random.Random(7)
+        sources = []
+        for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.asm'))):
+            with open(path, 'r') as f:
+                sources.append(f.read())
+
+        for trial in range(TRIAL_COUNT):
+            target = rng.choice(list(targets.TARGETS.values()))
+
+            # Alternate between example programs and random bytes, which hit invalid instructions and odd jumps.
+            if trial % 2:
+                result = assemble(rng.choice(sources), target=target)
+                rom, high_z = result.rom, result.high_z
+            else:
+                size = rng.choice([16, 40, 120, 250])
+                rom = bytes(rng.randrange(256) for _ in range(size))
+                high_z = frozenset(rng.sample(range(size), 3))
+
+            ram = bytes(rng.randrange(256) for _ in range(target.ram_size))
+            with_peripherals = trial % 3 != 0
+            period = rng.choice([50, 500])
+
+            simulators = []
+            for simulator_class in [Simulator, BlockSimulator]:
+                simulator = simulator_class(rom, high_z, ram, target=target)
+                if with_peripherals:
+                    simulator.attach(Timer(period), Mouse(), Switches(value=0x42), Leds())
+                simulators.append(simulator)
+
+            outcomes = [[], []]
+            for step in range(8):
+                limit = rng.choice([1, 3, 7, 50, 300, 2000])
+                until = rng.choice([None, 10_000])
+
+                for outcome, simulator in zip(outcomes, simulators):
+                    try:
+                        outcome.append(simulator.run(limit, until))
+                    except Exception as e:
+                        outcome.append(type(e).__name__)
+
+                    if step % 3 == 1:
+                        simulator.interrupt(target.mouse_vector)
+                    if with_peripherals and step == 4:
+                        simulator.peripherals[1].move(1, 2)
+
+            with self.subTest(trial=trial, target=target.name):
+                self.assertEqual(outcomes[0], outcomes[1])
+                self.assertEqual(get_state(simulators[0]), get_state(simulators[1]))
+
+class TestBlockCache(unittest.TestCase):
+
+    def test_cache_is_bounded(self):
+        for value in range(block_simulator.BLOCK_CACHE_SIZE + 10):
+            simulator = BlockSimulator(bytes([0x00, value, 0x08]))
+            simulator.run(10)
+
+        self.assertEqual(len(block_simulator.BLOCK_CACHE), block_simulator.BLOCK_CACHE_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+'''
+    Checks of the disassembler: the listing of every sample program must assemble back to the
+    same ROM image.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import io
+import os
+import sys
+import glob
+import tempfile
+import contextlib
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import asm
+import utils
+import targets
+import disassembler
+from assembler import assemble
+
+PROGRAMS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs', '*.asm')))
+
+class TestRoundTrip(unittest.TestCase):
+
+    def test_programs(self):
+        for path in PROGRAMS:
+            with open(path, 'r') as f:
+                source = f.read()
+
+            for target in targets.TARGETS.values():
+                with self.subTest(program=os.path.basename(path), target=target.name):
+                    result = assemble(source, target=target)
+                    disassembly = disassembler.disassemble(result.rom, result.high_z, target)
+                    self.assertEqual(disassembly.invalid, [])
+
+                    reassembled = assemble(disassembly.text, target=target)
+                    self.assertEqual(reassembled.rom, result.rom)
+                    self.assertEqual(reassembled.high_z, result.high_z)
+
+    def test_rom_files(self):
+        # Disassemble the .mem files written by the assembler, as the command line does.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for path in PROGRAMS:
+                output_path = os.path.join(tmp_dir, os.path.basename(path)[:-4] + '.mem')
+                asm.assemble_file(path, output_path, '.mem', True)
+
+                with self.subTest(program=os.path.basename(path)):
+                    disassembly = disassembler.disassemble_file(output_path, None, True)
+                    with open(output_path[:-4] + '.dis', 'r') as f:
+                        self.assertEqual(f.read(), disassembly.text)
+
+                    with open(output_path, 'r') as f:
+                        image, high_z = utils.parse_rom(f.read())
+                    reassembled = assemble(disassembly.text)
+                    self.assertEqual(reassembled.rom, image)
+                    self.assertEqual(reassembled.high_z, high_z)
+
+class TestArguments(unittest.TestCase):
+
+    def test_invalid_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_paths = []
+            for path in PROGRAMS[:2]:
+                input_paths.append(os.path.join(tmp_dir, os.path.basename(path)[:-4] + '.mem'))
+                asm.assemble_file(path, input_paths[-1], '.mem', True)
+
+            for jobs in ['0', '-2']:
+                with mock.patch.object(sys, 'argv', ['disassembler.py', '-i', *input_paths, '-j', jobs]), \
+                     contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit) as context:
+                    disassembler.main()
+                self.assertEqual(context.exception.code, 1)
+                self.assertFalse(glob.glob(os.path.join(tmp_dir, '*.dis')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+'''
+    Checks of the relocatable object files and the linker.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import asm
+import utils
+import linker
+import exceptions as exc
+from simulator import Simulator
+
+MAIN = '''
+        LI A 05
+        FUNC DOUBLE
+        SB A 10
+        FUNC _LOCAL     // Local label of this module
+        IDLE
+_LOCAL: LI B 07
+        SB B 11
+        RETURN
+'''
+
+LIB = '''
+DOUBLE: COPY B
+        ADD A
+        LI B 07         // Same constant as the main module
+        SB B 12
+        RETURN
+_LOCAL: LI B 09         // Same local label as the main module
+        SB B 13
+        RETURN
+MOUSE:  FUNC _LOCAL
+        IDLE
+'''
+
+def assemble_module(source:str, filename:str) -> linker.ObjectFile:
+    return linker.assemble_object(utils.clean_program(source.splitlines()), filename=filename)
+
+class TestLinker(unittest.TestCase):
+
+    def test_link(self):
+        result = linker.link([assemble_module(MAIN, 'main.asm'), assemble_module(LIB, 'lib.asm')])
+        sim = Simulator.from_result(result)
+        sim.run(1000)
+
+        # The main module calls its own _LOCAL, not the one of the library.
+        self.assertEqual((sim.ram[0x10], sim.ram[0x11], sim.ram[0x12], sim.ram[0x13]), (0x0A, 0x07, 0x07, 0x00))
+        self.assertTrue(sim.idle)
+
+        # The MOUSE handler of the library calls the _LOCAL of the library.
+        sim.interrupt(result.target.mouse_vector)
+        sim.run(1000)
+        self.assertEqual(sim.ram[0x13], 0x09)
+
+    def test_local_labels_are_not_exported(self):
+        module = assemble_module(LIB, 'lib.asm')
+        with self.assertRaises(exc.InvalidLabelException):
+            linker.link([assemble_module('FUNC _LOCAL\nIDLE\n', 'main.asm'), module])
+
+    def test_constant_pool_is_shared(self):
+        result = linker.link([assemble_module(MAIN, 'main.asm'), assemble_module(LIB, 'lib.asm')])
+        self.assertEqual(sorted(result.constant_pool), [0x05, 0x07, 0x09])
+        self.assertEqual(len(set(result.constant_pool.values())), 3)
+        for value, addr in result.constant_pool.items():
+            self.assertEqual(result.ram[addr], value)
+
+    def test_duplicate_symbol(self):
+        with self.assertRaises(exc.InvalidLabelException):
+            linker.link([assemble_module(MAIN, 'main.asm'), assemble_module(LIB, 'lib.asm'),
+                         assemble_module('DOUBLE: RETURN\n', 'other.asm')])
+
+    def test_undefined_symbol(self):
+        with self.assertRaises(exc.InvalidLabelException):
+            linker.link([assemble_module('FUNC MISSING\nIDLE\n', 'main.asm')])
+
+    def test_link_objects_like_sources(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sources = []
+            for name, source in [('main', MAIN), ('lib', LIB)]:
+                path = os.path.join(tmp_dir, name + '.asm')
+                with open(path, 'w') as f:
+                    f.write(source)
+                sources.append(path)
+                asm.assemble_file(path, None, '.mem', True, write_object=True)
+
+            outputs = []
+            for name, inputs in [('from_sources', sources), ('from_objects', [path[:-4] + '.obj' for path in sources])]:
+                output_path = os.path.join(tmp_dir, name + '.mem')
+                asm.link_files(inputs, output_path, '.mem', True)
+
+                contents = []
+                for path in [output_path, output_path[:-4] + '.ram.mem']:
+                    with open(path, 'r') as f:
+                        contents.append(f.read())
+                outputs.append(contents)
+
+            self.assertEqual(outputs[0], outputs[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+'''
+    Checks of the optimizer: each rewrite must fire where it applies and keep the simulated
+    behaviour of the program.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import targets
+from assembler import assemble
+from simulator import Simulator
+from peripherals import Leds, Switches
+
+def run(result, ram:bytes, interrupts=()) -> tuple:
+    '''
+        Function to run an assembled program until it goes idle, then each of the given
+        interrupts in turn, and to return the state visible outside of the processor.
+    '''
+    sim = Simulator.from_result(result, ram=ram)
+    leds = Leds()
+    sim.attach(leds, Switches(value=0x3C))
+    sim.run(10_000)
+
+    for vector in interrupts:
+        sim.interrupt(vector)
+        sim.run(10_000)
+
+    return sim.a, sim.b, bytes(sim.ram), bytes(sim.io), leds.value, sim.idle
+
+class TestOptimizer(unittest.TestCase):
+
+    def check(self, source:str, rewrites, ram:bytes=bytes([0x21, 0x42]), interrupts=()):
+        '''
+            Function to check that the optimizer applies the expected rewrites, one substring
+            per rewrite, and that the optimized program behaves like the original one.
+        '''
+        original = assemble(source)
+        optimized = assemble(source, optimize=True)
+
+        self.assertEqual(len(optimized.optimization.rewrites), len(rewrites), optimized.optimization.rewrites)
+        for rewrite, expected in zip(optimized.optimization.rewrites, rewrites):
+            self.assertIn(expected, rewrite)
+
+        self.assertEqual(run(original, ram, interrupts), run(optimized, ram, interrupts))
+        return original, optimized
+
+    def test_store_then_load_same_register(self):
+        _, optimized = self.check('LB A 00\nSB A 10\nLB A 10\nSB A C0\nIDLE\n', ['Removed LB A 10 after SB A 10'])
+        self.assertEqual(optimized.optimization.bytes_saved, 2)
+
+    def test_store_then_load_other_register(self):
+        self.check('LB A 00\nSB A 10\nLB B 10\nSB B C0\nIDLE\n', ['Replaced LB B 10 after SB A 10 by COPY B'])
+
+    def test_copy_a(self):
+        self.check('LB A 00\nCOPY A\nSB A C0\nIDLE\n', ['Removed COPY A'])
+
+    def test_jump_to_next_instruction(self):
+        # The JUMP to the next instruction is removed by the block reordering first.
+        self.check('LB A 00\nJUMP NEXT\nNEXT: SB A C0\nIDLE\n', ['Removed JUMP NEXT'])
+
+    def test_thread_jumps(self):
+        source = ('LB A 00\nLB B 01\nBEQ HOP\nSB A C0\nIDLE\n'
+                  'HOP: JUMP END\n'
+                  'END: SB B C0\nIDLE\n')
+        for ram in [bytes([1, 1]), bytes([1, 2])]:
+            with self.subTest(ram=ram):
+                self.check(source, ['Threaded BEQ HOP to END', 'Removed unreachable JUMP END'], ram)
+
+    def test_load_after_label_is_kept(self):
+        # The load is reached by the branch, so it can't rely on the store before it.
+        self.check('LB A 00\nLB B 01\nSB A 10\nLOOP: LB A 10\nINC A A\nSB A 10\nBLT LOOP\nSB A C0\nIDLE\n', [],
+                   bytes([0x02, 0x05]))
+
+    def test_memory_mapped_addresses_are_kept(self):
+        for ram_size in {target.ram_size for target in targets.TARGETS.values()}:
+            addr = f'{ram_size:02X}'
+            for source in [f'LB A 00\nSB A {addr}\nLB A {addr}\nSB A C0\nIDLE\n',
+                           f'LB A 00\nSB A {addr}\nLB B {addr}\nSB B C0\nIDLE\n',
+                           'LB A 00\nSB A C0\nLB A C0\nSB A C1\nIDLE\n',
+                           'LB A 00\nSB A E0\nLB A E0\nSB A C0\nIDLE\n']:
+                with self.subTest(source=source):
+                    original, optimized = self.check(source, [])
+                    self.assertEqual(optimized.rom, original.rom)
+
+    def test_first_chain_stays_at_address_0(self):
+        source = ('START: LB A 00\nJUMP NEXT\n'
+                  'OTHER: LB B 01\nSB B C0\nIDLE\n'
+                  'NEXT: SB A C0\nFUNC OTHER\nIDLE\n')
+        _, optimized = self.check(source, ['Removed JUMP NEXT'])
+        self.assertEqual(optimized.labels['START'], 0)
+        self.assertEqual(optimized.labels['NEXT'], 2)
+
+        # A JUMP at address 0 is removed and its target becomes the entry point.
+        _, optimized = self.check('JUMP MAIN\nF: LB A 00\nRETURN\nMAIN: FUNC F\nSB A C0\nIDLE\n', ['Removed JUMP MAIN'])
+        self.assertEqual(optimized.labels['MAIN'], 0)
+
+    def test_interrupt_handlers_are_kept(self):
+        source = ('LB A 00\nSB A C0\nIDLE\n'
+                  'DEAD: LB B 01\nSB B C1\nIDLE\n'
+                  'MOUSE: LB A E0\nSB A C0\nIDLE\n'
+                  'TIMER: LB B E0\nINC B B\nSB B C1\nIDLE\n')
+        target = targets.DEFAULT_TARGET
+        _, optimized = self.check(source, ['Removed unreachable LB B 01', 'Removed unreachable SB B C1', 'Removed unreachable IDLE'],
+                                  interrupts=[target.mouse_vector, target.timer_vector])
+        self.assertIn('MOUSE', optimized.labels)
+        self.assertIn('TIMER', optimized.labels)
+        self.assertNotIn('DEAD', optimized.labels)
+        self.assertEqual(optimized.rom[target.mouse_vector], optimized.labels['MOUSE'])
+        self.assertEqual(optimized.rom[target.timer_vector], optimized.labels['TIMER'])
+
+if __name__ == '__main__':
+    unittest.main()
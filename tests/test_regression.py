@@ -0,0 +1,26 @@
+'''
+    Checks of the golden output regression runner.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import regression
+import exceptions as exc
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'programs')
+
+class TestRun(unittest.TestCase):
+
+    def test_invalid_jobs(self):
+        for jobs in [0, -2]:
+            with self.assertRaises(exc.InvalidArgumentException):
+                regression.run(PROGRAMS_DIR, jobs=jobs)
+
+if __name__ == '__main__':
+    unittest.main()
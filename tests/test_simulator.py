@@ -0,0 +1,137 @@
+'''
+    Checks of the semantics of each instruction in the instruction set simulator.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import simulator
+import targets
+import exceptions as exc
+from assembler import assemble
+from simulator import Simulator
+from peripherals import Leds, Switches
+
+# Pairs of register values the ALU operations are checked on.
+OPERANDS = [(0x00, 0x00), (0x01, 0xFF), (0xC5, 0x3A), (0x3A, 0xC5), (0x80, 0x80), (0xFF, 0x02)]
+
+# Expected result of each ALU instruction writing register A.
+ALU_RESULTS = {
+    'ADD A'   : lambda a, b: (a + b) & 0xFF,
+    'SUB A'   : lambda a, b: (a - b) & 0xFF,
+    'MUL A'   : lambda a, b: (a * b) & 0xFF,
+    'SLA A'   : lambda a, b: (a << 1) & 0xFF,
+    'SRA A'   : lambda a, b: a >> 1,
+    'INC A A' : lambda a, b: (a + 1) & 0xFF,
+    'INC A B' : lambda a, b: (b + 1) & 0xFF,
+    'DEC A A' : lambda a, b: (a - 1) & 0xFF,
+    'DEC A B' : lambda a, b: (b - 1) & 0xFF,
+    'SEQ A'   : lambda a, b: int(a == b),
+    'SGT A'   : lambda a, b: int(a > b),
+    'SLT A'   : lambda a, b: int(a < b),
+    'AND A'   : lambda a, b: a & b,
+    'OR A'    : lambda a, b: a | b,
+    'XOR A'   : lambda a, b: a ^ b,
+    'NOT A'   : lambda a, b: ~a & 0xFF,
+    'COPY A'  : lambda a, b: a
+}
+
+def run_program(source:str, ram:bytes=b'', *peripherals) -> Simulator:
+    '''
+        Function to assemble a program and run it until it goes idle.
+    '''
+    sim = Simulator.from_result(assemble(source), ram=ram)
+    sim.attach(*peripherals)
+    sim.run(10_000)
+    return sim
+
+class TestAlu(unittest.TestCase):
+
+    def test_alu_operations(self):
+        for instruction, result in ALU_RESULTS.items():
+            for a, b in OPERANDS:
+                with self.subTest(instruction=instruction, a=a, b=b):
+                    sim = run_program(f'LB A 00\nLB B 01\n{instruction}\nSB A 02\nIDLE\n', bytes([a, b]))
+                    self.assertEqual(sim.ram[2], result(a, b))
+                    self.assertEqual(sim.b, b)
+
+    def test_alu_writes_register_b(self):
+        sim = run_program('LB A 00\nLB B 01\nSUB B\nIDLE\n', bytes([0x10, 0x30]))
+        self.assertEqual((sim.a, sim.b), (0x10, 0xE0))
+
+    def test_branches(self):
+        for branch, taken in [('BEQ', lambda a, b: a == b), ('BGT', lambda a, b: a > b), ('BLT', lambda a, b: a < b)]:
+            for a, b in OPERANDS:
+                with self.subTest(branch=branch, a=a, b=b):
+                    sim = run_program(f'LB A 00\nLB B 01\n{branch} YES\nLI A 01\nSB A 02\nIDLE\n'
+                                      f'YES: LI A 02\nSB A 02\nIDLE\n', bytes([a, b]))
+                    self.assertEqual(sim.ram[2], 2 if taken(a, b) else 1)
+
+class TestMemory(unittest.TestCase):
+
+    def test_load_store_ram(self):
+        sim = run_program('LB A 05\nLB B 06\nSB A 7F\nSB B 00\nIDLE\n', bytes(5) + bytes([0x12, 0x34]))
+        self.assertEqual((sim.a, sim.b), (0x12, 0x34))
+        self.assertEqual((sim.ram[0x7F], sim.ram[0x00]), (0x12, 0x34))
+
+    def test_load_store_io(self):
+        leds = Leds()
+        sim = run_program('LB A E0\nSB A C0\nSB A 90\nLB B 90\nIDLE\n', b'', leds, Switches(value=0x5A))
+        self.assertEqual((sim.a, sim.b), (0x5A, 0x5A))
+        self.assertEqual(leds.value, 0x5A)
+        self.assertEqual(sim.io[0x90], 0x5A)
+        self.assertEqual(bytes(sim.ram), bytes(len(sim.ram)))
+
+    def test_deref(self):
+        # Below the RAM size DEREF reads the RAM, above it the memory mapped peripherals.
+        sim = run_program('LB A 00\nDEREF A\nLB B 01\nDEREF B\nIDLE\n', bytes([0x10, 0xE0]) + bytes(14) + bytes([0x77]),
+                          Switches(value=0x42))
+        self.assertEqual((sim.a, sim.b), (0x77, 0x42))
+
+class TestControlFlow(unittest.TestCase):
+
+    def test_function_call(self):
+        sim = run_program('FUNC F\nSB A 03\nIDLE\nF: LI A 07\nRETURN\n')
+        self.assertEqual(sim.ram[3], 7)
+        self.assertEqual(sim.context, 2)
+        self.assertTrue(sim.idle)
+        self.assertEqual(sim.instructions, 5)
+
+    def test_interrupt_priority(self):
+        # Each handler records the order it ran in, MOUSE must run before TIMER.
+        source = ('IDLE\n'
+                  'MOUSE: LB A 10\nSB A 20\nINC A A\nSB A 10\nIDLE\n'
+                  'TIMER: LB A 10\nSB A 21\nINC A A\nSB A 10\nIDLE\n')
+        result = assemble(source)
+        sim = Simulator.from_result(result)
+        self.assertEqual(sim.run(), 1)
+        self.assertTrue(sim.idle)
+
+        sim.interrupt(targets.DEFAULT_TARGET.timer_vector)
+        sim.interrupt(targets.DEFAULT_TARGET.mouse_vector)
+        self.assertEqual(sim.run(), 10)
+        self.assertEqual((sim.ram[0x20], sim.ram[0x21], sim.ram[0x10]), (0, 1, 2))
+        self.assertEqual(sim.pc, result.labels['TIMER'] + 8)
+
+class TestDecode(unittest.TestCase):
+
+    def test_operand_outside_rom_is_invalid(self):
+        for target in targets.TARGETS.values():
+            for source in ['JUMP X\nX: IDLE\n', 'LB A 00\n']:
+                with self.subTest(target=target.name, source=source):
+                    opcode = assemble(source, target=target).rom[0]
+                    rom = bytes(target.rom_size - 1) + bytes([opcode])
+                    sim = Simulator(rom, target=target)
+                    self.assertEqual(sim.program[-1][0], simulator.INVALID)
+
+                    sim.pc = target.rom_size - 1
+                    with self.assertRaises(exc.InvalidInstructionException):
+                        sim.run(1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+'''
+    Checks of the worst-case execution time analysis of the interrupt handlers.
+
+    Usage:
+        python3 -m unittest discover tests
+'''
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import asm
+import wcet
+import targets
+from assembler import assemble
+
+# Straight-line handler longer than the Python recursion limit.
+LONG_HANDLER = '\n'.join(['IDLE', 'TIMER: LB A 00'] + ['INC A A'] * 1500 + ['SB A 00', 'IDLE']) + '\n'
+
+class TestAnalyzer(unittest.TestCase):
+
+    def test_long_handler(self):
+        result = assemble(LONG_HANDLER, target=targets.CORE16)
+        bound = wcet.analyze_handlers(result)['TIMER']
+        self.assertEqual(bound.instructions, 1503)
+        self.assertTrue(bound.bounded)
+
+    def test_long_handler_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, 'long.asm')
+            with open(input_path, 'w') as f:
+                f.write(LONG_HANDLER)
+
+            report = asm.assemble_file(input_path, None, '.mem', True, wcet_budget=100_000, target=targets.CORE16)
+            self.assertIn('TIMER: 1503 instructions', report)
+
+    def test_loop_bound(self):
+        result = assemble('IDLE\nTIMER: LB A 00\nLOOP: INC A A\nBLT LOOP\nIDLE\n')
+        self.assertFalse(wcet.analyze_handlers(result)['TIMER'].bounded)
+
+        bound = wcet.analyze_handlers(result, {'LOOP': 4})['TIMER']
+        self.assertEqual(bound.instructions, 1 + 5 * 2 + 1)
+
+    def test_deep_nesting(self):
+        # Chain of functions each calling the next one, deeper than the analyzer follows.
+        depth = wcet.MAX_NESTING + 20
+        lines = ['IDLE', 'TIMER: FUNC F0', 'IDLE']
+        lines += [f'F{idx}: FUNC F{idx + 1}\nRETURN' for idx in range(depth)]
+        lines += [f'F{depth}: RETURN']
+
+        bound = wcet.analyze_handlers(assemble('\n'.join(lines) + '\n', target=targets.CORE16))['TIMER']
+        self.assertFalse(bound.bounded)
+        self.assertIn('nested more than', str(bound))
+
+if __name__ == '__main__':
+    unittest.main()